@@ -1,8 +1,8 @@
 import os
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from common.db_engine import create_db_engine
 
 # Load environment variables from .env
 load_dotenv()
@@ -11,7 +11,8 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in the environment variables")
 
-engine = create_engine(DATABASE_URL)
+# Pool settings come from DB_POOL_* environment variables (see common/db_engine.py)
+engine = create_db_engine(DATABASE_URL, "auth_service")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -1,10 +1,19 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import auth, users, update_user, me  # Import me router here
 from app.database import engine, SessionLocal
 from app.models import User
 from app.utils.security import get_password_hash
 from app.utils.config import settings
+from app.utils.password_pool import password_pool
+from app.utils.profile_cache import profile_cache
+from common.db_engine import pool_stats
+from common.metrics import setup_metrics
+from common.sql_profiler import setup_sql_profiler, sql_profiler
+from app.dependencies import get_current_user
+from app.utils.security import check_admin_privileges
 from datetime import datetime
 
 # Création de l'application FastAPI
@@ -19,6 +28,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métriques Prometheus (GET /metrics)
+setup_metrics(
+    app,
+    engines=[engine],
+    collectors={
+        "db_pool": lambda: pool_stats(engine),
+        "profile_cache": profile_cache.stats,
+        "password_pool": lambda: {
+            "workers": password_pool.workers,
+            "pending": password_pool.pending,
+            "rejected": password_pool.rejected,
+        },
+    }
+)
+
+# Profilage SQL par requête (en-têtes X-DB-* si SQL_PROFILER_DEBUG=true)
+setup_sql_profiler(app, engines=[engine])
+
 # Include the routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(users.router, prefix="/users", tags=["users"])
@@ -55,7 +82,49 @@ def create_first_admin():
     finally:
         db.close()
 
+def sync_profile_cache():
+    db = SessionLocal()
+    try:
+        return profile_cache.sync(db)
+    finally:
+        db.close()
+
+async def profile_cache_sync_loop():
+    """Applique périodiquement les invalidations de profils publiées par les autres workers."""
+    while True:
+        try:
+            await run_in_threadpool(sync_profile_cache)
+        except Exception as e:
+            print(f"❌ Erreur lors de la synchronisation du cache des profils : {e}")
+        await asyncio.sleep(profile_cache.sync_interval)
+
+@app.on_event("startup")
+async def start_profile_cache_sync():
+    app.state.profile_cache_sync_task = asyncio.create_task(profile_cache_sync_loop())
+
+@app.on_event("shutdown")
+async def stop_profile_cache_sync():
+    task = getattr(app.state, "profile_cache_sync_task", None)
+    if task is not None:
+        task.cancel()
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    """Arrête le pool de threads bcrypt."""
+    password_pool.shutdown()
+
 @app.get("/")
 def health_check():
     """Endpoint pour vérifier si l'API fonctionne bien."""
     return {"status": "OK", "security": "ACTIVE"}
+
+@app.get("/db/pool")
+def database_pool_stats():
+    """Statistiques du pool de connexions MySQL (connexions utilisées, attentes, débordements)."""
+    return pool_stats(engine)
+
+@app.get("/db/profiles")
+def sql_profiles(n_plus_one_only: bool = False, current_user: dict = Depends(get_current_user)):
+    """Profils SQL échantillonnés (nombre de requêtes, temps en base, instructions lentes, N+1)."""
+    check_admin_privileges(current_user)
+    return {"stats": sql_profiler.stats(), "profiles": sql_profiler.profiles(n_plus_one_only)}
@@ -1,21 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
 from app.schemas import Token
-from app.utils.security import verify_password, create_access_token
+from app.utils.security import verify_password_async, create_access_token
 
 router = APIRouter()
 
+def get_user_by_email(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
 @router.post("/token", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
+    # Requête SQL et bcrypt sont exécutés hors de la boucle d'événements
+    user = await run_in_threadpool(get_user_by_email, db, form_data.username)
+
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await verify_password_async(form_data.password, user.hashed_password)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Identifiants incorrects",
@@ -30,5 +39,10 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Rehachage transparent lorsque le coût bcrypt configuré a changé
+    if new_hash:
+        user.hashed_password = new_hash
+        await run_in_threadpool(db.commit)
+
     access_token = create_access_token(data={"sub": user.email, "role": user.role})
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -1,12 +1,20 @@
+import time
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models import User
 from ..schemas import UserOut
 from ..dependencies import get_current_user
+from ..utils.profile_cache import profile_cache
+from ..utils.security import check_admin_privileges
 
 router = APIRouter()
 
+def load_profile(db: Session, email: str):
+    user = db.query(User).filter(User.email == email).first()
+    return UserOut.from_orm(user).dict() if user else None
+
 @router.get("/me", response_model=UserOut)
 async def get_current_user_info(
     current_user: dict = Depends(get_current_user),
@@ -14,14 +22,31 @@ async def get_current_user_info(
 ):
     """
     Récupère les informations de l'utilisateur connecté à partir du token JWT.
+    Le profil est servi depuis le cache ; la base n'est lue qu'en cas d'absence.
     """
-    # Récupérer l'utilisateur complet depuis la base de données
-    user = db.query(User).filter(User.email == current_user["email"]).first()
+    start = time.perf_counter()
+    email = current_user["email"]
+    profile = profile_cache.get(email)
+    if profile is not None:
+        profile_cache.observe(time.perf_counter() - start, hit=True)
+        return profile
+
+    # Récupérer l'utilisateur complet depuis la base de données, hors de la boucle d'événements
+    version = profile_cache.version()
+    profile = await run_in_threadpool(load_profile, db, email)
     
-    if not user:
+    if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    
-    return user 
\ No newline at end of file
+
+    profile_cache.set(email, profile, version)
+    profile_cache.observe(time.perf_counter() - start, hit=False)
+    return profile
+
+@router.get("/me/cache-stats")
+def get_profile_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Statistiques du cache des profils (taux de succès, latence moyenne)."""
+    check_admin_privileges(current_user)
+    return profile_cache.stats()
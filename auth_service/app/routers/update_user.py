@@ -4,6 +4,7 @@ from ..database import get_db
 from ..models import User
 from ..schemas import UserUpdate
 from ..dependencies import get_current_user
+from ..utils.profile_cache import profile_cache, publish_invalidation
 
 router = APIRouter()
 
@@ -29,6 +30,8 @@ def update_user(
             detail="User not found"
         )
 
+    previous_email = user.email
+
     # Update fields as needed
     if user_update.first_name:
         user.first_name = user_update.first_name
@@ -41,7 +44,10 @@ def update_user(
 
     # Commit changes
     try:
+        publish_invalidation(db, previous_email, user.email)
         db.commit()
+        # Invalidate the cached profile so the change applies immediately
+        profile_cache.invalidate(previous_email, user.email)
         db.refresh(user)
         return user
     except Exception as e:
@@ -1,33 +1,171 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import List, Optional
+import hashlib
+import json
 from ..database import get_db
 from ..models import User
-from ..schemas import UserCreate, UserOut, DeactivationReason
-from ..utils.security import get_password_hash, check_admin_privileges
+from ..schemas import UserCreate, UserOut, DeactivationReason, UserLookup
+from ..utils.security import get_password_hash_async, check_admin_privileges
 from ..dependencies import get_current_user
+from ..utils.profile_cache import profile_cache, publish_invalidation
 
 router = APIRouter()
 
 ALLOWED_ROLES = ["admin", "manager", "cashier"]
 
-# Endpoint pour récupérer tous les utilisateurs, réservé aux administrateurs
+# Champs pouvant être demandés via le paramètre `fields` (ceux de UserOut)
+USER_FIELDS = list(UserOut.__fields__)
+
+# Nombre maximal d'identifiants / emails par appel à /users/lookup
+MAX_LOOKUP_SIZE = 1000
+
+def parse_fields(fields: Optional[List[str]]) -> List[str]:
+    """Valide la projection demandée ; l'id est toujours renvoyé."""
+    if not fields:
+        return USER_FIELDS
+    unknown = [field for field in fields if field not in USER_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(USER_FIELDS)}"
+        )
+    return ["id"] + [field for field in fields if field != "id"]
+
+def projected_query(db: Session, fields: List[str]):
+    """Requête ne lisant que les colonnes demandées."""
+    return db.query(*[getattr(User, field) for field in fields])
+
+def rows_to_dicts(rows, fields: List[str]) -> List[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+def etag_response(request: Request, payload, headers: Optional[dict] = None) -> Response:
+    """
+    Renvoie `payload` en JSON avec un ETag ; si le client présente le même ETag
+    (If-None-Match), répond 304 sans corps.
+    """
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":"), sort_keys=True)
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+    headers = dict(headers or {}, ETag=etag)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Endpoint pour récupérer les utilisateurs, réservé aux administrateurs
 @router.get("/", response_model=list[UserOut], tags=["users"])
 def get_users(
+    request: Request,
+    cursor: Optional[int] = Query(None, description="Id du dernier utilisateur de la page précédente (en-tête X-Next-Cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page ; sans limite, tous les utilisateurs sont renvoyés"),
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules (ex. id,first_name,last_name,role)"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     # Vérification des privilèges d'accès : seul un admin peut voir la liste des utilisateurs
     check_admin_privileges(current_user)
+
+    selected_fields = parse_fields(fields.split(",") if fields else None)
+
+    # Pagination par clé sur l'id, filtres sur le rôle et le statut du compte
+    query = projected_query(db, selected_fields).order_by(User.id)
+    if cursor is not None:
+        query = query.filter(User.id > cursor)
+    if role is not None:
+        query = query.filter(User.role == role)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+
+    headers = {}
+    if limit is not None:
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = str(rows[-1][0])
+    else:
+        rows = query.all()
+
+    return etag_response(request, rows_to_dicts(rows, selected_fields), headers)
+
+@router.post("/lookup", tags=["users"])
+def lookup_users(
+    lookup: UserLookup,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Résout en un seul appel une liste d'identifiants et/ou d'emails."""
+    check_admin_privileges(current_user)
+
+    if len(lookup.ids) + len(lookup.emails) > MAX_LOOKUP_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_LOOKUP_SIZE} ids and emails per lookup"
+        )
+
+    selected_fields = parse_fields(lookup.fields)
+    # L'email sert à calculer les emails introuvables, même s'il n'est pas demandé
+    query_fields = selected_fields + (["email"] if lookup.emails and "email" not in selected_fields else [])
+
+    criteria = []
+    if lookup.ids:
+        criteria.append(User.id.in_(lookup.ids))
+    if lookup.emails:
+        criteria.append(User.email.in_(lookup.emails))
+    rows = projected_query(db, query_fields).filter(or_(*criteria)).order_by(User.id).all() if criteria else []
+    users = rows_to_dicts(rows, query_fields)
+
+    found_ids = {user["id"] for user in users}
+    found_emails = {user["email"].lower() for user in users if user.get("email")}
+    payload = {
+        "users": [{field: user[field] for field in selected_fields} for user in users],
+        "missing_ids": [user_id for user_id in lookup.ids if user_id not in found_ids],
+        "missing_emails": [email for email in lookup.emails if email.lower() not in found_emails],
+    }
+    return etag_response(request, payload)
+
+
+def check_user_unique(db: Session, user: UserCreate):
+    # Vérification de l'unicité de l'email
+    existing_user = db.query(User).filter(User.email == user.email).first()
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already in use"
+        )
     
-    # Récupérer la liste des utilisateurs
-    users = db.query(User).all()
-    return users
+    # Vérification de l'unicité du numéro de carte d'identité
+    existing_id_card = db.query(User).filter(User.id_card_number == user.id_card_number).first()
+    if existing_id_card:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ID card number already in use"
+        )
 
+def insert_user(db: Session, user: UserCreate, hashed_password: str) -> User:
+    role_value = user.role.value if hasattr(user.role, "value") else user.role
+    db_user = User(
+        first_name=user.first_name,
+        last_name=user.last_name,
+        birth_date=user.birth_date,
+        id_card_number=user.id_card_number,
+        email=user.email,
+        hashed_password=hashed_password,
+        role=role_value,
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
 
 # Endpoint pour créer un utilisateur (réservé aux administrateurs)
 @router.post("/", response_model=UserOut)
-def create_user(
+async def create_user(
     user: UserCreate,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
@@ -63,38 +201,13 @@ def create_user(
             detail="ID card number is required"
         )
     
-    # Vérification de l'unicité de l'email
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already in use"
-        )
-    
-    # Vérification de l'unicité du numéro de carte d'identité
-    existing_id_card = db.query(User).filter(User.id_card_number == user.id_card_number).first()
-    if existing_id_card:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="ID card number already in use"
-        )
+    # Requêtes SQL et bcrypt sont exécutés hors de la boucle d'événements
+    await run_in_threadpool(check_user_unique, db, user)
+    hashed_password = await get_password_hash_async(user.password)
     
     # Tentative de création de l'utilisateur
     try:
-        hashed_password = get_password_hash(user.password)
-        role_value = user.role.value if hasattr(user.role, "value") else user.role
-        db_user = User(
-            first_name=user.first_name,
-            last_name=user.last_name,
-            birth_date=user.birth_date,
-            id_card_number=user.id_card_number,
-            email=user.email,
-            hashed_password=hashed_password,
-            role=role_value,
-        )
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        db_user = await run_in_threadpool(insert_user, db, user, hashed_password)
         return UserOut.from_orm(db_user)
     except Exception as e:
         # En développement, renvoyer l'exception complète pour faciliter le débogage
@@ -134,7 +247,10 @@ def deactivate_user(
         user.deactivation_reason = None
         message = f"User {user_id} has been reactivated"
 
+    publish_invalidation(db, user.email)
     db.commit()
+    # Le changement de statut doit être visible immédiatement sur /users/me
+    profile_cache.invalidate(user.email)
     db.refresh(user)
 
     return {"message": message}
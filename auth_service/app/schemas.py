@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
 # Existing schemas
 class UserCreate(BaseModel):
@@ -45,3 +45,8 @@ class Token(BaseModel):
 
 class DeactivationReason(BaseModel):
     reason: str
+
+class UserLookup(BaseModel):
+    ids: List[int] = []
+    emails: List[EmailStr] = []
+    fields: Optional[List[str]] = None  # Champs à renvoyer (tous les champs de UserOut par défaut)
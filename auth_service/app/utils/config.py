@@ -5,6 +5,10 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int
     database_url: str
+    # Hachage des mots de passe (bcrypt) hors de la boucle d'événements
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 32
+    bcrypt_rounds: int = 12
 
     class Config:
         env_file = ".env"
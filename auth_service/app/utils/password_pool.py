@@ -0,0 +1,47 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from .config import settings
+
+
+class PasswordHashPool:
+    """
+    Exécute les calculs bcrypt dans un pool de threads borné.
+
+    bcrypt libère le GIL pendant le hachage : des threads suffisent pour que la
+    boucle d'événements continue de servir les autres requêtes. Au-delà de
+    `max_pending` calculs en cours ou en attente, les nouvelles demandes sont
+    refusées (503 + Retry-After) plutôt que mises en file indéfiniment.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Modifié uniquement depuis la boucle d'événements : pas besoin de verrou
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_pool = PasswordHashPool(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Marge de relecture des invalidations : NOW(6) est l'heure de début de
+# l'instruction, la ligne peut devenir visible un peu après son horodatage
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class ProfileCache:
+    """
+    Cache LRU borné, avec durée de vie, des profils renvoyés par /users/me.
+
+    Les écritures sur un utilisateur doivent appeler `publish_invalidation` dans
+    leur transaction, puis `invalidate` après le commit. Le cache est propre à
+    chaque worker : les autres workers appliquent l'invalidation en relisant la
+    table `profile_invalidations` toutes les `sync_interval` secondes (`sync`).
+    Une lecture commencée avant une invalidation ne peut pas réinsérer une
+    valeur périmée : `set` est ignoré si le numéro de version a changé depuis
+    `version()`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 60, sync_interval: float = 2.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        # Invalidations déjà appliquées (email -> horodatage), dans la marge de relecture
+        self._seen: Dict[str, datetime] = {}
+        self._synced_until: Optional[datetime] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, profile: Dict, version: int):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (profile, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: Optional[str]):
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            for key in keys:
+                if key:
+                    self._entries.pop(key, None)
+
+    def sync(self, db: Session) -> int:
+        """Applique les invalidations publiées par les autres workers ; renvoie leur nombre."""
+        if self._synced_until is None:
+            # Cache vide au démarrage : seules les invalidations à venir comptent
+            self._synced_until = db.execute(text("SELECT NOW(6)")).scalar()
+            return 0
+
+        rows = db.execute(
+            text(
+                "SELECT email, invalidated_at FROM profile_invalidations "
+                "WHERE invalidated_at >= :since"
+            ),
+            {"since": self._synced_until - SYNC_OVERLAP},
+        ).fetchall()
+        fresh = [(email, at) for email, at in rows if self._seen.get(email) != at]
+        if fresh:
+            self.invalidate(*[email for email, _ in fresh])
+            with self._lock:
+                self.remote_invalidations += len(fresh)
+            for email, at in fresh:
+                self._seen[email] = at
+            self._synced_until = max(self._synced_until, max(at for _, at in fresh))
+        horizon = self._synced_until - SYNC_OVERLAP
+        self._seen = {email: at for email, at in self._seen.items() if at >= horizon}
+        return len(fresh)
+
+    def observe(self, seconds: float, hit: bool):
+        """Enregistre la durée d'une résolution de profil (succès ou échec du cache)."""
+        with self._lock:
+            if hit:
+                self.hit_time += seconds
+            else:
+                self.miss_time += seconds
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "remote_invalidations": self.remote_invalidations,
+                "sync_interval": self.sync_interval,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "avg_hit_latency_ms": (self.hit_time / self.hits * 1000) if self.hits else 0.0,
+                "avg_miss_latency_ms": (self.miss_time / self.misses * 1000) if self.misses else 0.0,
+            }
+
+
+def publish_invalidation(db: Session, *emails: Optional[str]):
+    """Signale aux autres workers la modification des profils, dans la transaction de l'appelant."""
+    for email in {email for email in emails if email}:
+        db.execute(
+            text(
+                "INSERT INTO profile_invalidations (email, invalidated_at) VALUES (:email, NOW(6)) "
+                "ON DUPLICATE KEY UPDATE invalidated_at = NOW(6)"
+            ),
+            {"email": email},
+        )
+
+
+profile_cache = ProfileCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("PROFILE_CACHE_TTL", "60")),
+    sync_interval=float(os.getenv("PROFILE_CACHE_SYNC_INTERVAL", "2")),
+)
@@ -20,6 +20,13 @@ CREATE TABLE IF NOT EXISTS users (
     deactivation_reason VARCHAR(255) NULL
 );
 
+-- Dernière modification de chaque profil, relue par les workers pour invalider leur cache
+CREATE TABLE IF NOT EXISTS profile_invalidations (
+    email VARCHAR(255) PRIMARY KEY,
+    invalidated_at TIMESTAMP(6) NOT NULL,
+    INDEX ix_profile_invalidations_invalidated_at (invalidated_at)
+);
+
 -- Création d'un utilisateur pour le service d'authentification
 CREATE USER IF NOT EXISTS 'auth_user'@'%' IDENTIFIED BY 'auth_password';
 GRANT ALL PRIVILEGES ON auth_db.* TO 'auth_user'@'%';
@@ -0,0 +1 @@
+# Modules partagés par les microservices (auth_service, sales_service, stock_service)
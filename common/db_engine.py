@@ -0,0 +1,164 @@
+"""
+Fabrique commune des moteurs SQLAlchemy des microservices.
+
+Le pool de connexions est réglé par variables d'environnement :
+- DB_POOL_SIZE        : connexions gardées ouvertes (10 par défaut)
+- DB_MAX_OVERFLOW     : connexions supplémentaires autorisées en pic (20 par défaut)
+- DB_POOL_TIMEOUT     : attente maximale d'une connexion libre, en secondes (30 par défaut)
+- DB_POOL_RECYCLE     : âge maximal d'une connexion avant renouvellement, en secondes
+                        (1800 par défaut, sous le wait_timeout de MySQL)
+- DB_POOL_PRE_PING    : vérifie la connexion avant usage pour écarter les connexions
+                        coupées pendant une période d'inactivité (true par défaut)
+
+Les mêmes réglages s'appliquent aux moteurs asynchrones (`create_async_db_engine`).
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Moteurs créés par ce processus, indexés par nom de service
+engines: Dict[str, Engine] = {}
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class PoolStats:
+    """Compteurs d'utilisation d'un pool de connexions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_time_total += seconds
+            self.wait_time_max = max(self.wait_time_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "wait_time_total_s": round(self.wait_time_total, 6),
+                "wait_time_max_s": round(self.wait_time_max, 6),
+                "wait_time_avg_s": round(self.wait_time_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+class MonitoredQueuePool(QueuePool):
+    """QueuePool qui mesure le temps d'attente d'une connexion libre."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class MonitoredAsyncAdaptedQueuePool(MonitoredQueuePool, AsyncAdaptedQueuePool):
+    """Variante de MonitoredQueuePool pour les pilotes asyncio (aiomysql)."""
+
+
+def _attach_pool_events(engine: Engine):
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = engine.pool
+        pool.stats.increment("checkouts")
+        if pool.overflow() > 0:
+            pool.stats.increment("overflow_checkouts")
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        engine.pool.stats.increment("connects")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        engine.pool.stats.increment("invalidations")
+
+
+def _pool_options(poolclass) -> Dict:
+    return {
+        "poolclass": poolclass,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def create_db_engine(url: str, name: str, **overrides) -> Engine:
+    """Crée le moteur d'un service avec les réglages de pool communs."""
+    options = _pool_options(MonitoredQueuePool)
+    options.update(overrides)
+    engine = create_engine(url, **options)
+    _attach_pool_events(engine)
+    engines[name] = engine
+    return engine
+
+
+def create_async_db_engine(url: str, name: str, **overrides):
+    """Crée un moteur asynchrone (AsyncEngine) avec les mêmes réglages de pool."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    options = _pool_options(MonitoredAsyncAdaptedQueuePool)
+    options.update(overrides)
+    async_engine = create_async_engine(url, **options)
+    # Les événements et les statistiques portent sur le moteur synchrone sous-jacent
+    _attach_pool_events(async_engine.sync_engine)
+    engines[name] = async_engine.sync_engine
+    return async_engine
+
+
+def pool_stats(engine: Optional[Engine] = None, name: Optional[str] = None) -> Dict:
+    """Statistiques instantanées du pool d'un moteur (par objet ou par nom)."""
+    engine = engine or engines[name]
+    pool = engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_s": pool.timeout(),
+    }
+    stats.update(pool.stats.snapshot())
+    return stats
@@ -0,0 +1,225 @@
+"""
+Métriques d'exécution des microservices, exposées au format texte Prometheus sur /metrics.
+
+- http_requests_total / http_request_duration_seconds : par méthode et par route
+  (modèle de chemin, ex. /sales/{sale_id}, pour borner le nombre de séries)
+- http_requests_in_flight : requêtes en cours
+- db_time_per_request_seconds : temps passé en base par requête (événements du moteur)
+- outbound_http_duration_seconds : appels HTTP sortants (hooks httpx), par hôte
+- jauges libres fournies par les services (caches, pool de connexions...)
+
+Usage :
+    setup_metrics(app, engines=[engine], collectors={"db_pool": lambda: pool_stats(engine)})
+"""
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Temps passé en base par la requête en cours : un conteneur mutable partagé
+# avec les threads du pool (le contexte y est copié) et les greenlets d'AsyncSession
+_db_time: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("db_time", default=None)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def expose(self) -> List[str]:
+        lines = super().expose()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [compteurs par borne..., somme, nombre]
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for index, bound in enumerate(self.buckets):
+                    lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {series[index]}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route"))
+        self.in_flight = Gauge("http_requests_in_flight", "Requêtes HTTP en cours")
+        self.db_time = Histogram("db_time_per_request_seconds", "Temps passé en base par requête", ("method", "route"))
+        self.outbound = Histogram(
+            "outbound_http_duration_seconds",
+            "Durée des appels HTTP sortants (jusqu'à la réception des en-têtes)",
+            ("host", "method", "status")
+        )
+        self.collectors: Dict[str, Callable[[], Dict]] = {}
+
+    def add_collector(self, prefix: str, collect: Callable[[], Dict]):
+        """Expose les valeurs numériques renvoyées par `collect()` comme jauges `<prefix>_<clé>`."""
+        self.collectors[prefix] = collect
+
+    def expose(self) -> str:
+        lines: List[str] = []
+        for metric in (self.requests, self.latency, self.in_flight, self.db_time, self.outbound):
+            lines.extend(metric.expose())
+        for prefix, collect in self.collectors.items():
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : compte et chronomètre chaque requête, par modèle de route."""
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        db_time = [0.0]
+        token = _db_time.set(db_time)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.registry.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            self.registry.in_flight.dec()
+            _db_time.reset(token)
+            # La route est renseignée dans le scope par le routeur de FastAPI
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.registry.requests.inc(method, path, str(status_code))
+            self.registry.latency.observe(duration, method, path)
+            self.registry.db_time.observe(db_time[0], method, path)
+
+
+def instrument_engine(engine):
+    """Ajoute au temps en base de la requête en cours la durée de chaque instruction SQL."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        holder = _db_time.get()
+        if holder is not None:
+            holder[0] += elapsed
+
+
+def httpx_event_hooks(registry: MetricsRegistry = registry) -> Dict[str, list]:
+    """Hooks d'un httpx.AsyncClient mesurant la durée des appels sortants."""
+    async def on_request(request):
+        request.extensions["metrics_start"] = time.perf_counter()
+
+    async def on_response(response):
+        request = response.request
+        start = request.extensions.get("metrics_start")
+        if start is not None:
+            registry.outbound.observe(
+                time.perf_counter() - start, request.url.host, request.method, str(response.status_code)
+            )
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def setup_metrics(app, engines: Iterable = (), collectors: Optional[Dict[str, Callable[[], Dict]]] = None,
+                  path: str = "/metrics"):
+    """Installe le middleware, instrumente les moteurs et ajoute la route d'exposition."""
+    app.add_middleware(MetricsMiddleware)
+    for engine in engines:
+        instrument_engine(engine)
+    for prefix, collect in (collectors or {}).items():
+        registry.add_collector(prefix, collect)
+
+    async def metrics(request: Request):
+        return PlainTextResponse(registry.expose(), media_type="text/plain; version=0.0.4")
+
+    app.add_route(path, metrics, include_in_schema=False)
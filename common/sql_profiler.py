@@ -0,0 +1,258 @@
+"""
+Profilage SQL par requête HTTP, à partir des événements du moteur SQLAlchemy.
+
+Pour chaque requête : nombre d'instructions, temps total en base, instructions
+les plus lentes avec leur site d'appel, et instructions identiques répétées
+(même SQL, paramètres différents) signalées comme suspicion de N+1.
+
+- SQL_PROFILER_ENABLED (true) : active le profilage
+- SQL_PROFILER_DEBUG (false) : ajoute les en-têtes X-DB-Query-Count, X-DB-Time-Ms
+  et X-DB-N-Plus-One aux réponses
+- SQL_PROFILER_SAMPLE_RATE (0.01) : part des requêtes conservées dans le tampon ;
+  les requêtes suspectes de N+1 sont toujours conservées. Le tirage a lieu au début
+  de la requête : seules les requêtes échantillonnées (ou toutes en mode debug)
+  relèvent le site d'appel de leurs instructions les plus lentes, les autres ne
+  font que compter. Le site d'une instruction répétée (N+1) est relevé une fois,
+  au seuil de répétitions.
+- SQL_PROFILER_BUFFER_SIZE (200) : taille du tampon circulaire
+- SQL_PROFILER_N_PLUS_ONE_THRESHOLD (5) : répétitions à partir desquelles une instruction est suspecte
+- SQL_PROFILER_SLOWEST (5) : instructions les plus lentes gardées par requête
+"""
+import contextvars
+import heapq
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import event
+
+_WHITESPACE = re.compile(r"\s+")
+_STATEMENT_MAX_LENGTH = 500
+# Cadres ignorés pour retrouver le site d'appel dans le code du service
+_LIBRARY_MARKERS = ("site-packages", "dist-packages", os.path.dirname(os.__file__), os.path.abspath(__file__))
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "sql_profile", default=None
+)
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _call_site() -> str:
+    """Premier cadre de la pile appartenant au code du service (hors bibliothèques)."""
+    for frame in reversed(traceback.extract_stack()):
+        if not frame.filename.startswith(_LIBRARY_MARKERS) and "sqlalchemy" not in frame.filename:
+            return f"{os.path.relpath(frame.filename)}:{frame.lineno} in {frame.name}"
+    return "inconnu"
+
+
+class RequestProfile:
+    """Instructions SQL exécutées pendant une requête HTTP."""
+
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        slowest_size: int,
+        n_plus_one_threshold: int,
+        sampled: bool = True,
+        capture_sites: bool = True
+    ):
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.slowest_size = slowest_size
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.sampled = sampled
+        # Lecture de la pile (coûteuse) pour les instructions les plus lentes
+        self.capture_sites = capture_sites
+        # SQL normalisé -> [nombre d'exécutions, durée totale, site d'appel]
+        self.statements: Dict[str, List] = {}
+        self._slowest: List = []
+
+    def record(self, statement: str, duration: float):
+        self.query_count += 1
+        self.db_time += duration
+        entry = self.statements.get(statement)
+        if entry is None:
+            entry = self.statements[statement] = [0, 0.0, None]
+        entry[0] += 1
+        entry[1] += duration
+        if entry[0] == self.n_plus_one_threshold:
+            entry[2] = _call_site()
+
+        # Tas minimal des instructions les plus lentes ; la pile n'est lue que si l'instruction
+        # y entre et que le profil a des chances d'être conservé
+        if len(self._slowest) < self.slowest_size or duration > self._slowest[0][0]:
+            item = (duration, self.query_count, statement, _call_site() if self.capture_sites else None)
+            if len(self._slowest) < self.slowest_size:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heapreplace(self._slowest, item)
+
+    def n_plus_one(self) -> List[Dict]:
+        return [
+            {"statement": statement, "count": count, "total_ms": round(total * 1000, 3), "call_site": call_site}
+            for statement, (count, total, call_site) in self.statements.items()
+            if count >= self.n_plus_one_threshold
+        ]
+
+    def to_dict(self) -> Dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at.isoformat(),
+            "query_count": self.query_count,
+            "db_time_ms": round(self.db_time * 1000, 3),
+            "distinct_statements": len(self.statements),
+            "slowest": [
+                {"statement": statement, "duration_ms": round(duration * 1000, 3), "call_site": call_site}
+                for duration, _, statement, call_site in sorted(self._slowest, reverse=True)
+            ],
+            "n_plus_one": self.n_plus_one(),
+        }
+
+
+class SQLProfiler:
+    def __init__(
+        self,
+        enabled: bool = True,
+        debug: bool = False,
+        sample_rate: float = 0.01,
+        buffer_size: int = 200,
+        n_plus_one_threshold: int = 5,
+        slowest_size: int = 5
+    ):
+        self.enabled = enabled
+        self.debug = debug
+        self.sample_rate = sample_rate
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slowest_size = slowest_size
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self.profiled = 0
+        self.n_plus_one_requests = 0
+
+    def instrument_engine(self, engine):
+        """Rattache les mesures aux instructions exécutées par le moteur."""
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if _current_profile.get() is not None:
+                conn.info.setdefault("profiler_query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            profile = _current_profile.get()
+            starts = conn.info.get("profiler_query_start")
+            if profile is None or not starts:
+                return
+            duration = time.perf_counter() - starts.pop()
+            normalized = _WHITESPACE.sub(" ", statement).strip()[:_STATEMENT_MAX_LENGTH]
+            profile.record(normalized, duration)
+
+    def start(self, method: str, path: str) -> RequestProfile:
+        """Nouveau profil de requête ; l'échantillonnage est tiré dès maintenant."""
+        sampled = random.random() < self.sample_rate
+        return RequestProfile(
+            method, path, self.slowest_size, self.n_plus_one_threshold,
+            sampled=sampled, capture_sites=sampled or self.debug
+        )
+
+    @contextmanager
+    def capture(self, method: str, path: str) -> Iterator[RequestProfile]:
+        """Profil d'un bloc de code exécuté hors requête HTTP (scripts de contrôle, tâches)."""
+        profile = RequestProfile(method, path, self.slowest_size, self.n_plus_one_threshold)
+        token = _current_profile.set(profile)
+        try:
+            yield profile
+        finally:
+            _current_profile.reset(token)
+
+    def finish(self, profile: RequestProfile):
+        """Conserve le profil dans le tampon s'il est échantillonné ou suspect de N+1."""
+        suspect = bool(profile.n_plus_one())
+        with self._lock:
+            self.profiled += 1
+            if suspect:
+                self.n_plus_one_requests += 1
+            if suspect or profile.sampled:
+                self._buffer.append(profile.to_dict())
+
+    def profiles(self, n_plus_one_only: bool = False) -> List[Dict]:
+        """Profils conservés, du plus récent au plus ancien."""
+        with self._lock:
+            profiles = list(reversed(self._buffer))
+        if n_plus_one_only:
+            profiles = [profile for profile in profiles if profile["n_plus_one"]]
+        return profiles
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "profiled": self.profiled,
+                "n_plus_one_requests": self.n_plus_one_requests,
+                "buffered": len(self._buffer),
+            }
+
+
+class SQLProfilerMiddleware:
+    """Middleware ASGI : ouvre un profil par requête et le clôt à la fin de la réponse."""
+
+    def __init__(self, app, profiler: "SQLProfiler" = None):
+        self.app = app
+        self.profiler = profiler or sql_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.start(scope["method"], scope["path"])
+        token = _current_profile.set(profile)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and self.profiler.debug:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(profile.query_count).encode()))
+                headers.append((b"x-db-time-ms", f"{profile.db_time * 1000:.3f}".encode()))
+                headers.append((b"x-db-n-plus-one", str(len(profile.n_plus_one())).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_profile.reset(token)
+            # Modèle de route renseigné par le routeur de FastAPI
+            route = scope.get("route")
+            profile.path = getattr(route, "path", None) or profile.path
+            self.profiler.finish(profile)
+
+
+sql_profiler = SQLProfiler(
+    enabled=_env_flag("SQL_PROFILER_ENABLED", "true"),
+    debug=_env_flag("SQL_PROFILER_DEBUG", "false"),
+    sample_rate=float(os.getenv("SQL_PROFILER_SAMPLE_RATE", "0.01")),
+    buffer_size=int(os.getenv("SQL_PROFILER_BUFFER_SIZE", "200")),
+    n_plus_one_threshold=int(os.getenv("SQL_PROFILER_N_PLUS_ONE_THRESHOLD", "5")),
+    slowest_size=int(os.getenv("SQL_PROFILER_SLOWEST", "5"))
+)
+
+
+def setup_sql_profiler(app, engines=()):
+    """Installe le middleware de profilage et instrumente les moteurs du service."""
+    for engine in engines:
+        sql_profiler.instrument_engine(engine)
+    app.add_middleware(SQLProfilerMiddleware)
@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, TypeVar, Union
 import os
 from dotenv import load_dotenv
+from common.db_engine import create_db_engine, create_async_db_engine
 
 load_dotenv()
 
@@ -11,14 +13,73 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Mode d'accès à la base des routes : "sync" (Session dans le pool de threads)
+# ou "async" (AsyncSession sur le pilote aiomysql)
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+if DB_MODE not in ("sync", "async"):
+    raise ValueError("DB_MODE must be 'sync' or 'async'")
+
+# Réglages du pool : variables DB_POOL_* (voir common/db_engine.py)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL, "sales_service")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or SQLALCHEMY_DATABASE_URL.replace("+pymysql", "+aiomysql", 1)
+    async_engine = create_async_db_engine(ASYNC_DATABASE_URL, "sales_service_async")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 Base = declarative_base()
 
+T = TypeVar("T")
+
+class SyncDatabase:
+    """Exécute le code ORM des routes avec une Session classique, dans le pool de threads."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+class AsyncDatabase:
+    """
+    Exécute le même code ORM sur une AsyncSession (AsyncSession.run_sync) :
+    les attentes réseau rendent la main à la boucle d'événements au lieu
+    d'occuper un thread, la concurrence n'est plus bornée par le pool de threads.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+Database = Union[SyncDatabase, AsyncDatabase]
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_database():
+    """
+    Dépendance des routes : fournit un objet dont `await db.run(fn, ...)` appelle
+    `fn(session, ...)` selon le mode DB_MODE configuré. Les fonctions passées
+    doivent renvoyer des données déjà chargées (schémas Pydantic), la
+    sérialisation ayant lieu hors de la session.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield AsyncDatabase(session)
+    else:
+        session = SessionLocal()
+        try:
+            yield SyncDatabase(session)
+        finally:
+            await run_in_threadpool(session.close)
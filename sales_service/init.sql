@@ -2,59 +2,8 @@
 CREATE DATABASE IF NOT EXISTS sales_db;
 USE sales_db;
 
--- Table des clients
-CREATE TABLE IF NOT EXISTS customers (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    first_name VARCHAR(100) NOT NULL,
-    last_name VARCHAR(100) NOT NULL,
-    email VARCHAR(255),
-    phone VARCHAR(20),
-    address TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-);
-
--- Table des ventes
-CREATE TABLE IF NOT EXISTS sales (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    sale_number VARCHAR(20) UNIQUE NOT NULL,
-    cashier_id INT NOT NULL,
-    customer_id INT,
-    total_amount DECIMAL(10,2) NOT NULL,
-    status ENUM('DRAFT', 'PENDING', 'COMPLETED', 'CANCELLED') NOT NULL DEFAULT 'DRAFT',
-    notes TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE SET NULL
-);
-
--- Table des articles vendus
-CREATE TABLE IF NOT EXISTS sale_items (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    sale_id INT NOT NULL,
-    product_id INT NOT NULL,
-    quantity INT NOT NULL,
-    unit_price DECIMAL(10,2) NOT NULL,
-    total_price DECIMAL(10,2) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE
-);
-
--- Table des transactions
-CREATE TABLE IF NOT EXISTS transactions (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    sale_id INT NOT NULL,
-    amount DECIMAL(10,2) NOT NULL,
-    amount_received DECIMAL(10,2),
-    change_amount DECIMAL(10,2),
-    payment_method ENUM('CASH', 'CARD', 'TRANSFER') NOT NULL,
-    status ENUM('PENDING', 'COMPLETED', 'FAILED', 'REFUNDED') NOT NULL DEFAULT 'PENDING',
-    payment_details JSON,
-    mixed_payments JSON,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE
-);
+-- Les tables et les index sont créés par les migrations versionnées
+-- (sales_service/migrations), appliquées au démarrage du service.
 
 -- Création d'un utilisateur pour le service de ventes
 CREATE USER IF NOT EXISTS 'sales_user'@'%' IDENTIFIED BY 'sales_password';
@@ -6,15 +6,27 @@ import os
 from dotenv import load_dotenv
 
 import models, schemas
-from database import engine, get_db
-from routers import sales, transactions, customers
+from database import engine, async_engine, get_db
+from routers import sales, transactions, customers, reports
 from middleware.auth import get_current_user
+from services.http_client import close_http_client
+from services.cashier_service import cashier_directory, run_startup_backfill
+from services.price_book import price_book
+from services.idempotency import idempotency_store
+from services.customer_search import customer_search_index
+import asyncio
+from common.db_engine import pool_stats
+from migrations import migrate
+from common.metrics import setup_metrics
+from common.sql_profiler import setup_sql_profiler, sql_profiler
+from utils import check_access, ADMIN_ACCESS
+from middleware.auth import token_cache
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Appliquer les migrations du schéma manquantes (remplace create_all)
+applied_migrations = migrate(engine)
 
 app = FastAPI(
     title="Sales Service",
@@ -31,11 +43,83 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métriques Prometheus (GET /metrics)
+setup_metrics(
+    app,
+    engines=[engine] + ([async_engine.sync_engine] if async_engine is not None else []),
+    collectors={
+        "db_pool": lambda: pool_stats(engine),
+        "token_cache": token_cache.stats,
+        **({"db_pool_async": lambda: pool_stats(async_engine.sync_engine)} if async_engine is not None else {}),
+        **({"price_book": price_book.stats} if price_book is not None else {}),
+        **({"customer_search": customer_search_index.stats} if customer_search_index is not None else {}),
+    }
+)
+
+# Profilage SQL par requête (en-têtes X-DB-* si SQL_PROFILER_DEBUG=true)
+setup_sql_profiler(app, engines=[engine] + ([async_engine.sync_engine] if async_engine is not None else []))
+
 # Include routers
 app.include_router(sales.router, prefix="/sales", tags=["sales"])
 app.include_router(transactions.router, prefix="/transactions", tags=["transactions"])
 app.include_router(customers.router, prefix="/customers", tags=["customers"])
+app.include_router(reports.router, prefix="/reports", tags=["reports"])
+
+@app.on_event("startup")
+async def start_cashier_directory():
+    """Charge l'annuaire des caissiers puis le rafraîchit périodiquement."""
+    if cashier_directory.configured:
+        app.state.cashier_directory_task = asyncio.create_task(cashier_directory.run_periodic_refresh())
+        # Colonne cashier_name ajoutée par ce worker : la renseigner une fois l'annuaire chargé
+        if "0005_sale_cashier_name" in applied_migrations:
+            app.state.cashier_backfill_task = asyncio.create_task(run_startup_backfill())
+
+@app.on_event("startup")
+async def start_price_book():
+    """Charge les prix du catalogue puis les synchronise périodiquement."""
+    if price_book is not None:
+        app.state.price_book_task = asyncio.create_task(price_book.run_periodic_refresh())
+
+@app.on_event("startup")
+async def start_idempotency_purge():
+    """Supprime périodiquement les clés d'idempotence périmées."""
+    app.state.idempotency_purge_task = asyncio.create_task(idempotency_store.run_periodic_purge())
+
+@app.on_event("startup")
+async def start_customer_search_index():
+    """Charge l'index de recherche des clients puis le met à jour périodiquement."""
+    if customer_search_index is not None:
+        app.state.customer_search_task = asyncio.create_task(customer_search_index.run_periodic_refresh())
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    """Ferme les pools de connexions (HTTP sortant, moteur asynchrone) à l'arrêt du service."""
+    for name in ("cashier_directory_task", "cashier_backfill_task", "price_book_task", "idempotency_purge_task",
+                 "customer_search_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await close_http_client()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 @app.get("/")
 async def root():
     return {"message": "Sales Service is running"}
+
+
+@app.get("/db/pool")
+async def database_pool_stats():
+    """Statistiques du pool de connexions MySQL (connexions utilisées, attentes, débordements)"""
+    stats = pool_stats(engine)
+    if async_engine is not None:
+        # En mode DB_MODE=async, les routes utilisent le pool du moteur asynchrone
+        stats["async"] = pool_stats(async_engine.sync_engine)
+    return stats
+
+
+@app.get("/db/profiles")
+async def sql_profiles(n_plus_one_only: bool = False, current_user: dict = Depends(get_current_user)):
+    """Profils SQL échantillonnés (nombre de requêtes, temps en base, instructions lentes, N+1)."""
+    check_access(current_user, ADMIN_ACCESS, "profils SQL")
+    return {"stats": sql_profiler.stats(), "profiles": sql_profiler.profiles(n_plus_one_only)}
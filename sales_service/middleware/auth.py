@@ -3,6 +3,7 @@ from fastapi.security import OAuth2PasswordBearer
 from typing import Optional, Dict
 import os
 from services.auth_service import AuthService
+from services.token_cache import TokenCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
@@ -10,15 +11,37 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 # En développement local, utilisez localhost:8001
 # En production (Docker), utilisez auth_service:8000
 auth_service_url = os.getenv("AUTH_SERVICE_URL", "http://localhost:8001")
-auth_service = AuthService(auth_service_url)
+auth_service = AuthService(
+    auth_service_url,
+    secret_key=os.getenv("SECRET_KEY"),
+    algorithm=os.getenv("ALGORITHM", "HS256"),
+    allow_unverified=os.getenv("AUTH_ALLOW_UNVERIFIED_TOKENS", "false").lower() == "true"
+)
+
+# Cache des profils utilisateurs par token, pour éviter un appel au service
+# d'authentification à chaque requête
+token_cache = TokenCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("TOKEN_CACHE_TTL", "30"))
+)
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict:
     """
     Middleware pour récupérer et valider les informations de l'utilisateur connecté.
+    Le token est vérifié localement, et le profil résolu est mis en cache jusqu'à
+    l'expiration du token.
     """
     try:
+        user = token_cache.get(token)
+        if user is not None:
+            return user
+
+        # Signature et expiration vérifiées sans quitter le processus
+        claims = auth_service.decode_token(token)
+
         # Récupérer et valider les informations de l'utilisateur
-        user = auth_service.get_current_user(token)
+        user = await auth_service.get_current_user(token)
+        token_cache.set(token, user, claims.get("exp"))
         return user
     except HTTPException:
         raise
@@ -36,4 +59,4 @@ def check_role_privileges(current_user: Dict, required_role: str):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Access denied: {required_role} privileges required"
-        ) 
\ No newline at end of file
+        )
@@ -0,0 +1,29 @@
+"""
+Index composites choisis d'après les requêtes des routeurs :
+
+- transactions (sale_id, status) : GET /transactions/sale/{id}, chargement des
+  transactions d'une page de ventes (selectin sur sale_id), annulation et
+  rapprochement (transactions terminées d'une vente)
+- transactions (payment_method, created_at) : filtre payment_method de GET /transactions/
+- sale_items (sale_id, product_id) : chargement des articles d'une page de ventes
+  et export par article
+- sales (cashier_id, status, created_at) : filtres caissier + statut de GET /sales/
+  (un caissier ne voit que ses ventes) et de l'export
+- sales (customer_id, created_at) : historique des ventes d'un client
+
+Les index créés implicitement pour les clés étrangères sale_id et customer_id
+sont supprimés par MySQL dès qu'un index commençant par la même colonne existe.
+"""
+from migrations.operations import create_index
+
+INDEXES = [
+    ("transactions", "ix_transactions_sale_id_status", ["sale_id", "status"]),
+    ("transactions", "ix_transactions_payment_method_created_at", ["payment_method", "created_at"]),
+    ("sale_items", "ix_sale_items_sale_id_product_id", ["sale_id", "product_id"]),
+    ("sales", "ix_sales_cashier_status_created_at", ["cashier_id", "status", "created_at"]),
+    ("sales", "ix_sales_customer_created_at", ["customer_id", "created_at"]),
+]
+
+def upgrade(connection):
+    for table, name, columns in INDEXES:
+        create_index(connection, table, name, columns)
@@ -0,0 +1,60 @@
+"""
+Colonnes normalisées de la recherche des clients (services/customer_search.py) :
+nom sans accents ni casse, téléphone réduit à ses chiffres, email en minuscules.
+Les lignes existantes sont remplies par paquets ; (updated_at, id) sert au
+rafraîchissement incrémental de l'index en mémoire.
+"""
+from sqlalchemy import text
+from migrations.operations import column_exists, create_index
+from services.customer_search import normalize_email, normalize_name, normalize_phone
+
+COLUMNS = [
+    ("normalized_name", "VARCHAR(201)"),
+    ("normalized_phone", "VARCHAR(20)"),
+    ("normalized_email", "VARCHAR(255)"),
+]
+
+INDEXES = [
+    ("customers", "ix_customers_normalized_name", ["normalized_name"]),
+    ("customers", "ix_customers_normalized_phone", ["normalized_phone"]),
+    ("customers", "ix_customers_normalized_email", ["normalized_email"]),
+    ("customers", "ix_customers_updated_at_id", ["updated_at", "id"]),
+]
+
+BATCH_SIZE = 5000
+
+def upgrade(connection):
+    for name, definition in COLUMNS:
+        if not column_exists(connection, "customers", name):
+            connection.execute(text(f"ALTER TABLE customers ADD COLUMN {name} {definition}"))
+
+    # updated_at n'est pas modifié : le remplissage ne doit pas passer pour une mise à jour
+    statement = text(
+        "UPDATE customers SET normalized_name = :name, normalized_phone = :phone, "
+        "normalized_email = :email, updated_at = updated_at WHERE id = :row_id"
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text(
+                "SELECT id, first_name, last_name, email, phone FROM customers "
+                "WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        connection.execute(statement, [
+            {
+                "row_id": row.id,
+                "name": normalize_name(row.first_name, row.last_name),
+                "phone": normalize_phone(row.phone),
+                "email": normalize_email(row.email),
+            }
+            for row in rows
+        ])
+        connection.commit()
+        last_id = rows[-1].id
+
+    for table, name, columns in INDEXES:
+        create_index(connection, table, name, columns)
@@ -0,0 +1,49 @@
+"""
+Montants payé et restant des ventes (sales.paid_amount / remaining_amount).
+
+Sur une base créée avant ces colonnes, elles sont ajoutées puis calculées par
+paquets à partir des transactions terminées : remaining_amount = total_amount
+- paid_amount, et non la valeur par défaut 0 qui ferait passer toutes les
+ventes existantes pour payées.
+"""
+from sqlalchemy import text
+from migrations.operations import column_exists, create_index
+
+COLUMNS = [
+    ("paid_amount", "DECIMAL(10,2) NOT NULL DEFAULT 0"),
+    ("remaining_amount", "DECIMAL(10,2) NOT NULL DEFAULT 0"),
+]
+
+BATCH_SIZE = 5000
+
+def upgrade(connection):
+    added = False
+    for name, definition in COLUMNS:
+        if not column_exists(connection, "sales", name):
+            connection.execute(text(f"ALTER TABLE sales ADD COLUMN {name} {definition}"))
+            added = True
+
+    if added:
+        _backfill(connection)
+
+    # Filtre payment_status de GET /sales/
+    create_index(connection, "sales", "ix_sales_remaining_paid", ["remaining_amount", "paid_amount"])
+
+def _backfill(connection):
+    # updated_at n'est pas modifié : le remplissage ne doit pas passer pour une mise à jour
+    statement = text(
+        "UPDATE sales s "
+        "LEFT JOIN ("
+        " SELECT sale_id, SUM(amount) AS paid FROM transactions"
+        " WHERE status = 'COMPLETED' AND sale_id > :start AND sale_id <= :end"
+        " GROUP BY sale_id"
+        ") t ON t.sale_id = s.id "
+        "SET s.paid_amount = COALESCE(t.paid, 0), "
+        "s.remaining_amount = s.total_amount - COALESCE(t.paid, 0), "
+        "s.updated_at = s.updated_at "
+        "WHERE s.id > :start AND s.id <= :end"
+    )
+    last_id = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM sales")).scalar()
+    for start in range(0, last_id, BATCH_SIZE):
+        connection.execute(statement, {"start": start, "end": start + BATCH_SIZE})
+        connection.commit()
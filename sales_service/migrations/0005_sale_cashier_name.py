@@ -0,0 +1,15 @@
+"""
+Nom du caissier dénormalisé sur les ventes (sales.cashier_name).
+
+Sur une base créée avant cette colonne, elle est ajoutée vide : les noms sont
+dans le service d'authentification, que la migration ne peut pas appeler. Le
+worker qui applique cette migration les renseigne dès que l'annuaire des
+caissiers est chargé (services/cashier_service.py), ce que fait aussi
+`python -m services.cashier_service`.
+"""
+from sqlalchemy import text
+from migrations.operations import column_exists
+
+def upgrade(connection):
+    if not column_exists(connection, "sales", "cashier_name"):
+        connection.execute(text("ALTER TABLE sales ADD COLUMN cashier_name VARCHAR(200) AFTER cashier_id"))
@@ -0,0 +1,69 @@
+"""
+Tables ajoutées au schéma initial et index de pagination :
+
+- sale_number_counters : blocs de numéros de vente réservés par les workers
+  (services/sale_number_allocator.py)
+- daily_sales_summary : totaux journaliers des rapports (services/daily_summary.py),
+  calculés depuis les transactions existantes lorsque la table est créée
+- idempotency_keys : réponses des requêtes idempotentes (services/idempotency.py)
+- index (created_at, id) de la pagination par curseur et index des filtres de listing
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from migrations.operations import create_index, table_exists
+from services.daily_summary import rebuild_daily_summary
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS sale_number_counters (
+        day DATE PRIMARY KEY,
+        next_value INT NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS daily_sales_summary (
+        day DATE NOT NULL,
+        cashier_id INT NOT NULL,
+        payment_method ENUM('CASH', 'CARD', 'TRANSFER') NOT NULL,
+        transactions_count INT NOT NULL DEFAULT 0,
+        gross_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+        refunds_count INT NOT NULL DEFAULT 0,
+        refunds_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+        change_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, cashier_id, payment_method)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        `key` CHAR(64) PRIMARY KEY,
+        request_hash CHAR(64) NOT NULL,
+        status ENUM('IN_PROGRESS', 'COMPLETED') NOT NULL,
+        response_status INT,
+        response_body TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        INDEX ix_idempotency_keys_expires_at (expires_at)
+    )
+    """,
+]
+
+# Index de la pagination par curseur (created_at, id) et des filtres de listing
+INDEXES = [
+    ("customers", "ix_customers_created_at_id", ["created_at", "id"]),
+    ("sales", "ix_sales_created_at_id", ["created_at", "id"]),
+    ("sales", "ix_sales_cashier_created_at", ["cashier_id", "created_at"]),
+    ("sales", "ix_sales_status_created_at", ["status", "created_at"]),
+    ("transactions", "ix_transactions_created_at_id", ["created_at", "id"]),
+    ("transactions", "ix_transactions_status_created_at", ["status", "created_at"]),
+]
+
+def upgrade(connection):
+    summary_created = not table_exists(connection, "daily_sales_summary")
+    for statement in TABLES:
+        connection.execute(text(statement))
+    for table, name, columns in INDEXES:
+        create_index(connection, table, name, columns)
+
+    if summary_created:
+        # Totaux des paiements et remboursements déjà enregistrés
+        rebuild_daily_summary(Session(bind=connection))
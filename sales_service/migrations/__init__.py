@@ -0,0 +1,83 @@
+"""
+Migrations versionnées du schéma sales_db.
+
+Chaque module NNNN_description.py de ce dossier définit `upgrade(connection)`.
+Les versions appliquées sont enregistrées dans la table schema_migrations ; au
+démarrage, le service applique les migrations manquantes, dans l'ordre, sous un
+verrou MySQL (GET_LOCK) pour que plusieurs workers ne migrent pas en même temps.
+MySQL ne sait pas annuler un ALTER : chaque migration doit pouvoir être rejouée
+(IF NOT EXISTS, operations.create_index...).
+
+Depuis le dossier sales_service :
+    python -m migrations            # applique les migrations manquantes
+    python -m migrations --status   # liste les migrations et leur état
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from typing import List, NamedTuple, Set
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "sales_db_schema_migrations"
+LOCK_TIMEOUT = 300
+_MODULE_NAME = re.compile(r"^(\d{4})_(\w+)$")
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    module: object
+
+def discover() -> List[Migration]:
+    """Migrations du dossier, triées par version."""
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(module_info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{module_info.name}")
+            migrations.append(Migration(int(match.group(1)), module_info.name, module))
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Deux migrations portent le même numéro de version")
+    return sorted(migrations)
+
+def _ensure_version_table(connection: Connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INT PRIMARY KEY,"
+        " name VARCHAR(255) NOT NULL,"
+        " applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        ")"
+    ))
+    connection.commit()
+
+def applied_versions(connection: Connection) -> Set[int]:
+    _ensure_version_table(connection)
+    return set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+def migrate(engine: Engine) -> List[str]:
+    """Applique les migrations manquantes ; retourne les noms des migrations appliquées."""
+    applied = []
+    with engine.connect() as connection:
+        if connection.execute(text("SELECT GET_LOCK(:name, :timeout)"),
+                              {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT}).scalar() != 1:
+            raise RuntimeError("Verrou des migrations non obtenu")
+        try:
+            done = applied_versions(connection)
+            for migration in discover():
+                if migration.version in done:
+                    continue
+                logger.info("Application de la migration %s", migration.name)
+                migration.module.upgrade(connection)
+                connection.execute(
+                    text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                    {"version": migration.version, "name": migration.name}
+                )
+                connection.commit()
+                applied.append(migration.name)
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+    return applied
@@ -0,0 +1,21 @@
+import argparse
+from database import engine
+from migrations import applied_versions, discover, migrate
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrations du schéma sales_db")
+    parser.add_argument("--status", action="store_true", help="Lister les migrations sans les appliquer")
+    args = parser.parse_args()
+
+    if args.status:
+        with engine.connect() as connection:
+            done = applied_versions(connection)
+        for migration in discover():
+            print(f"[{'x' if migration.version in done else ' '}] {migration.name}")
+        return
+
+    applied = migrate(engine)
+    print(f"{len(applied)} migration(s) appliquée(s)" + (" : " + ", ".join(applied) if applied else ""))
+
+if __name__ == "__main__":
+    main()
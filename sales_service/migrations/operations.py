@@ -0,0 +1,39 @@
+from typing import Sequence
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+def index_exists(connection: Connection, table: str, name: str) -> bool:
+    return connection.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :name"
+        ),
+        {"table": table, "name": name}
+    ).scalar() > 0
+
+def table_exists(connection: Connection, name: str) -> bool:
+    return connection.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = :name"
+        ),
+        {"name": name}
+    ).scalar() > 0
+
+def column_exists(connection: Connection, table: str, name: str) -> bool:
+    return connection.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = :table AND column_name = :name"
+        ),
+        {"table": table, "name": name}
+    ).scalar() > 0
+
+def create_index(connection: Connection, table: str, name: str, columns: Sequence[str]):
+    """Crée l'index s'il n'existe pas encore (MySQL n'a pas de CREATE INDEX IF NOT EXISTS)."""
+    if not index_exists(connection, table, name):
+        connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+def drop_index(connection: Connection, table: str, name: str):
+    if index_exists(connection, table, name):
+        connection.execute(text(f"DROP INDEX {name} ON {table}"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Enum, Text, TIMESTAMP, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Enum, Text, TIMESTAMP, ForeignKey, JSON, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -32,17 +32,35 @@ class Customer(Base):
     address = Column(Text)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    # Formes normalisées pour la recherche (services/customer_search.py)
+    normalized_name = Column(String(201))
+    normalized_phone = Column(String(20))
+    normalized_email = Column(String(255))
 
     sales = relationship("Sale", back_populates="customer")
 
+    # Index de la pagination par curseur (created_at, id), de la recherche par préfixe
+    # et du rafraîchissement incrémental de l'index de recherche (updated_at, id)
+    __table_args__ = (
+        Index("ix_customers_created_at_id", "created_at", "id"),
+        Index("ix_customers_normalized_name", "normalized_name"),
+        Index("ix_customers_normalized_phone", "normalized_phone"),
+        Index("ix_customers_normalized_email", "normalized_email"),
+        Index("ix_customers_updated_at_id", "updated_at", "id"),
+    )
+
 class Sale(Base):
     __tablename__ = "sales"
 
     id = Column(Integer, primary_key=True, index=True)
     sale_number = Column(String(20), unique=True, nullable=False, index=True)
     cashier_id = Column(Integer, nullable=False)
+    cashier_name = Column(String(200))  # Nom du caissier, copié depuis l'annuaire
     customer_id = Column(Integer, ForeignKey("customers.id", ondelete="SET NULL"))
     total_amount = Column(Float, nullable=False)
+    # Montants tenus à jour à chaque changement de statut d'une transaction
+    paid_amount = Column(Float, nullable=False, default=0.0, server_default="0")
+    remaining_amount = Column(Float, nullable=False, default=0.0, server_default="0")
     status = Column(Enum(SaleStatus), nullable=False, default=SaleStatus.DRAFT)
     notes = Column(Text)
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -52,18 +70,44 @@ class Sale(Base):
     items = relationship("SaleItem", back_populates="sale", cascade="all, delete-orphan")
     transactions = relationship("Transaction", back_populates="sale", cascade="all, delete-orphan")
 
+    # Index de la pagination par curseur (created_at, id) et des filtres de listing
+    __table_args__ = (
+        Index("ix_sales_created_at_id", "created_at", "id"),
+        Index("ix_sales_cashier_created_at", "cashier_id", "created_at"),
+        Index("ix_sales_status_created_at", "status", "created_at"),
+        Index("ix_sales_remaining_paid", "remaining_amount", "paid_amount"),
+        Index("ix_sales_cashier_status_created_at", "cashier_id", "status", "created_at"),
+        Index("ix_sales_customer_created_at", "customer_id", "created_at"),
+    )
+
     def generate_sale_number(self):
         from datetime import datetime
         date_str = datetime.now().strftime("%Y%m%d")
         return f"V{date_str}-{self.id:05d}"
 
     def calculate_remaining_amount(self):
-        total_paid = sum(t.amount for t in self.transactions if t.status == TransactionStatus.COMPLETED)
-        return self.total_amount - total_paid
+        return self.remaining_amount
 
     def is_paid(self):
         return abs(self.calculate_remaining_amount()) < 0.01  # Tolérance pour les arrondis
 
+    def record_payment(self, amount: float):
+        """
+        Ajoute un montant encaissé (négatif pour un remboursement). La ligne de la
+        vente doit être verrouillée (SELECT ... FOR UPDATE) dans la transaction en cours.
+        """
+        self.paid_amount = round((self.paid_amount or 0.0) + amount, 2)
+        self.remaining_amount = round(self.total_amount - self.paid_amount, 2)
+
+    def apply_transaction_status(self, transaction: "Transaction", new_status: TransactionStatus):
+        """Change le statut d'une transaction en maintenant les montants payé et restant."""
+        was_completed = transaction.status == TransactionStatus.COMPLETED
+        transaction.status = new_status
+        if was_completed and new_status != TransactionStatus.COMPLETED:
+            self.record_payment(-transaction.amount)
+        elif not was_completed and new_status == TransactionStatus.COMPLETED:
+            self.record_payment(transaction.amount)
+
 class SaleItem(Base):
     __tablename__ = "sale_items"
 
@@ -77,6 +121,10 @@ class SaleItem(Base):
 
     sale = relationship("Sale", back_populates="items")
 
+    __table_args__ = (
+        Index("ix_sale_items_sale_id_product_id", "sale_id", "product_id"),
+    )
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
@@ -93,3 +141,55 @@ class Transaction(Base):
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
     sale = relationship("Sale", back_populates="transactions")
+
+    # Index de la pagination par curseur (created_at, id) et des filtres de listing
+    __table_args__ = (
+        Index("ix_transactions_created_at_id", "created_at", "id"),
+        Index("ix_transactions_status_created_at", "status", "created_at"),
+        Index("ix_transactions_sale_id_status", "sale_id", "status"),
+        Index("ix_transactions_payment_method_created_at", "payment_method", "created_at"),
+    )
+
+class SaleNumberCounter(Base):
+    __tablename__ = "sale_number_counters"
+
+    # Un compteur par jour : la numérotation des ventes repart à 1 chaque jour
+    day = Column(Date, primary_key=True)
+    next_value = Column(Integer, nullable=False, default=1)
+
+class DailySalesSummary(Base):
+    """
+    Totaux par jour, caissier et moyen de paiement, tenus à jour dans la même
+    transaction que les paiements et les annulations (services/daily_summary.py).
+    """
+    __tablename__ = "daily_sales_summary"
+
+    day = Column(Date, primary_key=True)
+    cashier_id = Column(Integer, primary_key=True)
+    payment_method = Column(Enum(PaymentMethod), primary_key=True)
+    transactions_count = Column(Integer, nullable=False, default=0, server_default="0")
+    gross_amount = Column(Float, nullable=False, default=0.0, server_default="0")
+    refunds_count = Column(Integer, nullable=False, default=0, server_default="0")
+    refunds_amount = Column(Float, nullable=False, default=0.0, server_default="0")
+    change_amount = Column(Float, nullable=False, default=0.0, server_default="0")
+
+class IdempotencyStatus(str, enum.Enum):
+    IN_PROGRESS = "IN_PROGRESS"
+    COMPLETED = "COMPLETED"
+
+class IdempotencyKey(Base):
+    """
+    Clés d'idempotence des écritures (en-tête Idempotency-Key) et réponses
+    enregistrées pour être rejouées (services/idempotency.py).
+    """
+    __tablename__ = "idempotency_keys"
+
+    # Empreinte SHA-256 de (utilisateur, opération, clé fournie par le client)
+    key = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(Enum(IdempotencyStatus), nullable=False)
+    response_status = Column(Integer)
+    response_body = Column(Text)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    # Fin du verrou tant que la requête est en cours, puis fin de conservation de la réponse
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
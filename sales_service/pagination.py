@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+# En-tête portant le curseur opaque de la page suivante
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode la position (created_at, id) d'une ligne en curseur opaque."""
+    payload = json.dumps({"c": created_at.isoformat(), "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Décode un curseur produit par `encode_cursor`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), int(payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+
+def filter_created_between(query: Query, model, date_from: Optional[datetime], date_to: Optional[datetime]) -> Query:
+    """Restreint la requête à l'intervalle [date_from, date_to[ sur created_at."""
+    if date_from is not None:
+        query = query.filter(model.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(model.created_at < date_to)
+    return query
+
+# Taille maximale d'une page en pagination par curseur
+MAX_CURSOR_PAGE_SIZE = 1000
+
+def paginate(
+    query: Query,
+    model,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List:
+    """
+    Pagine `query`.
+
+    Sans curseur (`cursor` absent), la page est lue comme avant la pagination par
+    clé : ordre des id, `skip` puis `limit`, pour ne pas changer le résultat des
+    clients existants. Avec un curseur (vide pour la première page), l'ordre est
+    décroissant sur (created_at, id) et la page reprend juste après la dernière
+    ligne de la page précédente, sans OFFSET ; `limit` est alors plafonné à
+    MAX_CURSOR_PAGE_SIZE et le curseur de la page suivante est renvoyé dans
+    l'en-tête X-Next-Cursor lorsqu'il reste des lignes.
+    """
+    if cursor is None:
+        return query.order_by(model.id).offset(skip).limit(limit).all()
+
+    limit = min(limit, MAX_CURSOR_PAGE_SIZE)
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+
+    # Une ligne de plus que demandé indique s'il existe une page suivante
+    rows = query.limit(limit + 1).all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return rows[:limit]
@@ -1,22 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
 import models, schemas
-from database import get_db
+from database import Database, get_database
 from middleware.auth import get_current_user
 from utils import check_access, CUSTOMERS_ACCESS
+from pagination import paginate, filter_created_between
+from services.customer_search import (
+    customer_search_index, looks_like_phone, normalize_email, normalize_phone, normalize_text, normalized_fields
+)
 from datetime import datetime
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.Customer)
-def create_customer(
+async def create_customer(
     customer: schemas.CustomerCreate, 
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, CUSTOMERS_ACCESS, "clients")
-    
+    return await db.run(_create_customer, customer)
+
+def _create_customer(db: Session, customer: schemas.CustomerCreate) -> schemas.Customer:
     db_customer = models.Customer(
         first_name=customer.first_name,
         last_name=customer.last_name,
@@ -24,71 +31,155 @@ def create_customer(
         phone=customer.phone,
         address=customer.address,
         created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        updated_at=datetime.utcnow(),
+        **normalized_fields(customer.first_name, customer.last_name, customer.email, customer.phone)
     )
     db.add(db_customer)
     db.commit()
     db.refresh(db_customer)
-    return db_customer
+    _index_customer(db_customer)
+    return schemas.Customer.from_orm(db_customer)
+
+def _index_customer(customer: models.Customer):
+    """Rend la fiche visible immédiatement dans l'index de recherche de ce worker."""
+    if customer_search_index is not None:
+        customer_search_index.upsert(
+            customer.id, customer.first_name, customer.last_name, customer.email, customer.phone
+        )
 
 @router.get("/", response_model=List[schemas.Customer])
-def get_customers(
+async def get_customers(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=0), 
+    cursor: Optional[str] = Query(None, description="Vide pour la première page (plus récentes d'abord), puis l'en-tête X-Next-Cursor"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, CUSTOMERS_ACCESS, "clients")
-    
-    customers = db.query(models.Customer).offset(skip).limit(limit).all()
-    return customers
+    return await db.run(_list_customers, response, skip, limit, cursor, date_from, date_to)
 
-@router.get("/{customer_id}", response_model=schemas.Customer)
-def get_customer(
-    customer_id: int, 
-    db: Session = Depends(get_db),
+def _list_customers(
+    db: Session,
+    response: Response,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime]
+) -> List[schemas.Customer]:
+    query = filter_created_between(db.query(models.Customer), models.Customer, date_from, date_to)
+    customers = paginate(query, models.Customer, response, cursor=cursor, skip=skip, limit=limit)
+    return [schemas.Customer.from_orm(customer) for customer in customers]
+
+@router.get("/search", response_model=List[schemas.CustomerSearchResult])
+async def search_customers(
+    q: str = Query(..., min_length=2, max_length=100, description="Début du nom, du téléphone ou de l'email"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
+    """Recherche pour l'autocomplétion de la caisse : préfixe et fautes de frappe, meilleurs résultats d'abord."""
     check_access(current_user, CUSTOMERS_ACCESS, "clients")
-    
+    if customer_search_index is not None and customer_search_index.ready:
+        matches = await run_in_threadpool(customer_search_index.search, q, limit)
+        return await db.run(_load_search_results, matches)
+    return await db.run(_search_customers_in_db, q, limit)
+
+def _load_search_results(db: Session, matches: List[Tuple[float, int]]) -> List[schemas.CustomerSearchResult]:
+    if not matches:
+        return []
+    ids = [customer_id for _, customer_id in matches]
+    customers = {customer.id: customer for customer in db.query(models.Customer).filter(models.Customer.id.in_(ids))}
+    # Supprimés par un autre worker depuis le dernier rechargement complet de l'index
+    missing = [customer_id for customer_id in ids if customer_id not in customers]
+    if missing:
+        customer_search_index.remove(*missing)
+    return [
+        schemas.CustomerSearchResult(**schemas.Customer.from_orm(customers[customer_id]).dict(), score=score)
+        for score, customer_id in matches if customer_id in customers
+    ]
+
+def _starts_with(column, prefix: str):
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.like(escaped + "%", escape="\\")
+
+def _search_customers_in_db(db: Session, q: str, limit: int) -> List[schemas.CustomerSearchResult]:
+    """Repli sans index en mémoire : préfixe sur les colonnes normalisées (index MySQL), sans tolérance aux fautes."""
+    if looks_like_phone(q):
+        column, prefix = models.Customer.normalized_phone, normalize_phone(q)
+    elif "@" in q:
+        column, prefix = models.Customer.normalized_email, normalize_email(q)
+    else:
+        column, prefix = models.Customer.normalized_name, normalize_text(q)
+    if not prefix:
+        return []
+    # Tri sur la colonne de l'index : le parcours s'arrête après `limit` lignes
+    customers = db.query(models.Customer).filter(_starts_with(column, prefix)).order_by(column).limit(limit).all()
+    return [
+        schemas.CustomerSearchResult(**schemas.Customer.from_orm(customer).dict(), score=1.0)
+        for customer in customers
+    ]
+
+def _get_customer_or_404(db: Session, customer_id: int) -> models.Customer:
     customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
     if customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
+@router.get("/{customer_id}", response_model=schemas.Customer)
+async def get_customer(
+    customer_id: int, 
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+):
+    check_access(current_user, CUSTOMERS_ACCESS, "clients")
+    return await db.run(_get_customer, customer_id)
+
+def _get_customer(db: Session, customer_id: int) -> schemas.Customer:
+    return schemas.Customer.from_orm(_get_customer_or_404(db, customer_id))
+
 @router.put("/{customer_id}", response_model=schemas.Customer)
-def update_customer(
+async def update_customer(
     customer_id: int, 
     customer_update: schemas.CustomerCreate, 
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, CUSTOMERS_ACCESS, "clients")
-    
-    db_customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
-    if db_customer is None:
-        raise HTTPException(status_code=404, detail="Customer not found")
+    return await db.run(_update_customer, customer_id, customer_update)
+
+def _update_customer(db: Session, customer_id: int, customer_update: schemas.CustomerCreate) -> schemas.Customer:
+    db_customer = _get_customer_or_404(db, customer_id)
 
     for field, value in customer_update.dict(exclude_unset=True).items():
         setattr(db_customer, field, value)
+    for field, value in normalized_fields(
+        db_customer.first_name, db_customer.last_name, db_customer.email, db_customer.phone
+    ).items():
+        setattr(db_customer, field, value)
     
     db_customer.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_customer)
-    return db_customer
+    _index_customer(db_customer)
+    return schemas.Customer.from_orm(db_customer)
 
 @router.delete("/{customer_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_customer(
+async def delete_customer(
     customer_id: int, 
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, CUSTOMERS_ACCESS, "clients")
-    
-    db_customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
-    if db_customer is None:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
+    await db.run(_delete_customer, customer_id)
+    return None
+
+def _delete_customer(db: Session, customer_id: int):
+    db_customer = _get_customer_or_404(db, customer_id)
     db.delete(db_customer)
     db.commit()
-    return None 
\ No newline at end of file
+    if customer_search_index is not None:
+        customer_search_index.remove(customer_id) 
\ No newline at end of file
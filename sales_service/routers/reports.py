@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date, timedelta
+import models, schemas
+from database import Database, get_database
+from middleware.auth import get_current_user
+from utils import check_access, REPORTS_ACCESS
+
+router = APIRouter()
+
+# Longueur maximale d'une période de /reports/range
+MAX_RANGE_DAYS = 366
+
+Summary = models.DailySalesSummary
+
+def _totals(transactions_count, gross_amount, refunds_count, refunds_amount, change_amount) -> dict:
+    gross_amount = round(float(gross_amount or 0), 2)
+    refunds_amount = round(float(refunds_amount or 0), 2)
+    return {
+        "transactions_count": int(transactions_count or 0),
+        "gross_amount": gross_amount,
+        "refunds_count": int(refunds_count or 0),
+        "refunds_amount": refunds_amount,
+        "change_amount": round(float(change_amount or 0), 2),
+        "net_amount": round(gross_amount - refunds_amount, 2),
+    }
+
+def _summed_columns():
+    return (
+        func.sum(Summary.transactions_count),
+        func.sum(Summary.gross_amount),
+        func.sum(Summary.refunds_count),
+        func.sum(Summary.refunds_amount),
+        func.sum(Summary.change_amount),
+    )
+
+def _daily_report(db: Session, day: Optional[date], cashier_id: Optional[int]) -> schemas.DailyReport:
+    # Jour courant de la base, celui sous lequel les paiements sont enregistrés
+    if day is None:
+        day = db.query(func.current_date()).scalar()
+    query = db.query(Summary).filter(Summary.day == day)
+    if cashier_id is not None:
+        query = query.filter(Summary.cashier_id == cashier_id)
+    rows = query.order_by(Summary.cashier_id, Summary.payment_method).all()
+
+    report_rows = [
+        schemas.DailySummaryRow(
+            day=row.day,
+            cashier_id=row.cashier_id,
+            payment_method=row.payment_method,
+            **_totals(row.transactions_count, row.gross_amount, row.refunds_count,
+                      row.refunds_amount, row.change_amount)
+        )
+        for row in rows
+    ]
+    totals = _totals(*(
+        sum(getattr(row, column) or 0 for row in rows)
+        for column in ("transactions_count", "gross_amount", "refunds_count", "refunds_amount", "change_amount")
+    ))
+    return schemas.DailyReport(day=day, rows=report_rows, totals=schemas.SummaryTotals(**totals))
+
+def _range_report(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    cashier_id: Optional[int],
+    payment_method: Optional[schemas.PaymentMethod]
+) -> schemas.RangeReport:
+    query = db.query(Summary.day, *_summed_columns()).filter(Summary.day >= date_from, Summary.day <= date_to)
+    if cashier_id is not None:
+        query = query.filter(Summary.cashier_id == cashier_id)
+    if payment_method is not None:
+        query = query.filter(Summary.payment_method == payment_method)
+    rows = query.group_by(Summary.day).order_by(Summary.day).all()
+
+    days = [schemas.RangeReportDay(day=row[0], **_totals(*row[1:])) for row in rows]
+    totals = _totals(*(sum(row[index] or 0 for row in rows) for index in range(1, 6)))
+    return schemas.RangeReport(
+        date_from=date_from,
+        date_to=date_to,
+        days=days,
+        totals=schemas.SummaryTotals(**totals)
+    )
+
+@router.get("/daily", response_model=schemas.DailyReport)
+async def get_daily_report(
+    day: Optional[date] = Query(None, description="Jour du rapport (aujourd'hui selon l'horloge de la base par défaut)"),
+    cashier_id: Optional[int] = None,
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+):
+    """Totaux d'une journée par caissier et moyen de paiement, lus dans la table de synthèse."""
+    check_access(current_user, REPORTS_ACCESS, "rapports")
+    return await db.run(_daily_report, day, cashier_id)
+
+@router.get("/range", response_model=schemas.RangeReport)
+async def get_range_report(
+    date_from: date,
+    date_to: date,
+    cashier_id: Optional[int] = None,
+    payment_method: Optional[schemas.PaymentMethod] = None,
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+):
+    """Totaux jour par jour sur la période [date_from, date_to], lus dans la table de synthèse."""
+    check_access(current_user, REPORTS_ACCESS, "rapports")
+    if date_to < date_from or date_to - date_from > timedelta(days=MAX_RANGE_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Période invalide (au plus {MAX_RANGE_DAYS} jours)"
+        )
+    return await db.run(_range_report, date_from, date_to, cashier_id, payment_method)
@@ -1,102 +1,366 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 import models, schemas
-from database import get_db
-from services.cashier_service import CashierService
-from middleware.auth import get_current_user
+from database import Database, get_database, SessionLocal
+from services.sale_number_allocator import SaleNumberAllocator
+from services import daily_summary, sales_export
+from services.cashier_service import cashier_directory, CashierDirectory
+from services.stock_service import stock_service
+from services.price_book import price_book
+from services.idempotency import idempotency_store
+from middleware.auth import get_current_user, oauth2_scheme
 from utils import check_access, SALES_ACCESS
+from pagination import paginate, filter_created_between
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
-cashier_service = CashierService(os.getenv("AUTH_SERVICE_URL", "http://auth_service:8001"))
+sale_number_allocator = SaleNumberAllocator(
+    SessionLocal,
+    block_size=int(os.getenv("SALE_NUMBER_BLOCK_SIZE", "50"))
+)
+
+# Nombre de ventes insérées (et validées) par transaction dans /sales/bulk
+BULK_CHUNK_SIZE = int(os.getenv("BULK_SALES_CHUNK_SIZE", "500"))
+
+def _sale_item_rows(sale_id: int, items: List[schemas.SaleItemCreate], created_at: datetime) -> List[dict]:
+    """Prépare les lignes `sale_items` d'une vente pour une insertion multi-lignes."""
+    return [
+        {
+            "sale_id": sale_id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "unit_price": item.unit_price,
+            "total_price": item.calculate_total(),
+            "created_at": created_at
+        }
+        for item in items
+    ]
+
+def _ensure_customer_exists(db: Session, customer_id: Optional[int]):
+    """Lève une 404 si le client indiqué n'existe pas."""
+    if customer_id:
+        customer = db.query(models.Customer.id).filter(models.Customer.id == customer_id).first()
+        if not customer:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Client avec l'ID {customer_id} n'existe pas"
+            )
 
 @router.post("/", response_model=schemas.SaleResponse)
-def create_sale(
+async def create_sale(
     sale: schemas.SaleCreate,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user),
+    token: str = Depends(oauth2_scheme),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     check_access(current_user, SALES_ACCESS, "ventes")
-    
+    # Une nouvelle tentative avec la même clé reçoit la vente déjà créée
+    return await idempotency_store.execute(
+        db,
+        idempotency_key,
+        f"create_sale:{current_user['id']}",
+        sale.model_dump_json(),
+        lambda: _create_sale(db, sale, current_user, token)
+    )
+
+async def _create_sale(
+    db: Database,
+    sale: schemas.SaleCreate,
+    current_user: dict,
+    token: str
+) -> schemas.SaleResponse:
+    # Contrôler les prix du panier sur la copie locale du catalogue, sans appel réseau
+    if price_book is not None:
+        price_book.validate(sale.items)
+
+    # Attribuer le numéro de vente depuis le bloc réservé par ce worker. La réservation
+    # d'un nouveau bloc est bloquante : elle passe par le pool de threads dans les deux
+    # modes. Un numéro attribué à une vente refusée laisse un trou dans la séquence.
+    sale_number = await run_in_threadpool(sale_number_allocator.allocate)
+
+    # Réserver tout le panier en un appel au service de stock, avant l'enregistrement
+    if stock_service is not None:
+        await stock_service.reserve(sale_number, sale.items, token)
+    try:
+        return await db.run(_insert_sale, sale, sale_number, current_user)
+    except Exception:
+        if stock_service is not None:
+            await stock_service.release(sale_number, token)
+        raise
+
+def _insert_sale(
+    db: Session,
+    sale: schemas.SaleCreate,
+    sale_number: str,
+    current_user: dict
+) -> schemas.SaleResponse:
     # Vérifier que le client existe
-    if sale.customer_id:
-        customer = db.query(models.Customer).filter(models.Customer.id == sale.customer_id).first()
-        if not customer:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Client avec l'ID {sale.customer_id} n'existe pas"
-            )
+    _ensure_customer_exists(db, sale.customer_id)
     
     # Calculer le total automatiquement
     total_amount = sale.calculate_total()
+    created_at = datetime.utcnow()
     
-    # Générer un ID temporaire pour le numéro de vente
-    last_sale = db.query(models.Sale).order_by(models.Sale.id.desc()).first()
-    next_id = (last_sale.id + 1) if last_sale else 1
-    date_str = datetime.now().strftime("%Y%m%d")
-    sale_number = f"V{date_str}-{next_id:05d}"
-    
-    # Créer la vente avec le numéro généré et l'ID du caissier connecté
-    db_sale = models.Sale(
+    # Insérer la vente et tous ses articles dans une seule transaction :
+    # une insertion pour la vente, une insertion multi-lignes pour les articles
+    try:
+        result = db.execute(
+            insert(models.Sale).values(
+                sale_number=sale_number,
+                cashier_id=current_user["id"],  # Utiliser l'ID de l'utilisateur connecté
+                cashier_name=CashierDirectory.format_display_name(current_user),
+                customer_id=sale.customer_id,
+                total_amount=total_amount,
+                paid_amount=0.0,
+                remaining_amount=total_amount,
+                status=models.SaleStatus.DRAFT,
+                notes=sale.notes,
+                created_at=created_at,
+                updated_at=created_at
+            )
+        )
+        sale_id = result.inserted_primary_key[0]
+        item_rows = _sale_item_rows(sale_id, sale.items, created_at)
+        if item_rows:
+            db.execute(insert(models.SaleItem).values(item_rows))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Préparer la réponse à partir des valeurs insérées, sans relire la vente
+    return schemas.SaleResponse(
+        id=sale_id,
         sale_number=sale_number,
-        cashier_id=current_user["id"],  # Utiliser l'ID de l'utilisateur connecté
         customer_id=sale.customer_id,
+        cashier_id=current_user["id"],
         total_amount=total_amount,
         status=models.SaleStatus.DRAFT,
-        notes=sale.notes
+        notes=sale.notes,
+        created_at=created_at,
+        items_count=len(item_rows),
+        payment_status="pending",
+        remaining_amount=total_amount,
+        change_amount=0.0
     )
-    db.add(db_sale)
-    db.commit()
-    db.refresh(db_sale)
-
-    # Mettre à jour les informations du caissier
-    cashier_service.update_sale_cashier_info(db, db_sale)
-
-    # Créer les articles de vente
-    for item in sale.items:
-        db_item = models.SaleItem(
-            sale_id=db_sale.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            total_price=item.calculate_total()
-        )
-        db.add(db_item)
 
-    db.commit()
-    db.refresh(db_sale)
+def _load_sale(db: Session, *criteria) -> Optional[models.Sale]:
+    """
+    Charge une vente avec ses articles et ses transactions en requêtes groupées
+    (selectin), en écrasant l'état éventuellement expiré de la session.
+    """
+    return (
+        db.query(models.Sale)
+        .options(selectinload(models.Sale.items), selectinload(models.Sale.transactions))
+        .filter(*criteria)
+        .populate_existing()
+        .first()
+    )
 
-    # Préparer la réponse
-    items_count = len(sale.items)
-    remaining_amount = db_sale.calculate_remaining_amount()
+def _sale_response(db_sale: models.Sale, change_amount: Optional[float] = None) -> schemas.SaleResponse:
+    """Construit la réponse d'une vente dont les relations sont déjà chargées."""
+    if change_amount is None:
+        change_amount = sum(t.change_amount or 0 for t in db_sale.transactions)
+    payment_status = "completed" if db_sale.status == models.SaleStatus.COMPLETED else "pending"
 
     return schemas.SaleResponse(
         id=db_sale.id,
         sale_number=db_sale.sale_number,
         customer_id=db_sale.customer_id,
         cashier_id=db_sale.cashier_id,
-        total_amount=total_amount,
+        total_amount=db_sale.total_amount,
         status=db_sale.status,
         notes=db_sale.notes,
         created_at=db_sale.created_at,
-        items_count=items_count,
-        payment_status="pending",
-        remaining_amount=remaining_amount,
-        change_amount=0.0
+        items_count=len(db_sale.items),
+        payment_status=payment_status,
+        remaining_amount=db_sale.calculate_remaining_amount(),
+        change_amount=change_amount,
+        transactions=[schemas.TransactionResponse.from_orm(t) for t in db_sale.transactions]
+    )
+
+def _validate_sale_items(items: List[schemas.SaleItemCreate]) -> Optional[str]:
+    """Retourne un message d'erreur si les articles d'une vente sont invalides."""
+    if not items:
+        return "La vente ne contient aucun article"
+    for item in items:
+        if item.quantity <= 0:
+            return f"Quantité invalide pour le produit {item.product_id}"
+        if item.unit_price < 0:
+            return f"Prix unitaire invalide pour le produit {item.product_id}"
+    return None
+
+# Avance tolérée de l'horloge d'un terminal sur celle du service
+OFFLINE_CLOCK_SKEW = timedelta(minutes=5)
+
+def _offline_created_at(entry: schemas.BulkSaleCreate, replayed_at: datetime) -> datetime:
+    """Heure de la vente hors ligne, en UTC sans fuseau comme created_at ; heure du rejeu par défaut."""
+    if entry.created_at is None:
+        return replayed_at
+    if entry.created_at.tzinfo is not None:
+        return entry.created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return entry.created_at
+
+def _validate_offline_time(entry: schemas.BulkSaleCreate, replayed_at: datetime) -> Optional[str]:
+    if _offline_created_at(entry, replayed_at) > replayed_at + OFFLINE_CLOCK_SKEW:
+        return "La date de la vente (created_at) est dans le futur"
+    return None
+
+@router.post("/bulk", response_model=schemas.BulkSalesResponse)
+async def create_sales_bulk(
+    bulk: schemas.BulkSalesCreate,
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Enregistre un lot de ventes (rejeu d'un terminal après une coupure réseau).
+    Les ventes sont validées en une passe, numérotées par bloc puis insérées par
+    paquets de BULK_CHUNK_SIZE ; le résultat est rapporté vente par vente.
+    """
+    check_access(current_user, SALES_ACCESS, "ventes")
+    started = time.perf_counter()
+
+    # Un caissier ne peut rejouer que ses propres ventes
+    if current_user["role"] == "cashier" and bulk.cashier_id != current_user["id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Un caissier ne peut enregistrer que ses propres ventes"
+        )
+
+    await db.run(_ensure_customer_exists, bulk.customer_id)
+
+    # Validation de toutes les ventes en une seule passe
+    results: List[Optional[schemas.BulkSaleResult]] = [None] * len(bulk.sales)
+    valid_indexes = []
+    replayed_at = datetime.utcnow()
+    for index, entry in enumerate(bulk.sales):
+        error = _validate_sale_items(entry.items) or _validate_offline_time(entry, replayed_at)
+        if error:
+            results[index] = schemas.BulkSaleResult(index=index, success=False, error=error)
+        else:
+            valid_indexes.append(index)
+
+    # Nom du caissier pris dans le profil connecté ou dans l'annuaire, sans appel réseau
+    if bulk.cashier_id == current_user["id"]:
+        cashier_name = CashierDirectory.format_display_name(current_user)
+    else:
+        cashier_name = cashier_directory.display_name(bulk.cashier_id)
+
+    # Numéros attribués en un seul bloc pour tout le lot
+    sale_numbers = await run_in_threadpool(sale_number_allocator.allocate_block, len(valid_indexes)) if valid_indexes else []
+    await db.run(_insert_bulk_sales, bulk, valid_indexes, sale_numbers, cashier_name, results, replayed_at)
+
+    duration = time.perf_counter() - started
+    created = sum(1 for result in results if result.success)
+    return schemas.BulkSalesResponse(
+        total=len(results),
+        created=created,
+        failed=len(results) - created,
+        duration_ms=round(duration * 1000, 2),
+        sales_per_second=round(created / duration, 2) if duration > 0 else 0.0,
+        results=results
     )
 
+def _insert_bulk_sales(
+    db: Session,
+    bulk: schemas.BulkSalesCreate,
+    valid_indexes: List[int],
+    sale_numbers: List[str],
+    cashier_name: Optional[str],
+    results: List[Optional[schemas.BulkSaleResult]],
+    replayed_at: datetime
+):
+    """Insère les ventes valides par paquets de BULK_CHUNK_SIZE et complète `results`."""
+    for chunk_start in range(0, len(valid_indexes), BULK_CHUNK_SIZE):
+        chunk = valid_indexes[chunk_start:chunk_start + BULK_CHUNK_SIZE]
+        chunk_numbers = sale_numbers[chunk_start:chunk_start + BULK_CHUNK_SIZE]
+        totals = {index: bulk.sales[index].calculate_total() for index in chunk}
+        created = {index: _offline_created_at(bulk.sales[index], replayed_at) for index in chunk}
+        try:
+            db.execute(insert(models.Sale), [
+                {
+                    "sale_number": sale_number,
+                    "cashier_id": bulk.cashier_id,
+                    "cashier_name": cashier_name,
+                    "customer_id": bulk.customer_id,
+                    "total_amount": totals[index],
+                    "paid_amount": 0.0,
+                    "remaining_amount": totals[index],
+                    "status": models.SaleStatus.DRAFT,
+                    "notes": bulk.sales[index].notes,
+                    "created_at": created[index],
+                    "updated_at": replayed_at
+                }
+                for index, sale_number in zip(chunk, chunk_numbers)
+            ])
+
+            # Récupérer les IDs générés via l'index unique sur sale_number
+            sale_ids = dict(
+                db.query(models.Sale.sale_number, models.Sale.id)
+                .filter(models.Sale.sale_number.in_(chunk_numbers))
+                .all()
+            )
+
+            item_rows = []
+            for index, sale_number in zip(chunk, chunk_numbers):
+                item_rows.extend(_sale_item_rows(sale_ids[sale_number], bulk.sales[index].items, created[index]))
+            db.execute(insert(models.SaleItem), item_rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for index in chunk:
+                results[index] = schemas.BulkSaleResult(
+                    index=index,
+                    success=False,
+                    error=f"Erreur lors de l'enregistrement : {e.__class__.__name__}"
+                )
+            continue
+
+        for index, sale_number in zip(chunk, chunk_numbers):
+            results[index] = schemas.BulkSaleResult(
+                index=index,
+                success=True,
+                sale_id=sale_ids[sale_number],
+                sale_number=sale_number,
+                total_amount=totals[index]
+            )
+
 @router.post("/{sale_id}/pay", response_model=schemas.SaleResponse)
-def process_payment(
+async def process_payment(
     sale_id: int, 
     payment: schemas.SalePayment, 
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user),
+    token: str = Depends(oauth2_scheme),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     check_access(current_user, SALES_ACCESS, "ventes")
-    
-    db_sale = db.query(models.Sale).filter(models.Sale.id == sale_id).first()
+    # Une nouvelle tentative d'un paiement accepté reçoit la même réponse, au lieu d'une 400
+    return await idempotency_store.execute(
+        db,
+        idempotency_key,
+        f"process_payment:{current_user['id']}:{sale_id}",
+        payment.model_dump_json(),
+        lambda: _pay_sale(db, sale_id, payment, token)
+    )
+
+async def _pay_sale(db: Database, sale_id: int, payment: schemas.SalePayment, token: str) -> schemas.SaleResponse:
+    response = await db.run(_process_payment, sale_id, payment)
+    # Vente payée : sa réservation de stock n'expire plus
+    if stock_service is not None:
+        await stock_service.confirm(response.sale_number, token)
+    return response
+
+def _process_payment(db: Session, sale_id: int, payment: schemas.SalePayment) -> schemas.SaleResponse:
+    # Verrouiller la vente : deux paiements simultanés ne peuvent pas être acceptés
+    db_sale = db.query(models.Sale).filter(models.Sale.id == sale_id).with_for_update().first()
     if db_sale is None:
         raise HTTPException(status_code=404, detail="Sale not found")
 
@@ -111,6 +375,7 @@ def process_payment(
 
     # Créer les transactions
     total_change = 0.0
+    db_transactions = []
     for transaction in payment.transactions:
         if transaction.payment_method == models.PaymentMethod.CASH:
             change = transaction.calculate_change()
@@ -126,84 +391,178 @@ def process_payment(
             status=models.TransactionStatus.COMPLETED
         )
         db.add(db_transaction)
+        db_transactions.append(db_transaction)
+        db_sale.record_payment(transaction.amount)
 
-    # Mettre à jour le statut de la vente
+    # Mettre à jour le statut de la vente et les totaux du jour, dans la même transaction
     db_sale.status = models.SaleStatus.COMPLETED
+    daily_summary.record_payments(db, db_sale.cashier_id, db_transactions)
     db.commit()
-    db.refresh(db_sale)
 
-    # Préparer la réponse
-    items_count = len(db_sale.items)
-    remaining_amount = db_sale.calculate_remaining_amount()
+    # Recharger la vente avec ses relations en requêtes groupées
+    db_sale = _load_sale(db, models.Sale.id == sale_id)
+    return _sale_response(db_sale, change_amount=total_change)
 
-    return schemas.SaleResponse(
-        id=db_sale.id,
-        sale_number=db_sale.sale_number,
-        customer_id=db_sale.customer_id,
-        cashier_id=db_sale.cashier_id,
-        total_amount=db_sale.total_amount,
-        status=db_sale.status,
-        notes=db_sale.notes,
-        created_at=db_sale.created_at,
-        items_count=items_count,
-        payment_status="completed",
-        remaining_amount=remaining_amount,
-        change_amount=total_change,
-        transactions=[schemas.TransactionResponse.from_orm(t) for t in db_sale.transactions]
-    )
+def _payment_status_criteria(payment_status: str) -> list:
+    """Critères sur les montants tenus à jour de la vente (tolérance de 0,01)."""
+    if payment_status == "paid":
+        return [models.Sale.remaining_amount < 0.01]
+    if payment_status == "partial":
+        return [models.Sale.remaining_amount >= 0.01, models.Sale.paid_amount >= 0.01]
+    return [models.Sale.remaining_amount >= 0.01, models.Sale.paid_amount < 0.01]
 
 @router.get("/", response_model=List[schemas.Sale])
-def get_sales(
+async def get_sales(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=0), 
+    cursor: Optional[str] = Query(None, description="Vide pour la première page (plus récentes d'abord), puis l'en-tête X-Next-Cursor"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    sale_status: Optional[schemas.SaleStatus] = Query(None, alias="status"),
+    cashier_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    payment_status: Optional[str] = Query(None, pattern="^(unpaid|partial|paid)$"),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, SALES_ACCESS, "ventes")
-    
+    return await db.run(
+        _list_sales,
+        response,
+        current_user,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        date_from=date_from,
+        date_to=date_to,
+        sale_status=sale_status,
+        cashier_id=cashier_id,
+        customer_id=customer_id,
+        payment_status=payment_status
+    )
+
+def _list_sales(
+    db: Session,
+    response: Response,
+    current_user: dict,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    sale_status: Optional[schemas.SaleStatus],
+    cashier_id: Optional[int],
+    customer_id: Optional[int],
+    payment_status: Optional[str]
+) -> List[schemas.Sale]:
+    # Articles et transactions chargés en une requête chacun pour toute la page
+    query = db.query(models.Sale).options(
+        selectinload(models.Sale.items),
+        selectinload(models.Sale.transactions)
+    )
+
     # Si l'utilisateur est un caissier, ne montrer que ses ventes
     if current_user["role"] == "cashier":
-        sales = db.query(models.Sale).filter(models.Sale.cashier_id == current_user["id"]).offset(skip).limit(limit).all()
-    else:
-        sales = db.query(models.Sale).offset(skip).limit(limit).all()
-    return sales
+        query = query.filter(models.Sale.cashier_id == current_user["id"])
+    elif cashier_id is not None:
+        query = query.filter(models.Sale.cashier_id == cashier_id)
 
-@router.get("/{sale_id}", response_model=schemas.SaleResponse)
-def get_sale(
-    sale_id: int, 
-    db: Session = Depends(get_db),
+    if sale_status is not None:
+        query = query.filter(models.Sale.status == sale_status)
+    if customer_id is not None:
+        query = query.filter(models.Sale.customer_id == customer_id)
+    if payment_status is not None:
+        query = query.filter(*_payment_status_criteria(payment_status))
+    query = filter_created_between(query, models.Sale, date_from, date_to)
+
+    sales = paginate(query, models.Sale, response, cursor=cursor, skip=skip, limit=limit)
+    return [schemas.Sale.from_orm(sale) for sale in sales]
+
+@router.get("/export")
+def export_sales(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    granularity: str = Query("sale", pattern="^(sale|item)$", description="Une ligne par vente ou par article"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    sale_status: Optional[schemas.SaleStatus] = Query(None, alias="status"),
+    cashier_id: Optional[int] = None,
     current_user: dict = Depends(get_current_user)
 ):
+    """Exporte l'historique des ventes en flux NDJSON ou CSV."""
     check_access(current_user, SALES_ACCESS, "ventes")
-    
-    db_sale = db.query(models.Sale).filter(models.Sale.id == sale_id).first()
+
+    # Un caissier n'exporte que ses propres ventes
+    if current_user["role"] == "cashier":
+        cashier_id = current_user["id"]
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"sales-{granularity}.{'csv' if export_format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        sales_export.stream_sales(
+            export_format=export_format,
+            granularity=granularity,
+            date_from=date_from,
+            date_to=date_to,
+            sale_status=sale_status,
+            cashier_id=cashier_id
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _get_sale_response(db: Session, *criteria) -> schemas.SaleResponse:
+    db_sale = _load_sale(db, *criteria)
     if db_sale is None:
         raise HTTPException(status_code=404, detail="Sale not found")
-    return db_sale
+    return _sale_response(db_sale)
+
+@router.get("/{sale_id}", response_model=schemas.SaleResponse)
+async def get_sale(
+    sale_id: int, 
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user)
+):
+    check_access(current_user, SALES_ACCESS, "ventes")
+    return await db.run(_get_sale_response, models.Sale.id == sale_id)
 
 @router.get("/number/{sale_number}", response_model=schemas.SaleResponse)
-def get_sale_by_number(
+async def get_sale_by_number(
     sale_number: str, 
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, SALES_ACCESS, "ventes")
-    
-    sale = db.query(models.Sale).filter(models.Sale.sale_number == sale_number).first()
-    if sale is None:
-        raise HTTPException(status_code=404, detail="Sale not found")
-    return sale
+    return await db.run(_get_sale_response, models.Sale.sale_number == sale_number)
 
 @router.put("/{sale_id}", response_model=schemas.SaleResponse)
-def update_sale(
+async def update_sale(
     sale_id: int, 
     sale_update: schemas.SaleUpdate, 
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: Database = Depends(get_database),
+    current_user: dict = Depends(get_current_user),
+    token: str = Depends(oauth2_scheme)
 ):
     check_access(current_user, SALES_ACCESS, "ventes")
-    
-    db_sale = db.query(models.Sale).filter(models.Sale.id == sale_id).first()
+    response = await db.run(_update_sale, sale_id, sale_update)
+
+    if stock_service is not None:
+        # Vente annulée : remettre en stock les quantités réservées
+        if sale_update.status == models.SaleStatus.CANCELLED:
+            await stock_service.release(response.sale_number, token)
+        # Vente terminée : la réservation n'expire plus
+        elif sale_update.status == models.SaleStatus.COMPLETED:
+            await stock_service.confirm(response.sale_number, token)
+    return response
+
+def _update_sale(db: Session, sale_id: int, sale_update: schemas.SaleUpdate) -> schemas.SaleResponse:
+    db_sale = (
+        db.query(models.Sale)
+        .options(selectinload(models.Sale.transactions))
+        .filter(models.Sale.id == sale_id)
+        .with_for_update()
+        .first()
+    )
     if db_sale is None:
         raise HTTPException(status_code=404, detail="Sale not found")
 
@@ -211,36 +570,25 @@ def update_sale(
         db_sale.status = sale_update.status
         # Si la vente est annulée, mettre à jour le statut des transactions
         if sale_update.status == models.SaleStatus.CANCELLED:
+            # Seuls les montants encaissés sont remboursés ; les paiements en attente échouent
             for transaction in db_sale.transactions:
-                transaction.status = models.TransactionStatus.REFUNDED
-                transaction.payment_details = {
-                    "refund_date": datetime.utcnow().isoformat(),
-                    "refund_reason": "Sale cancelled"
-                }
+                old_status, old_updated_at = transaction.status, transaction.updated_at
+                if old_status == models.TransactionStatus.COMPLETED:
+                    db_sale.apply_transaction_status(transaction, models.TransactionStatus.REFUNDED)
+                    transaction.payment_details = {
+                        "refund_date": datetime.utcnow().isoformat(),
+                        "refund_reason": "Sale cancelled"
+                    }
+                elif old_status == models.TransactionStatus.PENDING:
+                    db_sale.apply_transaction_status(transaction, models.TransactionStatus.FAILED)
+                else:
+                    continue
+                daily_summary.record_status_change(db, db_sale.cashier_id, transaction, old_status, old_updated_at)
     if sale_update.notes:
         db_sale.notes = sale_update.notes
 
     db.commit()
-    db.refresh(db_sale)
-
-    # Calculer les valeurs requises pour la réponse
-    items_count = len(db_sale.items)
-    remaining_amount = db_sale.calculate_remaining_amount()
-    total_change = sum(t.change_amount or 0 for t in db_sale.transactions)
-    payment_status = "completed" if db_sale.status == models.SaleStatus.COMPLETED else "pending"
 
-    return schemas.SaleResponse(
-        id=db_sale.id,
-        sale_number=db_sale.sale_number,
-        customer_id=db_sale.customer_id,
-        cashier_id=db_sale.cashier_id,
-        total_amount=db_sale.total_amount,
-        status=db_sale.status,
-        notes=db_sale.notes,
-        created_at=db_sale.created_at,
-        items_count=items_count,
-        payment_status=payment_status,
-        remaining_amount=remaining_amount,
-        change_amount=total_change,
-        transactions=[schemas.TransactionResponse.from_orm(t) for t in db_sale.transactions]
-    )
+    # Recharger la vente avec ses relations en requêtes groupées
+    db_sale = _load_sale(db, models.Sale.id == sale_id)
+    return _sale_response(db_sale)
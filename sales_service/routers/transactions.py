@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 import models, schemas
-from database import get_db
+from database import Database, get_database
+from services import daily_summary
 from middleware.auth import get_current_user, check_role_privileges
 from utils import check_access, TRANSACTIONS_ACCESS
+from pagination import paginate, filter_created_between
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.Transaction)
-def create_transaction(transaction: schemas.TransactionCreate, db: Session = Depends(get_db)):
+async def create_transaction(transaction: schemas.TransactionCreate, db: Database = Depends(get_database)):
+    return await db.run(_create_transaction, transaction)
+
+def _create_transaction(db: Session, transaction: schemas.TransactionCreate) -> schemas.Transaction:
     db_transaction = models.Transaction(
         sale_id=transaction.sale_id,
         amount=transaction.amount,
@@ -20,7 +26,7 @@ def create_transaction(transaction: schemas.TransactionCreate, db: Session = Dep
     db.add(db_transaction)
     db.commit()
     db.refresh(db_transaction)
-    return db_transaction
+    return schemas.Transaction.from_orm(db_transaction)
 
 def check_transactions_access(current_user: dict):
     allowed_roles = ["admin", "manager", "cashier"]
@@ -31,52 +37,105 @@ def check_transactions_access(current_user: dict):
         )
 
 @router.get("/", response_model=List[schemas.Transaction])
-def get_transactions(
+async def get_transactions(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=0), 
+    cursor: Optional[str] = Query(None, description="Vide pour la première page (plus récentes d'abord), puis l'en-tête X-Next-Cursor"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    transaction_status: Optional[schemas.TransactionStatus] = Query(None, alias="status"),
+    payment_method: Optional[schemas.PaymentMethod] = None,
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, TRANSACTIONS_ACCESS, "transactions")
-    
-    transactions = db.query(models.Transaction).offset(skip).limit(limit).all()
-    return transactions
+    return await db.run(
+        _list_transactions,
+        response,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        date_from=date_from,
+        date_to=date_to,
+        transaction_status=transaction_status,
+        payment_method=payment_method
+    )
+
+def _list_transactions(
+    db: Session,
+    response: Response,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    transaction_status: Optional[schemas.TransactionStatus],
+    payment_method: Optional[schemas.PaymentMethod]
+) -> List[schemas.Transaction]:
+    query = db.query(models.Transaction)
+    if transaction_status is not None:
+        query = query.filter(models.Transaction.status == transaction_status)
+    if payment_method is not None:
+        query = query.filter(models.Transaction.payment_method == payment_method)
+    query = filter_created_between(query, models.Transaction, date_from, date_to)
+
+    transactions = paginate(query, models.Transaction, response, cursor=cursor, skip=skip, limit=limit)
+    return [schemas.Transaction.from_orm(transaction) for transaction in transactions]
 
 @router.get("/sale/{sale_id}", response_model=List[schemas.Transaction])
-def get_sale_transactions(
+async def get_sale_transactions(
     sale_id: int, 
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, TRANSACTIONS_ACCESS, "transactions")
-    
+    return await db.run(_list_sale_transactions, sale_id)
+
+def _list_sale_transactions(db: Session, sale_id: int) -> List[schemas.Transaction]:
     transactions = db.query(models.Transaction).filter(models.Transaction.sale_id == sale_id).all()
-    return transactions
+    return [schemas.Transaction.from_orm(transaction) for transaction in transactions]
 
 @router.get("/{transaction_id}", response_model=schemas.Transaction)
-def get_transaction(
+async def get_transaction(
     transaction_id: int, 
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current_user: dict = Depends(get_current_user)
 ):
     check_access(current_user, TRANSACTIONS_ACCESS, "transactions")
-    
+    return await db.run(_get_transaction, transaction_id)
+
+def _get_transaction(db: Session, transaction_id: int) -> schemas.Transaction:
     transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
     if transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    return transaction
+    return schemas.Transaction.from_orm(transaction)
 
 @router.put("/{transaction_id}/status", response_model=schemas.Transaction)
-def update_transaction_status(
+async def update_transaction_status(
     transaction_id: int,
     status: schemas.TransactionStatus,
-    db: Session = Depends(get_db)
+    db: Database = Depends(get_database)
 ):
+    return await db.run(_update_transaction_status, transaction_id, status)
+
+def _update_transaction_status(
+    db: Session,
+    transaction_id: int,
+    new_status: schemas.TransactionStatus
+) -> schemas.Transaction:
     db_transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
     if db_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    db_transaction.status = status
+    # Verrouiller la vente pour maintenir ses montants payé et restant ; le statut
+    # de la transaction est relu sous ce verrou, que prennent tous ses écrivains
+    db_sale = db.query(models.Sale).filter(models.Sale.id == db_transaction.sale_id).with_for_update().first()
+    db.refresh(db_transaction)
+    old_status, old_updated_at = db_transaction.status, db_transaction.updated_at
+    db_sale.apply_transaction_status(db_transaction, new_status)
+    # Totaux du jour mis à jour dans la même transaction
+    daily_summary.record_status_change(db, db_sale.cashier_id, db_transaction, old_status, old_updated_at)
     db.commit()
     db.refresh(db_transaction)
-    return db_transaction 
\ No newline at end of file
+    return schemas.Transaction.from_orm(db_transaction) 
\ No newline at end of file
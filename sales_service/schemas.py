@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 class PaymentMethod(str, Enum):
@@ -38,6 +38,9 @@ class Customer(CustomerBase):
     class Config:
         from_attributes = True
 
+class CustomerSearchResult(Customer):
+    score: float
+
 class SaleItemBase(BaseModel):
     product_id: int
     quantity: int
@@ -119,7 +122,10 @@ class SaleUpdate(BaseModel):
 class Sale(SaleBase):
     id: int
     sale_number: str
+    cashier_name: Optional[str] = None
     total_amount: float
+    paid_amount: float = 0.0
+    remaining_amount: float = 0.0
     status: SaleStatus
     created_at: datetime
     updated_at: datetime
@@ -146,7 +152,7 @@ class TransactionResponse(BaseModel):
 class SaleResponse(BaseModel):
     id: int
     sale_number: str
-    customer_id: int
+    customer_id: Optional[int] = None  # Ventes sans client (POST /sales/bulk)
     cashier_id: int
     total_amount: float
     status: str
@@ -163,8 +169,57 @@ class SaleResponse(BaseModel):
 
 class BulkSaleCreate(BaseModel):
     items: List[SaleItemCreate]
+    notes: Optional[str] = None
+    # Heure de la vente sur le terminal (UTC si sans fuseau) ; heure du rejeu si absente
+    created_at: Optional[datetime] = None
+
+    def calculate_total(self) -> float:
+        return sum(item.calculate_total() for item in self.items)
 
 class BulkSalesCreate(BaseModel):
     cashier_id: int
     customer_id: Optional[int] = None
     sales: List[BulkSaleCreate]
+
+class BulkSaleResult(BaseModel):
+    index: int  # Position de la vente dans la requête
+    success: bool
+    sale_id: Optional[int] = None
+    sale_number: Optional[str] = None
+    total_amount: Optional[float] = None
+    error: Optional[str] = None
+
+class BulkSalesResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    duration_ms: float
+    sales_per_second: float
+    results: List[BulkSaleResult]
+
+class SummaryTotals(BaseModel):
+    transactions_count: int = 0
+    gross_amount: float = 0.0
+    refunds_count: int = 0
+    refunds_amount: float = 0.0
+    change_amount: float = 0.0
+    net_amount: float = 0.0  # Encaissements moins remboursements
+
+class DailySummaryRow(SummaryTotals):
+    day: date
+    cashier_id: int
+    payment_method: PaymentMethod
+
+class DailyReport(BaseModel):
+    day: date
+    rows: List[DailySummaryRow]
+    totals: SummaryTotals
+
+class RangeReportDay(SummaryTotals):
+    day: date
+
+class RangeReport(BaseModel):
+    date_from: date
+    date_to: date
+    days: List[RangeReportDay]
+    totals: SummaryTotals
@@ -1,18 +1,53 @@
-import requests
+import httpx
 from fastapi import HTTPException, status
+from jose import jwt, JWTError
 from typing import Optional, Dict
+from services.http_client import get_http_client
 
 class AuthService:
-    def __init__(self, auth_service_url: str):
+    def __init__(
+        self,
+        auth_service_url: str,
+        secret_key: Optional[str] = None,
+        algorithm: str = "HS256",
+        allow_unverified: bool = False
+    ):
+        # Sans clé, n'importe quel token forgé passerait la vérification locale :
+        # le mode non vérifié doit être demandé explicitement
+        if not secret_key and not allow_unverified:
+            raise RuntimeError(
+                "SECRET_KEY n'est pas défini : impossible de vérifier les tokens JWT "
+                "(AUTH_ALLOW_UNVERIFIED_TOKENS=true pour le développement uniquement)"
+            )
         self.auth_service_url = auth_service_url
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.allow_unverified = allow_unverified
+
+    def decode_token(self, token: str) -> Dict:
+        """
+        Vérifie localement la signature et l'expiration du token JWT.
+        En mode non vérifié (développement, sans clé secrète), seules les
+        revendications sont lues : la validation reste alors déléguée au service
+        d'authentification.
+        """
+        try:
+            if self.secret_key:
+                return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            return jwt.get_unverified_claims(token)
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials"
+            )
 
-    def get_current_user(self, token: str) -> Dict:
+    async def get_current_user(self, token: str) -> Dict:
         """
         Récupère et valide les informations de l'utilisateur connecté depuis le service d'authentification.
         """
         try:
             headers = {"Authorization": f"Bearer {token}"}
-            response = requests.get(f"{self.auth_service_url}/users/me", headers=headers)
+            response = await get_http_client().get(f"{self.auth_service_url}/users/me", headers=headers)
             
             if response.status_code == 200:
                 return response.json()
@@ -26,19 +61,19 @@ class AuthService:
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Error fetching user information"
                 )
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Authentication service is unavailable"
             )
 
-    def validate_token(self, token: str) -> bool:
+    async def validate_token(self, token: str) -> bool:
         """
         Valide le token JWT auprès du service d'authentification.
         """
         try:
             headers = {"Authorization": f"Bearer {token}"}
-            response = requests.get(f"{self.auth_service_url}/users/me", headers=headers)
+            response = await get_http_client().get(f"{self.auth_service_url}/users/me", headers=headers)
             return response.status_code == 200
         except:
             return False 
\ No newline at end of file
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from fastapi import HTTPException, status
+from jose import jwt, JWTError
+from services.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+# Champs demandés au service d'authentification
+DIRECTORY_FIELDS = "id,first_name,last_name,role"
+# Marge avant l'expiration du token de service à partir de laquelle il est renouvelé
+TOKEN_RENEWAL_MARGIN = 60
+
+class CashierDirectory:
+    """
+    Annuaire en mémoire des caissiers (id -> informations d'affichage).
+
+    Il est rempli en un seul appel au service d'authentification puis
+    rafraîchi périodiquement ; les lectures ne font jamais d'appel réseau.
+
+    Avec un compte de service (`username` / `password`), le token est obtenu par
+    POST /auth/token, renouvelé avant son expiration et redemandé sur une réponse
+    401. Un `service_token` fixe reste accepté, mais cesse de fonctionner à son
+    expiration.
+    """
+
+    def __init__(
+        self,
+        auth_service_url: str,
+        service_token: Optional[str] = None,
+        refresh_interval: int = 300,
+        username: Optional[str] = None,
+        password: Optional[str] = None
+    ):
+        self.auth_service_url = auth_service_url
+        self.service_token = service_token
+        self.refresh_interval = refresh_interval
+        self.username = username
+        self.password = password
+        self._entries: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self._login_lock = asyncio.Lock()
+        self.last_refresh: Optional[float] = None
+        self._etag: Optional[str] = None
+
+    @property
+    def can_login(self) -> bool:
+        return bool(self.username and self.password)
+
+    @property
+    def configured(self) -> bool:
+        return self.can_login or bool(self.service_token)
+
+    @staticmethod
+    def format_display_name(user: Dict) -> str:
+        return f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
+
+    def get(self, cashier_id: int) -> Optional[Dict]:
+        with self._lock:
+            return self._entries.get(cashier_id)
+
+    def display_name(self, cashier_id: int) -> Optional[str]:
+        entry = self.get(cashier_id)
+        return entry["display_name"] if entry else None
+
+    def display_names(self) -> Dict[int, str]:
+        """Copie de l'annuaire sous la forme id -> nom affiché."""
+        with self._lock:
+            return {cashier_id: entry["display_name"] for cashier_id, entry in self._entries.items()}
+
+    def update(self, users: Iterable[Dict]):
+        """Ajoute ou remplace les entrées des utilisateurs fournis."""
+        entries = {
+            user["id"]: {
+                "id": user["id"],
+                "first_name": user.get("first_name"),
+                "last_name": user.get("last_name"),
+                "role": user.get("role"),
+                "display_name": self.format_display_name(user),
+            }
+            for user in users
+        }
+        with self._lock:
+            self._entries.update(entries)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _token_expiring(self) -> bool:
+        if not self.service_token:
+            return True
+        try:
+            exp = jwt.get_unverified_claims(self.service_token).get("exp")
+        except JWTError:
+            return True
+        return exp is not None and exp - TOKEN_RENEWAL_MARGIN <= time.time()
+
+    async def _login(self, stale_token: Optional[str]):
+        """Obtient un token pour le compte de service, une seule fois pour les appels concurrents."""
+        async with self._login_lock:
+            if self.service_token != stale_token:
+                return
+            response = await get_http_client().post(
+                f"{self.auth_service_url}/auth/token",
+                data={"username": self.username, "password": self.password}
+            )
+            response.raise_for_status()
+            self.service_token = response.json()["access_token"]
+            logger.info("Token de service de l'annuaire des caissiers renouvelé")
+
+    async def _headers(self, renew: bool = False) -> Dict:
+        if self.can_login and (renew or self._token_expiring()):
+            await self._login(self.service_token)
+        if not self.service_token:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AUTH_SERVICE_USERNAME / AUTH_SERVICE_PASSWORD (ou AUTH_SERVICE_TOKEN) non configurés"
+            )
+        return {"Authorization": f"Bearer {self.service_token}"}
+
+    async def _request(self, method: str, url: str, headers: Optional[Dict] = None, **kwargs):
+        """Appel authentifié ; sur une réponse 401, le token est renouvelé puis l'appel rejoué une fois."""
+        response = await get_http_client().request(
+            method, url, headers={**(headers or {}), **await self._headers()}, **kwargs
+        )
+        if response.status_code == status.HTTP_401_UNAUTHORIZED:
+            if not self.can_login:
+                logger.error("Token de service de l'annuaire des caissiers refusé (expiré ?) : "
+                             "configurer AUTH_SERVICE_USERNAME / AUTH_SERVICE_PASSWORD")
+                return response
+            response = await get_http_client().request(
+                method, url, headers={**(headers or {}), **await self._headers(renew=True)}, **kwargs
+            )
+        return response
+
+    async def refresh(self) -> int:
+        """
+        Recharge tout l'annuaire en un appel au service d'authentification.
+        Seuls les champs utiles sont demandés, et l'ETag de la réponse précédente
+        est renvoyé : un annuaire inchangé ne coûte qu'une réponse 304.
+        """
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        response = await self._request(
+            "GET",
+            f"{self.auth_service_url}/users/",
+            params={"fields": DIRECTORY_FIELDS},
+            headers=headers
+        )
+        if response.status_code == 304:
+            self.last_refresh = time.time()
+            return len(self)
+        response.raise_for_status()
+        users = response.json()
+        self.update(users)
+        self._etag = response.headers.get("ETag")
+        self.last_refresh = time.time()
+        return len(users)
+
+    async def resolve(self, cashier_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Complète l'annuaire pour les identifiants inconnus, en un seul appel groupé."""
+        cashier_ids = list(cashier_ids)
+        missing = sorted({cashier_id for cashier_id in cashier_ids if self.get(cashier_id) is None})
+        if missing:
+            response = await self._request(
+                "POST",
+                f"{self.auth_service_url}/users/lookup",
+                json={"ids": missing, "fields": DIRECTORY_FIELDS.split(",")}
+            )
+            response.raise_for_status()
+            self.update(response.json()["users"])
+        return {cashier_id: self.get(cashier_id) for cashier_id in cashier_ids}
+
+    async def run_periodic_refresh(self):
+        """Boucle de rafraîchissement, lancée au démarrage du service."""
+        while True:
+            try:
+                count = await self.refresh()
+                logger.info("Annuaire des caissiers rafraîchi : %d utilisateurs", count)
+            except Exception as e:
+                logger.warning("Échec du rafraîchissement de l'annuaire des caissiers : %s", e)
+            await asyncio.sleep(self.refresh_interval)
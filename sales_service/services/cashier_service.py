@@ -1,35 +1,135 @@
-import requests
+"""
+Informations des caissiers dénormalisées sur les ventes.
+
+Backfill des ventes existantes (depuis le dossier sales_service) :
+    python -m services.cashier_service
+
+Il est aussi lancé automatiquement par le worker qui applique la migration
+0005_sale_cashier_name, dès que l'annuaire est chargé.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+from sqlalchemy import case, update
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import models
-from typing import Optional
+from services.cashier_directory import CashierDirectory
+
+logger = logging.getLogger(__name__)
+
+# Nombre de caissiers traités par requête UPDATE ... CASE
+BACKFILL_CASHIERS_PER_STATEMENT = 500
+# Nombre maximal de ventes modifiées par requête, pour garder des transactions courtes
+BACKFILL_ROWS_PER_STATEMENT = 50000
 
 class CashierService:
-    def __init__(self, auth_service_url: str):
-        self.auth_service_url = auth_service_url
+    def __init__(self, directory: CashierDirectory):
+        self.directory = directory
 
     def get_cashier_info(self, cashier_id: int) -> Optional[dict]:
-        """Récupère les informations du caissier depuis le service d'authentification"""
-        try:
-            response = requests.get(f"{self.auth_service_url}/users/{cashier_id}")
-            if response.status_code == 200:
-                return response.json()
-            return None
-        except Exception as e:
-            print(f"Erreur lors de la récupération des informations du caissier: {e}")
-            return None
-
-    def update_sale_cashier_info(self, db: Session, sale: models.Sale):
-        """Met à jour les informations du caissier pour une vente"""
-        cashier_info = self.get_cashier_info(sale.cashier_id)
-        if cashier_info:
-            sale.update_cashier_info(
-                first_name=cashier_info["first_name"],
-                last_name=cashier_info["last_name"]
+        """Récupère les informations du caissier depuis l'annuaire en mémoire"""
+        return self.directory.get(cashier_id)
+
+    def update_sale_cashier_info(self, sale: models.Sale):
+        """Met à jour les informations du caissier pour une vente (sans commit)"""
+        cashier_name = self.directory.display_name(sale.cashier_id)
+        if cashier_name:
+            sale.cashier_name = cashier_name
+
+    def update_all_sales_cashier_info(self, db: Session) -> int:
+        """
+        Renseigne le nom du caissier sur toutes les ventes qui n'en ont pas.
+        Chaque requête traite un paquet de caissiers avec un UPDATE ... CASE
+        borné à BACKFILL_ROWS_PER_STATEMENT lignes : le nombre d'allers-retours
+        dépend du nombre de caissiers et de ventes divisé par cette borne, pas
+        du nombre de ventes.
+        """
+        names = self.directory.display_names()
+        cashier_ids: List[int] = sorted(names)
+        updated = 0
+        for start in range(0, len(cashier_ids), BACKFILL_CASHIERS_PER_STATEMENT):
+            chunk: Dict[int, str] = {
+                cashier_id: names[cashier_id]
+                for cashier_id in cashier_ids[start:start + BACKFILL_CASHIERS_PER_STATEMENT]
+            }
+            statement = (
+                update(models.Sale)
+                .where(models.Sale.cashier_id.in_(list(chunk)))
+                .where(models.Sale.cashier_name.is_(None))
+                .values(cashier_name=case(chunk, value=models.Sale.cashier_id))
+                .with_dialect_options(mysql_limit=BACKFILL_ROWS_PER_STATEMENT)
+                .execution_options(synchronize_session=False)
             )
-            db.commit()
+            while True:
+                rowcount = db.execute(statement).rowcount
+                db.commit()
+                updated += rowcount
+                if rowcount < BACKFILL_ROWS_PER_STATEMENT:
+                    break
+        return updated
+
+cashier_directory = CashierDirectory(
+    os.getenv("AUTH_SERVICE_URL", "http://localhost:8001"),
+    service_token=os.getenv("AUTH_SERVICE_TOKEN"),
+    refresh_interval=int(os.getenv("CASHIER_DIRECTORY_REFRESH_SECONDS", "300")),
+    username=os.getenv("AUTH_SERVICE_USERNAME"),
+    password=os.getenv("AUTH_SERVICE_PASSWORD")
+)
+cashier_service = CashierService(cashier_directory)
+
+def _sale_cashier_ids() -> List[int]:
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        return [row[0] for row in db.query(models.Sale.cashier_id).distinct()]
+    finally:
+        db.close()
+
+def _update_all_sales() -> int:
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        return cashier_service.update_all_sales_cashier_info(db)
+    finally:
+        db.close()
+
+async def backfill_sales_cashier_names(load_directory: bool = True) -> int:
+    """
+    Renseigne cashier_name sur les ventes qui n'en ont pas : annuaire complet
+    (sauf s'il est déjà chargé), caissiers des ventes absents de la liste, puis
+    mise à jour groupée. Retourne le nombre de ventes modifiées.
+    """
+    if load_directory:
+        count = await cashier_directory.refresh()
+        logger.info("Annuaire chargé : %d utilisateurs", count)
+    await cashier_directory.resolve(await run_in_threadpool(_sale_cashier_ids))
+    return await run_in_threadpool(_update_all_sales)
+
+async def run_startup_backfill(retry_interval: float = 30):
+    """Backfill après l'ajout de la colonne cashier_name : attend que l'annuaire soit chargé, puis réessaie en cas d'échec."""
+    while True:
+        if cashier_directory.last_refresh is not None:
+            try:
+                updated = await backfill_sales_cashier_names(load_directory=False)
+                logger.info("Nom du caissier renseigné sur %d vente(s)", updated)
+                return
+            except Exception as e:
+                logger.warning("Échec du backfill des noms de caissiers : %s", e)
+        await asyncio.sleep(retry_interval)
+
+def main():
+    from services.http_client import close_http_client
+
+    async def backfill():
+        try:
+            return await backfill_sales_cashier_names()
+        finally:
+            await close_http_client()
+
+    updated = asyncio.run(backfill())
+    print(f"{updated} vente(s) mises à jour")
 
-    def update_all_sales_cashier_info(self, db: Session):
-        """Met à jour les informations des caissiers pour toutes les ventes"""
-        sales = db.query(models.Sale).filter(models.Sale.cashier_name.is_(None)).all()
-        for sale in sales:
-            self.update_sale_cashier_info(db, sale) 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
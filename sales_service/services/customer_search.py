@@ -0,0 +1,377 @@
+"""
+Recherche des clients pour la caisse (GET /customers/search) : préfixe et
+recherche approchée sur le nom, le téléphone et l'email.
+
+Les colonnes normalized_* (migration 0003) portent les formes normalisées et
+servent à la recherche par préfixe en base. L'index en mémoire (vocabulaire
+trié des mots, trigrammes des mots distincts) est chargé au démarrage, mis à
+jour par lectures incrémentales sur updated_at et reconstruit périodiquement
+(clients supprimés par un autre worker). Tant qu'il n'est pas chargé, ou s'il
+est désactivé (CUSTOMER_SEARCH_INDEX_ENABLED=false), la recherche se replie sur
+les index MySQL (préfixe uniquement).
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import models
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_NON_DIGIT = re.compile(r"\D+")
+# Recouvrement entre deux lectures incrémentales (modifications validées en retard)
+CHANGES_OVERLAP = timedelta(seconds=5)
+REFRESH_BATCH_SIZE = 10000
+
+def normalize_text(value: Optional[str]) -> str:
+    """Minuscules, sans accents, ponctuation remplacée par des espaces."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", value.lower()).strip()
+
+def normalize_name(first_name: Optional[str], last_name: Optional[str]) -> Optional[str]:
+    return normalize_text(f"{first_name or ''} {last_name or ''}")[:201] or None
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Chiffres du numéro uniquement (+33 6 12 34 56 78 -> 33612345678)."""
+    return _NON_DIGIT.sub("", phone or "")[:20] or None
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    return email.strip().lower()[:255] if email else None
+
+def normalized_fields(first_name, last_name, email, phone) -> Dict[str, Optional[str]]:
+    """Valeurs des colonnes normalized_* d'un client."""
+    return {
+        "normalized_name": normalize_name(first_name, last_name),
+        "normalized_phone": normalize_phone(phone),
+        "normalized_email": normalize_email(email),
+    }
+
+def looks_like_phone(query: str) -> bool:
+    """Saisie composée surtout de chiffres : recherche sur le téléphone."""
+    digits = normalize_phone(query) or ""
+    return len(digits) >= 3 and len(digits) >= 0.6 * len(query.replace(" ", ""))
+
+def _word_grams(word: str) -> Set[str]:
+    """Trigrammes d'un mot encadré d'espaces (similarité entre mots)."""
+    padded = "  " + word + " "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+class _PrefixIndex:
+    """Clés triées (préfixe par bisection) -> identifiants des clients, en listes ajout seul."""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.ids: Dict[str, array] = {}
+
+    def add(self, key: str, customer_id: int, bulk: bool = False) -> bool:
+        """Ajoute l'identifiant ; retourne True si la clé est nouvelle. En chargement (bulk), trier avec finalize()."""
+        posting = self.ids.get(key)
+        new = posting is None
+        if new:
+            posting = self.ids[key] = array("I")
+            if bulk:
+                self.keys.append(key)
+            else:
+                bisect.insort(self.keys, key)
+        posting.append(customer_id)
+        return new
+
+    def finalize(self):
+        self.keys.sort()
+
+    def prefixed(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.keys, prefix)
+        return self.keys[start:bisect.bisect_left(self.keys, prefix + "\uffff", start)]
+
+class _IndexState:
+    """Structures de l'index, reconstruites ensemble lors d'un rechargement complet."""
+
+    def __init__(self):
+        # id -> (nom normalisé, téléphone normalisé, email normalisé)
+        self.docs: Dict[int, Tuple[str, str, str]] = {}
+        self.words = _PrefixIndex()
+        self.phones = _PrefixIndex()
+        self.reversed_phones = _PrefixIndex()
+        self.emails = _PrefixIndex()
+        # trigramme -> mots du vocabulaire qui le contiennent (recherche approchée)
+        self.word_grams: Dict[str, List[str]] = {}
+
+    def add(self, customer_id: int, document: Tuple[str, str, str], bulk: bool = False):
+        self.docs[customer_id] = document
+        name, phone, email = document
+        for word in set(name.split()):
+            if self.words.add(word, customer_id, bulk):
+                for gram in _word_grams(word):
+                    self.word_grams.setdefault(gram, []).append(word)
+        if phone:
+            self.phones.add(phone, customer_id, bulk)
+            self.reversed_phones.add(phone[::-1], customer_id, bulk)
+        if email:
+            self.emails.add(email, customer_id, bulk)
+
+    def finalize(self):
+        for index in (self.words, self.phones, self.reversed_phones, self.emails):
+            index.finalize()
+
+class CustomerSearchIndex:
+    """
+    Index des clients en mémoire : vocabulaire trié des mots du nom, numéros de
+    téléphone (à l'endroit et à l'envers, pour les derniers chiffres) et emails,
+    interrogés par préfixe ; trigrammes des mots distincts pour la recherche approchée.
+
+    Les listes de clients par clé ne sont qu'ajoutées (array d'entiers, compact) :
+    une fiche modifiée y figure en double et une fiche supprimée y reste jusqu'au
+    rechargement complet. Les candidats sont donc toujours revérifiés sur la
+    fiche courante (`docs`) avant d'être notés.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 5,
+        full_reload_interval: float = 3600,
+        min_similarity: float = 0.6,
+        max_candidates: int = 1000
+    ):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.min_similarity = min_similarity
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._state = _IndexState()
+        self._since: Optional[datetime] = None
+        self.last_sync: Optional[float] = None
+        self.last_full_reload: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.last_sync is not None
+
+    @staticmethod
+    def _document(first_name, last_name, email, phone) -> Tuple[str, str, str]:
+        return (
+            normalize_name(first_name, last_name) or "",
+            normalize_phone(phone) or "",
+            normalize_email(email) or "",
+        )
+
+    def upsert(self, customer_id: int, first_name, last_name, email, phone):
+        """Met à jour un client dans l'index (création ou modification dans ce worker)."""
+        if not self.ready:
+            return
+        with self._lock:
+            self._state.add(customer_id, self._document(first_name, last_name, email, phone))
+
+    def remove(self, *customer_ids: int):
+        with self._lock:
+            for customer_id in customer_ids:
+                self._state.docs.pop(customer_id, None)
+
+    def _candidates(self, state: _IndexState, index: _PrefixIndex, keys: List[str]):
+        """Identifiants des clés, dans l'ordre des clés, sans doublon et au plus max_candidates."""
+        seen: Set[int] = set()
+        for key in keys:
+            for customer_id in reversed(index.ids[key]):
+                if customer_id not in seen:
+                    seen.add(customer_id)
+                    document = state.docs.get(customer_id)
+                    if document is not None:
+                        yield customer_id, document
+                if len(seen) >= self.max_candidates:
+                    return
+
+    def _similar_words(self, state: _IndexState, token: str) -> Dict[str, float]:
+        """Mots du vocabulaire proches de `token` (coefficient de Dice sur les trigrammes)."""
+        grams = _word_grams(token)
+        hits: Dict[str, int] = {}
+        for gram in grams:
+            for word in state.word_grams.get(gram, ()):
+                hits[word] = hits.get(word, 0) + 1
+        similar = {}
+        for word, count in hits.items():
+            # Un mot de n lettres a au plus n + 1 trigrammes
+            similarity = 2 * count / (len(grams) + len(word) + 1)
+            if similarity >= self.min_similarity:
+                similar[word] = similarity
+        return similar
+
+    def _search_phone(self, state: _IndexState, digits: str):
+        for customer_id, (_, phone, _) in self._candidates(state, state.phones, state.phones.prefixed(digits)):
+            if phone.startswith(digits):
+                yield (3.0 if phone == digits else 2.5), customer_id
+        reversed_digits = digits[::-1]
+        keys = state.reversed_phones.prefixed(reversed_digits)
+        for customer_id, (_, phone, _) in self._candidates(state, state.reversed_phones, keys):
+            if phone.endswith(digits) and not phone.startswith(digits):
+                yield 2.0, customer_id
+
+    def _search_email(self, state: _IndexState, prefix: str):
+        for customer_id, (_, _, email) in self._candidates(state, state.emails, state.emails.prefixed(prefix)):
+            if email.startswith(prefix):
+                yield (3.0 if email == prefix else 2.5), customer_id
+
+    def _search_words(self, state: _IndexState, tokens: List[str], text: str, limit: int):
+        # Pour chaque mot saisi : mots du vocabulaire acceptés et leur score
+        matches: List[Dict[str, float]] = []
+        for token in tokens:
+            words = {word: 1.0 for word in state.words.prefixed(token)}
+            if token in words:
+                words[token] = 1.2
+            # Recherche approchée seulement si le préfixe trouve peu de clients (faute de frappe)
+            if len(token) >= 3 and sum(len(state.words.ids[word]) for word in words) < limit:
+                for word, similarity in self._similar_words(state, token).items():
+                    words.setdefault(word, 0.8 * similarity)
+            if not words:
+                return
+            matches.append(words)
+
+        # Candidats : d'abord les clients des mots saisis en entier (peu nombreux), puis ceux
+        # du mot saisi le plus sélectif, mots les plus proches d'abord
+        sources = [[token] for token, words in zip(tokens, matches)
+                   if token in words and len(state.words.ids[token]) <= self.max_candidates]
+        pivot = min(matches, key=lambda words: sum(len(state.words.ids[word]) for word in words))
+        sources.append(sorted(pivot, key=lambda word: (-pivot[word], len(word), word)))
+        # Score maximal possible : inutile de poursuivre une fois `limit` clients à ce score
+        top_score = sum(max(words.values()) for words in matches) / len(matches) + 0.5
+        at_top = 0
+        for keys in sources:
+            for customer_id, (name, _, _) in self._candidates(state, state.words, keys):
+                document_words = name.split()
+                score = 0.0
+                for words in matches:
+                    best = max((words.get(word, 0.0) for word in document_words), default=0.0)
+                    if not best:
+                        break
+                    score += best
+                else:
+                    score /= len(matches)
+                    if name.startswith(text):
+                        score += 0.5
+                    yield score, customer_id
+                    if score >= top_score:
+                        at_top += 1
+                        if at_top >= limit:
+                            return
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[float, int]]:
+        """Retourne les `limit` meilleurs (score, id) pour la saisie `query`."""
+        text = normalize_text(query)
+        tokens = text.split()
+        with self._lock:
+            state = self._state
+            if looks_like_phone(query):
+                scored = self._search_phone(state, normalize_phone(query))
+            elif "@" in query:
+                scored = self._search_email(state, normalize_email(query))
+            elif tokens:
+                scored = self._search_words(state, tokens, text, limit)
+            else:
+                return []
+            # Meilleurs scores d'abord, puis les clients les plus récents (id le plus élevé)
+            best: Dict[int, float] = {}
+            for score, customer_id in scored:
+                if score > best.get(customer_id, 0.0):
+                    best[customer_id] = score
+        return heapq.nlargest(limit, ((round(score, 3), customer_id) for customer_id, score in best.items()))
+
+    def _load(self, db: Session, since: Optional[datetime]) -> List[Tuple[int, Tuple[str, str, str]]]:
+        """Lit les clients modifiés depuis `since` (tous si None), par paquets sur (updated_at, id) ou id."""
+        Customer = models.Customer
+        columns = (Customer.id, Customer.first_name, Customer.last_name, Customer.email,
+                   Customer.phone, Customer.updated_at)
+        rows, last_updated, last_id = [], None, 0
+        while True:
+            query = select(*columns)
+            if since is None:
+                query = query.where(Customer.id > last_id).order_by(Customer.id)
+            else:
+                if last_updated is None:
+                    query = query.where(Customer.updated_at >= since - CHANGES_OVERLAP)
+                else:
+                    query = query.where(or_(
+                        Customer.updated_at > last_updated,
+                        and_(Customer.updated_at == last_updated, Customer.id > last_id)
+                    ))
+                query = query.order_by(Customer.updated_at, Customer.id)
+            batch = db.execute(query.limit(REFRESH_BATCH_SIZE)).all()
+            for row in batch:
+                rows.append((row.id, self._document(row.first_name, row.last_name, row.email, row.phone)))
+            if len(batch) < REFRESH_BATCH_SIZE:
+                break
+            last_id = batch[-1].id
+            last_updated = batch[-1].updated_at if since is not None else None
+        return rows
+
+    def refresh(self) -> int:
+        """Applique les modifications depuis la dernière lecture (ou recharge tout). Bloquant."""
+        now = time.monotonic()
+        full = self._since is None or self.last_full_reload is None \
+            or now - self.last_full_reload >= self.full_reload_interval
+        db = SessionLocal()
+        try:
+            # Heure de la base avant la lecture : les modifications ultérieures seront relues
+            server_time = db.execute(select(func.now())).scalar()
+            rows = self._load(db, None if full else self._since)
+        finally:
+            db.close()
+
+        if full:
+            # Nouvel index construit hors verrou puis substitué à l'ancien
+            state = _IndexState()
+            for customer_id, document in rows:
+                state.add(customer_id, document, bulk=True)
+            state.finalize()
+            with self._lock:
+                self._state = state
+                self.last_full_reload = now
+        else:
+            with self._lock:
+                for customer_id, document in rows:
+                    self._state.add(customer_id, document)
+        self._since = server_time
+        self.last_sync = now
+        return len(rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            state = self._state
+            documents = len(state.docs)
+            words = len(state.words.keys)
+            phones = len(state.phones.keys)
+        return {
+            "documents": documents,
+            "words": words,
+            "phones": phones,
+            "staleness_seconds": round(time.monotonic() - self.last_sync, 3) if self.last_sync else None,
+        }
+
+    async def run_periodic_refresh(self):
+        """Boucle de chargement puis de mise à jour de l'index, lancée au démarrage du service."""
+        while True:
+            try:
+                await run_in_threadpool(self.refresh)
+            except Exception as e:
+                logger.warning("Échec du rafraîchissement de l'index de recherche des clients : %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+customer_search_index = CustomerSearchIndex(
+    refresh_interval=float(os.getenv("CUSTOMER_SEARCH_REFRESH_SECONDS", "5")),
+    full_reload_interval=float(os.getenv("CUSTOMER_SEARCH_FULL_RELOAD_SECONDS", "3600")),
+    min_similarity=float(os.getenv("CUSTOMER_SEARCH_MIN_SIMILARITY", "0.6")),
+    max_candidates=int(os.getenv("CUSTOMER_SEARCH_MAX_CANDIDATES", "1000"))
+) if os.getenv("CUSTOMER_SEARCH_INDEX_ENABLED", "true").lower() == "true" else None
@@ -0,0 +1,179 @@
+"""
+Totaux journaliers des ventes par caissier et moyen de paiement (table daily_sales_summary).
+
+Les paiements et les remboursements sont ajoutés dans la transaction qui les
+enregistre ; les rapports lisent uniquement cette table. Le jour retenu est la
+date de la base au moment du paiement (ou du remboursement). Un changement de
+statut d'une transaction existante suit les règles de la reconstruction :
+encaissement au jour de création de la transaction, remboursement au jour de
+sa dernière mise à jour.
+
+Reconstruction depuis les transactions (depuis le dossier sales_service) :
+    python -m services.daily_summary                                  # tout l'historique
+    python -m services.daily_summary --from 2024-01-01 --to 2024-02-01
+"""
+import argparse
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import and_, delete, func, literal, select, true
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+import models
+
+SUMMARY_COLUMNS = ("transactions_count", "gross_amount", "refunds_count", "refunds_amount", "change_amount")
+
+def _upsert(db: Session, rows: List[Dict]):
+    """Ajoute les compteurs de `rows` aux lignes existantes (INSERT ... ON DUPLICATE KEY UPDATE)."""
+    if not rows:
+        return
+    table = models.DailySalesSummary.__table__
+    statement = insert(table).values(rows)
+    statement = statement.on_duplicate_key_update({
+        column: table.c[column] + statement.inserted[column] for column in SUMMARY_COLUMNS
+    })
+    db.execute(statement)
+
+def _rows_by_method(
+    cashier_id: int,
+    transactions: Iterable[models.Transaction],
+    refund: bool,
+    day=None,
+    sign: int = 1
+) -> List[Dict]:
+    """Compteurs à ajouter (sign=1) ou à retirer (sign=-1) ; jour courant de la base par défaut."""
+    totals: Dict[models.PaymentMethod, Dict] = {}
+    for transaction in transactions:
+        row = totals.setdefault(transaction.payment_method, {
+            "day": func.current_date() if day is None else day,
+            "cashier_id": cashier_id,
+            "payment_method": transaction.payment_method,
+            **{column: 0 for column in SUMMARY_COLUMNS}
+        })
+        if refund:
+            row["refunds_count"] += sign
+            row["refunds_amount"] = round(row["refunds_amount"] + sign * transaction.amount, 2)
+        else:
+            row["transactions_count"] += sign
+            row["gross_amount"] = round(row["gross_amount"] + sign * transaction.amount, 2)
+            row["change_amount"] = round(row["change_amount"] + sign * (transaction.change_amount or 0.0), 2)
+    # Lignes toujours mises à jour dans le même ordre, pour éviter les interblocages
+    return [totals[method] for method in sorted(totals, key=lambda method: method.value)]
+
+def record_payments(db: Session, cashier_id: int, transactions: Iterable[models.Transaction]):
+    """Ajoute des transactions encaissées au total du jour (sans commit)."""
+    _upsert(db, _rows_by_method(cashier_id, transactions, refund=False))
+
+def record_status_change(
+    db: Session,
+    cashier_id: int,
+    transaction: models.Transaction,
+    old_status: models.TransactionStatus,
+    old_updated_at: Optional[datetime]
+):
+    """
+    Répercute le changement de statut d'une transaction existante (sans commit) :
+    elle compte comme encaissement si elle est terminée ou remboursée, et comme
+    remboursement si elle est remboursée, comme dans `rebuild_daily_summary`.
+    """
+    counted = (models.TransactionStatus.COMPLETED, models.TransactionStatus.REFUNDED)
+    new_status = transaction.status
+    payment = (new_status in counted) - (old_status in counted)
+    refund = (new_status == models.TransactionStatus.REFUNDED) - (old_status == models.TransactionStatus.REFUNDED)
+    if payment:
+        _upsert(db, _rows_by_method(
+            cashier_id, [transaction], refund=False, day=transaction.created_at.date(), sign=payment
+        ))
+    if refund > 0:
+        _upsert(db, _rows_by_method(cashier_id, [transaction], refund=True))
+    elif refund < 0:
+        # Le remboursement annulé avait été compté au jour de la précédente mise à jour
+        day = old_updated_at.date() if old_updated_at is not None else None
+        _upsert(db, _rows_by_method(cashier_id, [transaction], refund=True, day=day, sign=-1))
+
+def rebuild_daily_summary(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> int:
+    """
+    Recalcule les totaux de [date_from, date_to[ depuis les transactions :
+    encaissements au jour de création des transactions terminées ou remboursées,
+    remboursements au jour de leur dernière mise à jour.
+    """
+    Transaction = models.Transaction
+    Summary = models.DailySalesSummary
+    table = Summary.__table__
+
+    # Bornes appliquées aux colonnes brutes (date ou horodatage) pour rester indexables
+    def day_range(day_column):
+        criteria = []
+        if date_from is not None:
+            criteria.append(day_column >= date_from)
+        if date_to is not None:
+            criteria.append(day_column < date_to)
+        return and_(*criteria) if criteria else true()
+
+    payment_day = func.date(Transaction.created_at)
+    refund_day = func.date(Transaction.updated_at)
+    payments = (
+        select(
+            payment_day,
+            models.Sale.cashier_id,
+            Transaction.payment_method,
+            func.count(),
+            func.sum(Transaction.amount),
+            literal(0),
+            literal(0),
+            func.coalesce(func.sum(Transaction.change_amount), 0)
+        )
+        .join(models.Sale, models.Sale.id == Transaction.sale_id)
+        .where(Transaction.status.in_([models.TransactionStatus.COMPLETED, models.TransactionStatus.REFUNDED]))
+        .where(day_range(Transaction.created_at))
+        .group_by(payment_day, models.Sale.cashier_id, Transaction.payment_method)
+    )
+    refunds = (
+        select(
+            refund_day,
+            models.Sale.cashier_id,
+            Transaction.payment_method,
+            literal(0),
+            literal(0),
+            func.count(),
+            func.sum(Transaction.amount),
+            literal(0)
+        )
+        .join(models.Sale, models.Sale.id == Transaction.sale_id)
+        .where(Transaction.status == models.TransactionStatus.REFUNDED)
+        .where(day_range(Transaction.updated_at))
+        .group_by(refund_day, models.Sale.cashier_id, Transaction.payment_method)
+    )
+
+    columns = ["day", "cashier_id", "payment_method", *SUMMARY_COLUMNS]
+    try:
+        db.execute(delete(table).where(day_range(table.c.day)))
+        db.execute(insert(table).from_select(columns, payments))
+        statement = insert(table).from_select(columns, refunds)
+        statement = statement.on_duplicate_key_update({
+            "refunds_count": statement.inserted.refunds_count,
+            "refunds_amount": statement.inserted.refunds_amount,
+        })
+        db.execute(statement)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return db.query(func.count()).select_from(Summary).filter(day_range(Summary.day)).scalar()
+
+def main():
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="Premier jour (inclus)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Dernier jour (exclu)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = rebuild_daily_summary(db, args.date_from, args.date_to)
+    finally:
+        db.close()
+    print(f"{count} ligne(s) de synthèse recalculée(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+
+import httpx
+from common.metrics import httpx_event_hooks
+
+# Client HTTP partagé par tous les appels sortants du service (auth_service, ...).
+# Les connexions sont gardées ouvertes (keep-alive) et réutilisées entre les requêtes.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_KEEPALIVE_SIZE = int(os.getenv("HTTP_KEEPALIVE_SIZE", str(HTTP_POOL_SIZE)))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "2.0"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5.0"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5.0"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Retourne le client HTTP asynchrone partagé, créé au premier appel."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE,
+                max_keepalive_connections=HTTP_KEEPALIVE_SIZE
+            ),
+            timeout=httpx.Timeout(
+                connect=HTTP_CONNECT_TIMEOUT,
+                read=HTTP_READ_TIMEOUT,
+                write=HTTP_READ_TIMEOUT,
+                pool=HTTP_POOL_TIMEOUT
+            ),
+            # Durée des appels sortants, exposée sur /metrics
+            event_hooks=httpx_event_hooks()
+        )
+    return _client
+
+async def close_http_client():
+    """Ferme proprement les connexions du client partagé (arrêt du service)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,295 @@
+"""
+Idempotence des écritures rejouées par les terminaux (en-tête Idempotency-Key).
+
+La première requête portant une clé la réserve (ligne IN_PROGRESS), exécute
+l'opération puis enregistre sa réponse. La clé passe à COMPLETED dans la
+transaction même de l'écriture (événement before_commit de la session) : une
+écriture validée ne peut plus être exécutée une seconde fois, même si
+l'enregistrement de la réponse échoue ensuite. Tant que l'opération dure, le
+verrou de la clé est prolongé régulièrement. Une nouvelle tentative avec la même
+clé reçoit la réponse enregistrée sans toucher aux tables des ventes ; une
+tentative concurrente attend la fin de la requête en cours. Si l'opération échoue
+avant d'avoir rien écrit, la clé est libérée et la tentative suivante l'exécute à
+nouveau.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import models
+from database import Database, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = "Idempotent-Replayed"
+
+Key = models.IdempotencyKey
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+def _pending(existing: Dict) -> bool:
+    """Requête en cours, ou écriture validée dont la réponse n'est pas encore enregistrée."""
+    return existing["status"] == models.IdempotencyStatus.IN_PROGRESS or existing["response_body"] is None
+
+class IdempotencyStore:
+    """
+    - ttl : durée de conservation d'une réponse enregistrée
+    - lock_timeout : au-delà, une clé restée IN_PROGRESS (worker arrêté) est reprise ;
+      le verrou est prolongé toutes les lock_timeout / 3 secondes tant que la requête dure
+    - wait_timeout : attente maximale d'une tentative concurrente avant une 409
+    """
+
+    def __init__(self, ttl: int = 86400, lock_timeout: int = 60, wait_timeout: float = 30):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        # Requêtes en cours dans ce worker : les doublons locaux attendent l'événement
+        # au lieu d'interroger la base
+        self._inflight: Dict[str, asyncio.Event] = {}
+
+    def _claim(self, db: Session, key: str, request_hash: str) -> Optional[Dict]:
+        """
+        Réserve la clé. Retourne None si elle est acquise, sinon l'état de la
+        ligne existante (requête en cours ou réponse enregistrée).
+        """
+        for _ in range(3):
+            now = datetime.utcnow()
+            try:
+                db.execute(insert(Key).values(
+                    key=key,
+                    request_hash=request_hash,
+                    status=models.IdempotencyStatus.IN_PROGRESS,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=self.lock_timeout)
+                ))
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            row = db.execute(
+                select(Key.request_hash, Key.status, Key.response_status, Key.response_body, Key.expires_at)
+                .where(Key.key == key)
+            ).first()
+            db.commit()
+            if row is None:
+                # Clé libérée entre-temps : nouvelle tentative de réservation
+                continue
+            if row.expires_at <= now:
+                # Réponse périmée ou requête abandonnée : la clé est reprise
+                db.execute(delete(Key).where(Key.key == key, Key.expires_at <= now))
+                db.commit()
+                continue
+            return {
+                "request_hash": row.request_hash,
+                "status": row.status,
+                "response_status": row.response_status,
+                "response_body": row.response_body,
+            }
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Clé d'idempotence en cours de réutilisation, réessayez"
+        )
+
+    def _mark_written(self, db: Session, key: str):
+        """Passe la clé à COMPLETED, sans réponse, dans la transaction de l'écriture."""
+        db.execute(
+            update(Key)
+            .where(Key.key == key)
+            .values(
+                status=models.IdempotencyStatus.COMPLETED,
+                response_status=None,
+                response_body=None,
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl)
+            )
+        )
+
+    def _extend_lock(self, key: str):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Key)
+                .where(Key.key == key, Key.status == models.IdempotencyStatus.IN_PROGRESS)
+                .values(expires_at=datetime.utcnow() + timedelta(seconds=self.lock_timeout))
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _heartbeat(self, key: str):
+        """Prolonge le verrou de la clé tant que l'opération est en cours."""
+        while True:
+            await asyncio.sleep(self.lock_timeout / 3)
+            try:
+                await run_in_threadpool(self._extend_lock, key)
+            except Exception as e:
+                logger.warning("Impossible de prolonger le verrou de la clé d'idempotence %s : %s", key, e)
+
+    def _complete(self, db: Session, key: str, response_status: int, body):
+        db.execute(
+            update(Key)
+            .where(Key.key == key)
+            .values(
+                status=models.IdempotencyStatus.COMPLETED,
+                response_status=response_status,
+                response_body=json.dumps(body),
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl)
+            )
+        )
+        db.commit()
+
+    def _abandon(self, db: Session, key: str):
+        db.rollback()
+        db.execute(delete(Key).where(Key.key == key, Key.status == models.IdempotencyStatus.IN_PROGRESS))
+        db.commit()
+
+    async def _wait(self, db: Database, key: str, request_hash: str) -> Optional[Dict]:
+        """Attend la fin de la requête en cours ; None si la clé a été libérée et acquise."""
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                try:
+                    await asyncio.wait_for(inflight.wait(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                # Requête en cours dans un autre worker
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+            existing = await db.run(self._claim, key, request_hash)
+            if existing is None or not _pending(existing):
+                return existing
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Une requête avec cette clé d'idempotence est toujours en cours"
+        )
+
+    @staticmethod
+    def _check_request(existing: Dict, request_hash: str):
+        if existing["request_hash"] != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Clé d'idempotence déjà utilisée pour une requête différente"
+            )
+
+    async def execute(
+        self,
+        db: Database,
+        idempotency_key: Optional[str],
+        scope: str,
+        payload: str,
+        handler: Callable[[], Awaitable]
+    ):
+        """
+        Exécute `handler` une seule fois par (scope, clé). `scope` identifie
+        l'utilisateur et l'opération, `payload` le contenu de la requête : une
+        même clé envoyée avec un autre contenu est refusée (422).
+        """
+        if idempotency_key is None:
+            return await handler()
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"En-tête Idempotency-Key invalide (1 à {MAX_KEY_LENGTH} caractères)"
+            )
+
+        key = _sha256(f"{scope}:{idempotency_key}")
+        request_hash = _sha256(payload)
+
+        existing = await db.run(self._claim, key, request_hash)
+        if existing is not None:
+            self._check_request(existing, request_hash)
+            if _pending(existing):
+                existing = await self._wait(db, key, request_hash)
+        if existing is not None:
+            self._check_request(existing, request_hash)
+            return JSONResponse(
+                status_code=existing["response_status"],
+                content=json.loads(existing["response_body"]),
+                headers={REPLAY_HEADER: "true"}
+            )
+
+        done = self._inflight[key] = asyncio.Event()
+        # Session de l'opération (AsyncSession.sync_session en mode async)
+        session = getattr(db.session, "sync_session", db.session)
+        written = False
+
+        def before_commit(session):
+            if not written:
+                self._mark_written(session, key)
+
+        def after_commit(session):
+            nonlocal written
+            written = True
+
+        event.listen(session, "before_commit", before_commit)
+        event.listen(session, "after_commit", after_commit)
+        heartbeat = asyncio.create_task(self._heartbeat(key))
+        try:
+            try:
+                response = await handler()
+            finally:
+                heartbeat.cancel()
+                event.remove(session, "before_commit", before_commit)
+                event.remove(session, "after_commit", after_commit)
+        except BaseException:
+            # Une écriture validée garde sa clé : la rejouer créerait un doublon
+            if not written:
+                try:
+                    await db.run(self._abandon, key)
+                except Exception as e:
+                    logger.error("Impossible de libérer la clé d'idempotence %s : %s", key, e)
+            self._inflight.pop(key, None)
+            done.set()
+            raise
+
+        try:
+            await db.run(self._complete, key, status.HTTP_200_OK, jsonable_encoder(response))
+        except Exception as e:
+            # La clé reste COMPLETED sans réponse : les tentatives suivantes reçoivent une 409
+            logger.error("Réponse de la clé d'idempotence %s non enregistrée : %s", key, e)
+        finally:
+            self._inflight.pop(key, None)
+            done.set()
+        return response
+
+    def purge_expired(self) -> int:
+        """Supprime les clés périmées ; retourne le nombre de lignes supprimées."""
+        db = SessionLocal()
+        try:
+            result = db.execute(delete(Key).where(Key.expires_at <= datetime.utcnow()))
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
+
+    async def run_periodic_purge(self, interval: float = 3600):
+        """Boucle de nettoyage des clés périmées, lancée au démarrage du service."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.purge_expired)
+            except Exception as e:
+                logger.warning("Échec du nettoyage des clés d'idempotence : %s", e)
+
+idempotency_store = IdempotencyStore(
+    ttl=int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")),
+    lock_timeout=int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60")),
+    wait_timeout=float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+)
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+import schemas
+from services.http_client import get_http_client
+from services.stock_service import stock_service_url
+
+logger = logging.getLogger(__name__)
+
+# Recouvrement entre deux lectures incrémentales : une modification validée juste
+# après la lecture précédente, avec un updated_at antérieur, n'est pas manquée
+CHANGES_OVERLAP = timedelta(seconds=5)
+
+class PriceBook:
+    """
+    Copie locale des prix du catalogue (produit -> prix, statut).
+
+    Chargée entièrement au démarrage puis mise à jour par deltas via
+    GET /products/changes?since=..., avec un rechargement complet périodique
+    (produits supprimés). Un panier est contrôlé en un seul passage en mémoire.
+    Si la dernière synchronisation réussie date de plus de `max_staleness`
+    secondes, les ventes sont refusées plutôt que contrôlées sur des prix périmés.
+    """
+
+    def __init__(
+        self,
+        stock_service_url: str,
+        refresh_interval: float = 5,
+        full_reload_interval: float = 3600,
+        max_staleness: float = 30,
+        tolerance: float = 0.01
+    ):
+        self.stock_service_url = stock_service_url.rstrip("/")
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.max_staleness = max_staleness
+        self.tolerance = tolerance
+        self._prices: Dict[int, Tuple[float, Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._since: Optional[datetime] = None
+        self.last_sync: Optional[float] = None
+        self.last_full_reload: Optional[float] = None
+
+    async def refresh(self) -> int:
+        """Applique les modifications depuis la dernière lecture (ou recharge tout). Retourne le nombre de produits reçus."""
+        now = time.monotonic()
+        full = self._since is None or self.last_full_reload is None \
+            or now - self.last_full_reload >= self.full_reload_interval
+        params = {} if full else {"since": (self._since - CHANGES_OVERLAP).isoformat()}
+        response = await get_http_client().get(f"{self.stock_service_url}/products/changes", params=params)
+        response.raise_for_status()
+        payload = response.json()
+
+        entries = {product["id"]: (product["price"], product["status"]) for product in payload["products"]}
+        with self._lock:
+            if full:
+                self._prices = entries
+            else:
+                self._prices.update(entries)
+            self._since = datetime.fromisoformat(payload["server_time"])
+            self.last_sync = now
+            if full:
+                self.last_full_reload = now
+        return len(entries)
+
+    def staleness(self) -> Optional[float]:
+        """Âge de la dernière synchronisation réussie, en secondes."""
+        if self.last_sync is None:
+            return None
+        return time.monotonic() - self.last_sync
+
+    def check_items(self, items: List[schemas.SaleItemCreate]) -> List[Dict]:
+        """
+        Compare les lignes d'un panier aux prix du catalogue, en un passage.
+        Retourne la liste des lignes refusées (vide si le panier est conforme).
+        """
+        staleness = self.staleness()
+        if staleness is None or staleness > self.max_staleness:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Les prix du catalogue ne sont pas à jour, réessayez plus tard"
+            )
+
+        errors = []
+        with self._lock:
+            for item in items:
+                entry = self._prices.get(item.product_id)
+                if entry is None:
+                    errors.append({"product_id": item.product_id, "error": "Produit inconnu"})
+                elif entry[1] not in (None, "active"):
+                    errors.append({"product_id": item.product_id, "error": "Produit non disponible à la vente"})
+                elif abs(item.unit_price - entry[0]) >= self.tolerance:
+                    errors.append({
+                        "product_id": item.product_id,
+                        "error": "Prix unitaire incorrect",
+                        "unit_price": item.unit_price,
+                        "expected_price": entry[0]
+                    })
+        return errors
+
+    def validate(self, items: List[schemas.SaleItemCreate]):
+        """Lève une 422 si une ligne du panier ne correspond pas au catalogue."""
+        errors = self.check_items(items)
+        if errors:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"message": "Le panier ne correspond pas au catalogue", "items": errors}
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = len(self._prices)
+        staleness = self.staleness()
+        return {
+            "products": size,
+            "staleness_seconds": round(staleness, 3) if staleness is not None else None,
+            "max_staleness_seconds": self.max_staleness,
+            "since": self._since.isoformat() if self._since else None,
+        }
+
+    async def run_periodic_refresh(self):
+        """Boucle de synchronisation, lancée au démarrage du service."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Échec de la synchronisation des prix du catalogue : %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+# Le contrôle des prix n'est actif que si l'URL du service de stock est configurée
+price_book = PriceBook(
+    stock_service_url,
+    refresh_interval=float(os.getenv("PRICE_BOOK_REFRESH_SECONDS", "5")),
+    full_reload_interval=float(os.getenv("PRICE_BOOK_FULL_RELOAD_SECONDS", "3600")),
+    max_staleness=float(os.getenv("PRICE_BOOK_MAX_STALENESS_SECONDS", "30"))
+) if stock_service_url else None
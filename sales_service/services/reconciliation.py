@@ -0,0 +1,123 @@
+"""
+Contrôle des montants payé / restant des ventes par rapport à la table des transactions.
+
+Usage (depuis le dossier sales_service) :
+    python -m services.reconciliation          # liste les écarts
+    python -m services.reconciliation --fix    # corrige les écarts
+"""
+import argparse
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+import models
+
+# Tolérance pour les arrondis, comme Sale.is_paid
+TOLERANCE = 0.01
+# Ventes verrouillées et corrigées par transaction
+FIX_BATCH_SIZE = 500
+
+def find_balance_mismatches(db: Session, sale_ids: Optional[Sequence[int]] = None) -> List[Dict]:
+    """Retourne les ventes dont paid_amount / remaining_amount diffèrent des transactions terminées."""
+    completed = (
+        select(
+            models.Transaction.sale_id,
+            func.sum(models.Transaction.amount).label("paid")
+        )
+        .where(models.Transaction.status == models.TransactionStatus.COMPLETED)
+        .group_by(models.Transaction.sale_id)
+    )
+    if sale_ids is not None:
+        completed = completed.where(models.Transaction.sale_id.in_(sale_ids))
+    completed = completed.subquery()
+    paid = func.coalesce(completed.c.paid, 0)
+    query = (
+        select(
+            models.Sale.id,
+            models.Sale.sale_number,
+            models.Sale.total_amount,
+            models.Sale.paid_amount,
+            models.Sale.remaining_amount,
+            paid.label("expected_paid")
+        )
+        .outerjoin(completed, completed.c.sale_id == models.Sale.id)
+        .where(or_(
+            func.abs(models.Sale.paid_amount - paid) >= TOLERANCE,
+            func.abs(models.Sale.remaining_amount - (models.Sale.total_amount - paid)) >= TOLERANCE
+        ))
+    )
+    if sale_ids is not None:
+        query = query.where(models.Sale.id.in_(sale_ids))
+    return [
+        {
+            "id": row.id,
+            "sale_number": row.sale_number,
+            "paid_amount": row.paid_amount,
+            "remaining_amount": row.remaining_amount,
+            "expected_paid_amount": round(float(row.expected_paid), 2),
+            "expected_remaining_amount": round(row.total_amount - float(row.expected_paid), 2),
+        }
+        for row in db.execute(query)
+    ]
+
+def reconcile_sale_balances(db: Session, fix: bool = False) -> List[Dict]:
+    """
+    Détecte les écarts et, avec `fix`, les corrige par paquets de FIX_BATCH_SIZE ventes.
+
+    Chaque paquet est verrouillé (SELECT ... FOR UPDATE, comme un paiement ou un
+    remboursement) avant que les montants attendus soient recalculés puis écrits :
+    aucun paiement ne peut être validé entre le calcul et la correction, et
+    l'écrasement d'un paiement concurrent est impossible.
+    """
+    mismatches = find_balance_mismatches(db)
+    # Fin de la transaction de lecture : la correction relit l'état courant sous verrou
+    db.rollback()
+    if not fix or not mismatches:
+        return mismatches
+
+    fixed = []
+    ids = [mismatch["id"] for mismatch in mismatches]
+    for start in range(0, len(ids), FIX_BATCH_SIZE):
+        chunk = ids[start:start + FIX_BATCH_SIZE]
+        try:
+            db.execute(select(models.Sale.id).where(models.Sale.id.in_(chunk)).with_for_update())
+            # Première lecture de la transaction, après le verrou : elle voit les paiements validés entre-temps
+            current = find_balance_mismatches(db, chunk)
+            if current:
+                db.execute(update(models.Sale), [
+                    {
+                        "id": mismatch["id"],
+                        "paid_amount": mismatch["expected_paid_amount"],
+                        "remaining_amount": mismatch["expected_remaining_amount"]
+                    }
+                    for mismatch in current
+                ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        fixed.extend(current)
+    return fixed
+
+def main():
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fix", action="store_true", help="Corriger les écarts trouvés")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        mismatches = reconcile_sale_balances(db, fix=args.fix)
+    finally:
+        db.close()
+
+    for mismatch in mismatches:
+        print(
+            f"{mismatch['sale_number']}: payé {mismatch['paid_amount']} (attendu {mismatch['expected_paid_amount']}), "
+            f"restant {mismatch['remaining_amount']} (attendu {mismatch['expected_remaining_amount']})"
+        )
+    action = "corrigée(s)" if args.fix else "en écart"
+    print(f"{len(mismatches)} vente(s) {action}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import threading
+from datetime import date, datetime
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+class SaleNumberAllocator:
+    """
+    Attribue les numéros de vente `V{YYYYMMDD}-{n:05d}` sans lire la table des ventes.
+
+    Chaque worker réserve un bloc de numéros dans la table `sale_number_counters`
+    (une ligne par jour, créée ou incrémentée par une seule instruction), puis
+    distribue les numéros de ce bloc depuis la mémoire. Les numéros d'un bloc
+    non utilisés avant l'arrêt du worker sont perdus : la séquence peut donc
+    présenter des trous, mais jamais de doublons.
+
+    Le jour est celui de l'horloge UTC, comme created_at des ventes.
+    """
+
+    def __init__(self, session_factory, block_size: int = 50):
+        self.session_factory = session_factory
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = 0
+        self._end = 0
+
+    @staticmethod
+    def format_number(day: date, value: int) -> str:
+        return f"V{day.strftime('%Y%m%d')}-{value:05d}"
+
+    def allocate(self) -> str:
+        """Retourne le prochain numéro de vente du jour."""
+        return self.allocate_block(1)[0]
+
+    def allocate_block(self, count: int) -> List[str]:
+        """Retourne `count` numéros de vente distincts, en réservant un nouveau bloc si nécessaire."""
+        with self._lock:
+            today = datetime.utcnow().date()
+            if today != self._day:
+                # Changement de jour : le bloc de la veille est abandonné
+                self._day = today
+                self._next = self._end = 0
+
+            values = []
+            while len(values) < count:
+                if self._next >= self._end:
+                    size = max(self.block_size, count - len(values))
+                    self._next, self._end = self._reserve(today, size)
+                take = min(count - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + take))
+                self._next += take
+
+            return [self.format_number(today, value) for value in values]
+
+    def _reserve(self, day: date, size: int) -> Tuple[int, int]:
+        """
+        Réserve `size` numéros pour `day` dans une transaction courte et dédiée.
+
+        Une seule instruction crée la ligne du jour ou l'incrémente : pas de
+        SELECT ... FOR UPDATE sur une ligne absente, dont le verrou d'intervalle
+        pris par deux workers au changement de jour mène à un interblocage.
+        LAST_INSERT_ID(expr) renvoie la fin du bloc à cette connexion.
+        """
+        session: Session = self.session_factory()
+        try:
+            session.execute(
+                text(
+                    "INSERT INTO sale_number_counters (day, next_value) VALUES (:day, LAST_INSERT_ID(:first_end)) "
+                    "ON DUPLICATE KEY UPDATE next_value = LAST_INSERT_ID(next_value + :size)"
+                ),
+                {"day": day, "first_end": 1 + size, "size": size}
+            )
+            end = session.execute(text("SELECT LAST_INSERT_ID()")).scalar()
+            session.commit()
+            return end - size, end
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
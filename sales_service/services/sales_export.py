@@ -0,0 +1,115 @@
+import csv
+import enum
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+from sqlalchemy import select
+import models
+from database import SessionLocal
+
+# Nombre de lignes lues à chaque aller-retour sur le curseur serveur
+EXPORT_CHUNK_SIZE = 1000
+
+SALE_COLUMNS = [
+    models.Sale.id,
+    models.Sale.sale_number,
+    models.Sale.cashier_id,
+    models.Sale.customer_id,
+    models.Sale.total_amount,
+    models.Sale.status,
+    models.Sale.notes,
+    models.Sale.created_at,
+    models.Sale.updated_at,
+]
+
+ITEM_COLUMNS = [
+    models.SaleItem.sale_id,
+    models.Sale.sale_number,
+    models.Sale.cashier_id,
+    models.Sale.status,
+    models.Sale.created_at,
+    models.SaleItem.id.label("item_id"),
+    models.SaleItem.product_id,
+    models.SaleItem.quantity,
+    models.SaleItem.unit_price,
+    models.SaleItem.total_price,
+]
+
+def _build_query(
+    granularity: str,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    sale_status: Optional[str],
+    cashier_id: Optional[int]
+):
+    if granularity == "item":
+        query = (
+            select(*ITEM_COLUMNS)
+            .join(models.Sale, models.Sale.id == models.SaleItem.sale_id)
+            .order_by(models.Sale.created_at, models.Sale.id, models.SaleItem.id)
+        )
+    else:
+        query = select(*SALE_COLUMNS).order_by(models.Sale.created_at, models.Sale.id)
+
+    if date_from is not None:
+        query = query.where(models.Sale.created_at >= date_from)
+    if date_to is not None:
+        query = query.where(models.Sale.created_at < date_to)
+    if sale_status is not None:
+        query = query.where(models.Sale.status == sale_status)
+    if cashier_id is not None:
+        query = query.where(models.Sale.cashier_id == cashier_id)
+    return query
+
+def _serialize(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _format_ndjson(columns: List[str], rows) -> str:
+    return "".join(
+        json.dumps({column: _serialize(value) for column, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+def _format_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_serialize(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def stream_sales(
+    export_format: str = "ndjson",
+    granularity: str = "sale",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    sale_status: Optional[str] = None,
+    cashier_id: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Produit l'export de l'historique des ventes, une ligne par vente ou par article.
+
+    Les lignes sont lues par paquets de EXPORT_CHUNK_SIZE sur un curseur côté
+    serveur et émises au fil de l'eau : la mémoire utilisée ne dépend pas de la
+    période exportée, et les premiers octets partent avant la fin de la requête.
+    La session est propre au générateur, car la réponse est envoyée après la
+    fin du traitement de la requête.
+    """
+    query = _build_query(granularity, date_from, date_to, sale_status, cashier_id)
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            query.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE)
+        )
+        columns = list(result.keys())
+        if export_format == "csv":
+            yield _format_csv([columns])
+        for rows in result.partitions():
+            if export_format == "csv":
+                yield _format_csv(rows)
+            else:
+                yield _format_ndjson(columns, rows)
+    finally:
+        db.close()
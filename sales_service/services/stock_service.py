@@ -0,0 +1,94 @@
+import logging
+import os
+from typing import Dict, List, Optional
+import httpx
+from fastapi import HTTPException, status
+import schemas
+from services.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+def _auth_headers(token: str) -> Dict:
+    return {"Authorization": f"Bearer {token}"}
+
+class StockService:
+    """
+    Client du service de stock : réservation, confirmation et libération du stock
+    d'une vente. Les appels sont faits avec le token de l'utilisateur connecté.
+    """
+
+    def __init__(self, stock_service_url: str):
+        self.stock_service_url = stock_service_url.rstrip("/")
+
+    async def reserve(self, reference: str, items: List[schemas.SaleItemCreate], token: str) -> Dict:
+        """
+        Réserve en une requête toutes les lignes d'un panier, identifié par le numéro de vente.
+        Une rupture de stock est renvoyée au client en 409 avec le détail des produits.
+        La réservation expire si la vente n'est pas payée à temps (voir `confirm`).
+        """
+        try:
+            response = await get_http_client().post(
+                f"{self.stock_service_url}/reservations/",
+                json={
+                    "reference": reference,
+                    "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in items]
+                },
+                headers=_auth_headers(token)
+            )
+        except httpx.HTTPError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Service de stock indisponible"
+            )
+        if response.status_code == status.HTTP_409_CONFLICT:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=response.json()["detail"])
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Réponse inattendue du service de stock"
+            )
+        return response.json()
+
+    async def confirm(self, reference: str, token: str) -> bool:
+        """
+        Confirme la réservation d'une vente payée, qui n'expire alors plus. Le paiement
+        est déjà enregistré : les échecs sont journalisés, pas propagés.
+        """
+        try:
+            response = await get_http_client().post(
+                f"{self.stock_service_url}/reservations/{reference}/confirm",
+                headers=_auth_headers(token)
+            )
+        except httpx.HTTPError as e:
+            logger.error("Échec de la confirmation du stock de la vente %s : %s", reference, e)
+            return False
+        if response.status_code == status.HTTP_404_NOT_FOUND:
+            # Vente créée sans réservation (ventes hors ligne, service de stock non configuré)
+            return False
+        if response.status_code != 200:
+            # 409 : réservation expirée avant le paiement et stock épuisé depuis
+            logger.error("Échec de la confirmation du stock de la vente %s : HTTP %s", reference, response.status_code)
+            return False
+        return True
+
+    async def release(self, reference: str, token: str) -> bool:
+        """Libère la réservation d'une vente ; les échecs sont journalisés, pas propagés."""
+        try:
+            response = await get_http_client().post(
+                f"{self.stock_service_url}/reservations/{reference}/release",
+                headers=_auth_headers(token)
+            )
+        except httpx.HTTPError as e:
+            logger.error("Échec de la libération du stock de la vente %s : %s", reference, e)
+            return False
+        if response.status_code == status.HTTP_404_NOT_FOUND:
+            # Vente créée sans réservation (service de stock non configuré à ce moment-là)
+            return False
+        if response.status_code != 200:
+            logger.error("Échec de la libération du stock de la vente %s : HTTP %s", reference, response.status_code)
+            return False
+        return True
+
+# Les réservations ne sont actives que si l'URL du service de stock est configurée
+stock_service_url: Optional[str] = os.getenv("STOCK_SERVICE_URL")
+stock_service = StockService(stock_service_url) if stock_service_url else None
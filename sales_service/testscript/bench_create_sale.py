@@ -0,0 +1,93 @@
+"""
+Charge concurrente sur POST /sales/ : mesure le débit de création de ventes et
+vérifie que les numéros de vente attribués sont tous distincts.
+
+Avec --bulk-size, les mêmes ventes sont envoyées par lots sur POST /sales/bulk,
+ce qui permet de comparer le débit des deux chemins d'écriture.
+
+Usage :
+    python testscript/bench_create_sale.py --token $TOKEN --customer-id 1 \
+        --requests 1000 --concurrency 50
+    python testscript/bench_create_sale.py --token $TOKEN --customer-id 1 \
+        --requests 10000 --bulk-size 1000 --cashier-id 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+ITEMS = [{"product_id": 1, "quantity": 1, "unit_price": 10.0}]
+
+
+async def create_sales(args):
+    if args.bulk_size:
+        payload = {
+            "cashier_id": args.cashier_id,
+            "customer_id": args.customer_id,
+            "sales": [{"items": ITEMS, "notes": "bench"}] * args.bulk_size
+        }
+        url = f"{args.url}/sales/bulk"
+        batches = max(1, args.requests // args.bulk_size)
+    else:
+        payload = {"customer_id": args.customer_id, "items": ITEMS, "notes": "bench"}
+        url = f"{args.url}/sales/"
+        batches = args.requests
+    headers = {"Authorization": f"Bearer {args.token}"}
+    latencies, numbers, errors = [], [], 0
+    queue = asyncio.Queue()
+    for _ in range(batches):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post(url, json=payload, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+            elif args.bulk_size:
+                for result in response.json()["results"]:
+                    if result["success"]:
+                        numbers.append(result["sale_number"])
+                    else:
+                        errors += 1
+            else:
+                numbers.append(response.json()["sale_number"])
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Ventes créées      : {len(numbers)} ({errors} erreurs)")
+    print(f"Durée              : {elapsed:.2f} s")
+    print(f"Débit              : {len(numbers) / elapsed:.1f} ventes/s")
+    if latencies:
+        print(f"Latence p50 / p99  : {statistics.median(latencies) * 1000:.1f} ms / "
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+    duplicates = len(numbers) - len(set(numbers))
+    print(f"Numéros en double  : {duplicates}")
+    return 1 if duplicates or errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8002")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--customer-id", type=int, default=1)
+    parser.add_argument("--cashier-id", type=int, default=1)
+    parser.add_argument("--bulk-size", type=int, default=0, help="Ventes par requête /sales/bulk (0 : POST /sales/ unitaire)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    raise SystemExit(asyncio.run(create_sales(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
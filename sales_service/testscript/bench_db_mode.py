@@ -0,0 +1,142 @@
+"""
+Compare les modes DB_MODE=sync et DB_MODE=async du service des ventes :
+débit (requêtes/s) et latence p99 à 50, 200 et 1000 clients simultanés.
+
+Pour chaque mode, le script démarre `uvicorn main:app` avec DB_MODE positionné
+(les autres variables, DATABASE_URL, SECRET_KEY..., sont reprises de
+l'environnement), envoie pendant --duration secondes un mélange de lectures
+(GET /sales/?limit=20) et de créations (POST /sales/), puis arrête le serveur.
+Avec --url, un service déjà lancé est mesuré tel quel (--label pour le nommer).
+
+Usage (depuis le dossier sales_service) :
+    python testscript/bench_db_mode.py --token $TOKEN --customer-id 1
+    python testscript/bench_db_mode.py --token $TOKEN --url http://localhost:8002 --label docker
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SERVICE_DIR)
+ITEMS = [{"product_id": 1, "quantity": 1, "unit_price": 10.0}]
+
+
+def percentile(values, ratio):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * ratio))] * 1000, 2)
+
+
+async def run_level(url, args, concurrency):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    sale_payload = {"customer_id": args.customer_id, "items": ITEMS, "notes": "bench"}
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(client):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if random.random() < args.write_ratio:
+                    response = await client.post("/sales/", json=sale_payload, headers=headers)
+                else:
+                    response = await client.get("/sales/", params={"limit": 20}, headers=headers)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round((len(latencies) - errors) / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+def start_server(mode, port):
+    env = dict(os.environ, DB_MODE=mode)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, env.get("PYTHONPATH")]))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=SERVICE_DIR,
+        env=env
+    )
+
+
+async def wait_until_ready(url, timeout=30):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Le service ne répond pas sur {url}")
+
+
+async def bench_mode(label, url, args):
+    await wait_until_ready(url)
+    results = []
+    for concurrency in args.concurrency:
+        result = await run_level(url, args, concurrency)
+        result["mode"] = label
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+    return results
+
+
+async def run(args):
+    if args.url:
+        return await bench_mode(args.label, args.url, args)
+
+    results = []
+    for mode in args.modes:
+        server = start_server(mode, args.port)
+        try:
+            results.extend(await bench_mode(mode, f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--customer-id", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée de chaque palier, en secondes")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Part des requêtes POST /sales/")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--url", help="Mesurer un service déjà démarré au lieu d'en lancer un par mode")
+    parser.add_argument("--label", default="external")
+    results = asyncio.run(run(parser.parse_args()))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
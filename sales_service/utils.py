@@ -12,4 +12,6 @@ def check_access(current_user: dict, allowed_roles: List[str], resource_name: st
 # Constantes pour les rôles autorisés
 SALES_ACCESS = ["admin", "manager", "cashier"]
 CUSTOMERS_ACCESS = ["admin", "manager", "cashier"]
-TRANSACTIONS_ACCESS = ["admin", "manager", "cashier"] 
\ No newline at end of file
+TRANSACTIONS_ACCESS = ["admin", "manager", "cashier"] 
+REPORTS_ACCESS = ["admin", "manager"]
+ADMIN_ACCESS = ["admin"]
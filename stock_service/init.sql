@@ -9,5 +9,27 @@ CREATE TABLE IF NOT EXISTS products (
     quantity INT DEFAULT 0,
     status ENUM('active', 'inactive', 'discontinued') DEFAULT 'active',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-); 
\ No newline at end of file
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    price_updated_at DATETIME NULL,
+    INDEX ix_products_price_updated_at (price_updated_at)
+);
+
+CREATE TABLE IF NOT EXISTS stock_reservations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    reference VARCHAR(50) NOT NULL UNIQUE,
+    status ENUM('active', 'confirmed', 'released') NOT NULL DEFAULT 'active',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NULL,
+    released_at TIMESTAMP NULL,
+    INDEX ix_stock_reservations_status_expires_at (status, expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS stock_reservation_items (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    reservation_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    FOREIGN KEY (reservation_id) REFERENCES stock_reservations(id),
+    FOREIGN KEY (product_id) REFERENCES products(id),
+    INDEX ix_stock_reservation_items_reservation_id (reservation_id)
+);
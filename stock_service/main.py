@@ -1,5 +1,24 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from fastapi import Depends, FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from common.db_engine import pool_stats
+from common.metrics import setup_metrics
+from common.sql_profiler import setup_sql_profiler, sql_profiler
+from middleware.auth import get_current_user, check_access, ADMIN_ACCESS
+import migrations
+import models
+from database import engine, SessionLocal
+from routers import stock, reservations
+from services.product_cache import product_cache
+from services.reservations import RESERVATION_TTL, release_expired_reservations
+
+logger = logging.getLogger(__name__)
+
+# Création des tables, puis colonnes ajoutées depuis sur les bases existantes
+models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine, int(RESERVATION_TTL.total_seconds()))
 
 app = FastAPI(
     title="Stock Service",
@@ -16,6 +35,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métriques Prometheus (GET /metrics)
+setup_metrics(
+    app,
+    engines=[engine],
+    collectors={"db_pool": lambda: pool_stats(engine), "product_cache": product_cache.stats}
+)
+
+# Profilage SQL par requête (en-têtes X-DB-* si SQL_PROFILER_DEBUG=true)
+setup_sql_profiler(app, engines=[engine])
+
+# Catalogue des produits
+app.include_router(stock.router, prefix="/products", tags=["products"])
+# Réservations de stock des ventes
+app.include_router(reservations.router, prefix="/reservations", tags=["reservations"])
+
+def _release_expired_reservations() -> int:
+    db = SessionLocal()
+    try:
+        return release_expired_reservations(db)
+    finally:
+        db.close()
+
+async def run_reservation_expiry(interval: float = 60):
+    """Libère périodiquement le stock des ventes non payées dont la réservation a expiré."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            released = await run_in_threadpool(_release_expired_reservations)
+            if released:
+                logger.info("%d réservation(s) expirée(s) libérée(s)", released)
+        except Exception as e:
+            logger.warning("Échec de la libération des réservations expirées : %s", e)
+
+@app.on_event("startup")
+async def start_reservation_expiry():
+    app.state.reservation_expiry_task = asyncio.create_task(run_reservation_expiry())
+
+@app.on_event("shutdown")
+async def stop_reservation_expiry():
+    task = getattr(app.state, "reservation_expiry_task", None)
+    if task is not None:
+        task.cancel()
+
 @app.get("/")
 async def root():
     return {"message": "Stock Service is running"}
+
+
+@app.get("/db/pool")
+async def database_pool_stats():
+    """Statistiques du pool de connexions MySQL (connexions utilisées, attentes, débordements)"""
+    return pool_stats(engine)
+
+
+@app.get("/db/profiles")
+async def sql_profiles(n_plus_one_only: bool = False, current_user: dict = Depends(get_current_user)):
+    """Profils SQL échantillonnés (nombre de requêtes, temps en base, instructions lentes, N+1)."""
+    check_access(current_user, ADMIN_ACCESS, "profils SQL")
+    return {"stats": sql_profiler.stats(), "profiles": sql_profiler.profiles(n_plus_one_only)}
@@ -0,0 +1 @@
+# Ce fichier est intentionnellement vide pour faire du dossier middleware un package Python 
\ No newline at end of file
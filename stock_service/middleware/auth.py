@@ -0,0 +1,45 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import jwt, JWTError
+from typing import Dict, List
+import os
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+
+# Clé JWT partagée avec le service d'authentification : les tokens sont vérifiés
+# localement (signature, expiration et rôle), sans appel réseau
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+if not SECRET_KEY:
+    raise RuntimeError("SECRET_KEY n'est pas défini : impossible de vérifier les tokens JWT")
+
+# Rôles autorisés
+PRODUCTS_WRITE_ACCESS = ["admin", "manager"]
+RESERVATIONS_ACCESS = ["admin", "manager", "cashier"]
+ADMIN_ACCESS = ["admin"]
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict:
+    """Utilisateur du token JWT (email et rôle), après vérification de la signature et de l'expiration."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not payload.get("sub") or not payload.get("role"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return {"email": payload["sub"], "role": payload["role"]}
+
+def check_access(current_user: Dict, allowed_roles: List[str], resource_name: str):
+    """Vérifie si l'utilisateur a accès à une ressource spécifique"""
+    if current_user["role"] not in allowed_roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Accès non autorisé. Seuls les {', '.join(allowed_roles)} peuvent accéder à cette ressource."
+        )
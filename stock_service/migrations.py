@@ -0,0 +1,83 @@
+"""
+Mise à jour des bases stock_db existantes.
+
+`create_all` crée les tables manquantes mais ne modifie pas les tables déjà
+créées : les colonnes ajoutées depuis sont ajoutées ici. Chaque étape vérifie
+le schéma (information_schema) avant de le modifier et peut donc être rejouée ;
+un verrou MySQL (GET_LOCK) évite que plusieurs workers l'exécutent en même temps.
+"""
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "stock_db_schema_upgrade"
+LOCK_TIMEOUT = 300
+
+def _column_type(connection: Connection, table: str, name: str):
+    return connection.execute(
+        text(
+            "SELECT column_type FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = :table AND column_name = :name"
+        ),
+        {"table": table, "name": name}
+    ).scalar()
+
+def _index_exists(connection: Connection, table: str, name: str) -> bool:
+    return connection.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :name"
+        ),
+        {"table": table, "name": name}
+    ).scalar() > 0
+
+def _upgrade_products(connection: Connection):
+    # Date des changements de prix, distincte de updated_at que modifient les réservations
+    if _column_type(connection, "products", "price_updated_at") is None:
+        logger.info("Ajout de products.price_updated_at")
+        connection.execute(text("ALTER TABLE products ADD COLUMN price_updated_at DATETIME NULL"))
+        connection.execute(text("UPDATE products SET price_updated_at = COALESCE(updated_at, created_at)"))
+    if not _index_exists(connection, "products", "ix_products_price_updated_at"):
+        connection.execute(text("CREATE INDEX ix_products_price_updated_at ON products (price_updated_at)"))
+    # Index de l'ancien flux des changements, mis à jour à chaque mouvement de stock
+    if _index_exists(connection, "products", "ix_products_updated_at"):
+        connection.execute(text("DROP INDEX ix_products_updated_at ON products"))
+
+def _upgrade_reservations(connection: Connection):
+    status_type = _column_type(connection, "stock_reservations", "status")
+    if status_type is not None and "confirmed" not in status_type:
+        connection.execute(text(
+            "ALTER TABLE stock_reservations MODIFY status "
+            "ENUM('active', 'confirmed', 'released') NOT NULL DEFAULT 'active'"
+        ))
+    if _column_type(connection, "stock_reservations", "expires_at") is None:
+        # Les réservations existantes expirent à partir du déploiement, pas rétroactivement
+        logger.info("Ajout de stock_reservations.expires_at")
+        connection.execute(text("ALTER TABLE stock_reservations ADD COLUMN expires_at DATETIME NULL AFTER created_at"))
+    if not _index_exists(connection, "stock_reservations", "ix_stock_reservations_status_expires_at"):
+        connection.execute(text(
+            "CREATE INDEX ix_stock_reservations_status_expires_at ON stock_reservations (status, expires_at)"
+        ))
+
+def upgrade(engine: Engine, reservation_ttl_seconds: int):
+    """Applique les modifications de schéma manquantes."""
+    with engine.connect() as connection:
+        if connection.execute(text("SELECT GET_LOCK(:name, :timeout)"),
+                              {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT}).scalar() != 1:
+            raise RuntimeError("Verrou de mise à jour du schéma non obtenu")
+        try:
+            _upgrade_products(connection)
+            _upgrade_reservations(connection)
+            # Réservations actives créées sans échéance (avant l'ajout de expires_at)
+            connection.execute(
+                text(
+                    "UPDATE stock_reservations SET expires_at = UTC_TIMESTAMP() + INTERVAL :ttl SECOND "
+                    "WHERE status = 'active' AND expires_at IS NULL"
+                ),
+                {"ttl": reservation_ttl_seconds}
+            )
+            connection.commit()
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -9,6 +9,14 @@ class ProductStatus(enum.Enum):
     INACTIVE = "inactive"
     DISCONTINUED = "discontinued"
 
+class ReservationStatus(enum.Enum):
+    ACTIVE = "active"  # Vente non payée : libérée automatiquement à expires_at
+    CONFIRMED = "confirmed"  # Vente payée : sans expiration
+    RELEASED = "released"
+
+def _enum_values(enum_class):
+    return [member.value for member in enum_class]
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -17,6 +25,45 @@ class Product(Base):
     description = Column(String(500))
     price = Column(Float, nullable=False)
     quantity = Column(Integer, default=0)
-    status = Column(Enum(ProductStatus), default=ProductStatus.ACTIVE)
+    # Valeurs en minuscules, comme l'ENUM de init.sql
+    status = Column(
+        Enum(ProductStatus, values_callable=_enum_values),
+        default=ProductStatus.ACTIVE
+    )
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Dernière modification du prix ou du statut ; les mouvements de stock ne la changent pas
+    price_updated_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # Flux des modifications de prix (GET /products/changes)
+        Index("ix_products_price_updated_at", "price_updated_at"),
+    )
+
+class StockReservation(Base):
+    """Réservation de stock d'un panier, identifiée par la référence de la vente."""
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reference = Column(String(50), unique=True, nullable=False)
+    status = Column(Enum(ReservationStatus, values_callable=_enum_values), nullable=False, default=ReservationStatus.ACTIVE)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True))
+    released_at = Column(DateTime(timezone=True))
+
+    items = relationship("StockReservationItem", back_populates="reservation", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Réservations actives arrivées à expiration (libération périodique)
+        Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),
+    )
+
+class StockReservationItem(Base):
+    __tablename__ = "stock_reservation_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reservation_id = Column(Integer, ForeignKey("stock_reservations.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    reservation = relationship("StockReservation", back_populates="items")
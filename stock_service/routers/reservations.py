@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+import schemas
+from database import get_db
+from middleware.auth import get_current_user, check_access, RESERVATIONS_ACCESS
+from services.reservations import get_reservation, reserve_stock, confirm_stock, release_stock
+
+router = APIRouter()
+
+@router.post("/", response_model=schemas.Reservation)
+def create_reservation(
+    reservation: schemas.ReservationCreate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Réserve atomiquement toutes les lignes d'un panier (409 si une ligne n'est pas disponible)."""
+    check_access(current_user, RESERVATIONS_ACCESS, "réservations")
+    return reserve_stock(db, reservation)
+
+@router.get("/{reference}", response_model=schemas.Reservation)
+def read_reservation(
+    reference: str,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    check_access(current_user, RESERVATIONS_ACCESS, "réservations")
+    return get_reservation(db, reference)
+
+@router.post("/{reference}/confirm", response_model=schemas.Reservation)
+def confirm_reservation(
+    reference: str,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Vente payée : la réservation n'expire plus (409 si elle a expiré et que le stock manque)."""
+    check_access(current_user, RESERVATIONS_ACCESS, "réservations")
+    return confirm_stock(db, reference)
+
+@router.post("/{reference}/release", response_model=schemas.Reservation)
+def release_reservation(
+    reference: str,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Remet en stock les quantités réservées (vente annulée)."""
+    check_access(current_user, RESERVATIONS_ACCESS, "réservations")
+    return release_stock(db, reference)
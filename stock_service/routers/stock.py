@@ -0,0 +1,158 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from datetime import datetime
+import models, schemas
+from database import get_db
+from services.product_cache import product_cache
+from middleware.auth import get_current_user, check_access, PRODUCTS_WRITE_ACCESS
+
+router = APIRouter()
+
+def _product_loader(db: Session):
+    """Charge en une requête les produits absents du cache."""
+    def load(product_ids: List[int]) -> Dict[int, schemas.Product]:
+        products = db.query(models.Product).filter(models.Product.id.in_(product_ids)).all()
+        return {product.id: schemas.Product.from_orm(product) for product in products}
+    return load
+
+def _product_fields(data: Dict) -> Dict:
+    """Convertit les champs d'un schéma Pydantic vers les types du modèle."""
+    if data.get("status") is not None:
+        data["status"] = models.ProductStatus(data["status"].value)
+    return data
+
+def _get_product_or_404(db: Session, product_id: int) -> models.Product:
+    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@router.post("/", response_model=schemas.Product)
+def create_product(
+    product: schemas.ProductCreate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    check_access(current_user, PRODUCTS_WRITE_ACCESS, "produits")
+    now = datetime.utcnow()
+    db_product = models.Product(
+        **_product_fields(product.dict()), created_at=now, updated_at=now, price_updated_at=now
+    )
+    db.add(db_product)
+    db.commit()
+    db.refresh(db_product)
+    product_cache.invalidate(db_product.id)
+    return db_product
+
+@router.get("/", response_model=List[schemas.Product])
+def get_products(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    product_status: Optional[schemas.ProductStatus] = Query(None, alias="status"),
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.Product)
+    if product_status is not None:
+        query = query.filter(models.Product.status == models.ProductStatus(product_status.value))
+    return query.order_by(models.Product.id).offset(skip).limit(limit).all()
+
+@router.post("/batch", response_model=schemas.ProductBatchResponse)
+def get_products_batch(batch: schemas.ProductBatchRequest, db: Session = Depends(get_db)):
+    """
+    Résout tous les produits d'un panier en un appel : un passage dans le cache,
+    puis une seule requête pour les produits absents.
+    """
+    products = product_cache.get_many(batch.ids, _product_loader(db))
+    requested = list(dict.fromkeys(batch.ids))
+    return schemas.ProductBatchResponse(
+        products=[products[product_id] for product_id in requested if product_id in products],
+        missing_ids=[product_id for product_id in requested if product_id not in products]
+    )
+
+@router.get("/changes", response_model=schemas.ProductChanges)
+def get_product_changes(
+    since: Optional[datetime] = Query(None, description="Produits modifiés depuis cette date (tous si absent)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Prix et statuts des produits modifiés depuis `since` (index sur price_updated_at,
+    que les réservations de stock ne modifient pas), pour la mise à jour
+    incrémentale des copies locales du catalogue.
+    `server_time` sert de point de départ à l'appel suivant.
+    """
+    server_time = datetime.utcnow()
+    query = db.query(
+        models.Product.id,
+        models.Product.price,
+        models.Product.status,
+        models.Product.price_updated_at
+    )
+    if since is not None:
+        query = query.filter(models.Product.price_updated_at >= since)
+    return schemas.ProductChanges(
+        products=[
+            schemas.ProductPrice(
+                id=row.id,
+                price=row.price,
+                status=row.status.value if row.status else None,
+                price_updated_at=row.price_updated_at
+            )
+            for row in query.order_by(models.Product.price_updated_at, models.Product.id)
+        ],
+        server_time=server_time
+    )
+
+@router.get("/cache-stats")
+def get_product_cache_stats():
+    """Statistiques du cache des produits de ce worker."""
+    return product_cache.stats()
+
+@router.get("/{product_id}", response_model=schemas.Product)
+def get_product(product_id: int, db: Session = Depends(get_db)):
+    product = product_cache.get(product_id, _product_loader(db))
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@router.put("/{product_id}", response_model=schemas.Product)
+def update_product(
+    product_id: int,
+    product_update: schemas.ProductUpdate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    check_access(current_user, PRODUCTS_WRITE_ACCESS, "produits")
+    db_product = _get_product_or_404(db, product_id)
+    fields = _product_fields(product_update.dict(exclude_unset=True))
+    for field, value in fields.items():
+        setattr(db_product, field, value)
+    db_product.updated_at = datetime.utcnow()
+    if "price" in fields or "status" in fields:
+        db_product.price_updated_at = db_product.updated_at
+    db.commit()
+    db.refresh(db_product)
+    product_cache.invalidate(product_id)
+    return db_product
+
+@router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_product(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    check_access(current_user, PRODUCTS_WRITE_ACCESS, "produits")
+    db_product = _get_product_or_404(db, product_id)
+    db.delete(db_product)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Produit référencé par des réservations de stock : il doit être retiré de la vente, pas supprimé
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Product is referenced by stock reservations; set its status to discontinued instead"
+        )
+    product_cache.invalidate(product_id)
+    return None
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
 from datetime import datetime
+import enum
 from enum import Enum
 
 class ProductStatus(str, Enum):
@@ -29,6 +30,51 @@ class Product(ProductBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    price_updated_at: Optional[datetime] = None
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def status_from_model(cls, value):
+        # Le modèle SQLAlchemy utilise sa propre énumération (models.ProductStatus)
+        return value.value if isinstance(value, enum.Enum) else value
 
     class Config:
         from_attributes = True
+
+class ProductPrice(BaseModel):
+    id: int
+    price: float
+    status: Optional[ProductStatus] = None
+    price_updated_at: Optional[datetime] = None
+
+class ProductChanges(BaseModel):
+    products: List[ProductPrice]
+    server_time: datetime
+
+class ProductBatchRequest(BaseModel):
+    ids: List[int] = Field(..., max_length=1000, description="Identifiants des produits (1000 au plus)")
+
+class ProductBatchResponse(BaseModel):
+    products: List[Product]
+    missing_ids: List[int] = []
+
+class ReservationStatus(str, Enum):
+    ACTIVE = "active"
+    CONFIRMED = "confirmed"
+    RELEASED = "released"
+
+class ReservationItem(BaseModel):
+    product_id: int
+    quantity: int = Field(..., gt=0)
+
+class ReservationCreate(BaseModel):
+    reference: str = Field(..., max_length=50, description="Référence de la vente (numéro de vente)")
+    items: List[ReservationItem] = Field(..., min_length=1)
+
+class Reservation(BaseModel):
+    reference: str
+    status: ReservationStatus
+    items: List[ReservationItem]
+    created_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    released_at: Optional[datetime] = None
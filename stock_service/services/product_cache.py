@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List
+import schemas
+
+# Chargement des produits absents du cache : ids -> {id: produit}
+ProductLoader = Callable[[List[int]], Dict[int, schemas.Product]]
+
+
+class ProductCache:
+    """
+    Cache LRU en lecture seule (read-through) des produits, indexé par id.
+
+    Un panier entier est résolu en un seul passage sous le verrou ; seuls les
+    produits absents sont chargés, en une requête groupée. Les écritures sur un
+    produit doivent appeler `invalidate` : un chargement commencé avant une
+    invalidation ne réinsère pas de valeur périmée (numéro de version).
+    Le cache est propre à chaque worker ; `ttl` borne la durée pendant laquelle
+    un autre worker peut servir un produit modifié ailleurs.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_many(self, product_ids: Iterable[int], loader: ProductLoader) -> Dict[int, schemas.Product]:
+        """Retourne les produits connus parmi `product_ids`, en chargeant les absents via `loader`."""
+        found: Dict[int, schemas.Product] = {}
+        missing: List[int] = []
+        now = time.time()
+        with self._lock:
+            version = self._version
+            for product_id in product_ids:
+                if product_id in found:
+                    continue
+                entry = self._entries.get(product_id)
+                if entry is None or entry[1] <= now:
+                    if entry is not None:
+                        del self._entries[product_id]
+                    missing.append(product_id)
+                    continue
+                self._entries.move_to_end(product_id)
+                found[product_id] = entry[0]
+            missing = list(dict.fromkeys(missing))
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            loaded = loader(missing)
+            self._store(loaded, version)
+            found.update(loaded)
+        return found
+
+    def get(self, product_id: int, loader: ProductLoader):
+        return self.get_many([product_id], loader).get(product_id)
+
+    def _store(self, products: Dict[int, schemas.Product], version: int):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            if version != self._version:
+                return
+            for product_id, product in products.items():
+                self._entries[product_id] = (product, expires_at)
+                self._entries.move_to_end(product_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *product_ids: int):
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            for product_id in product_ids:
+                self._entries.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+            }
+
+
+product_cache = ProductCache(
+    maxsize=int(os.getenv("PRODUCT_CACHE_SIZE", "10000")),
+    ttl=int(os.getenv("PRODUCT_CACHE_TTL", "60")),
+)
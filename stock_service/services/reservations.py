@@ -0,0 +1,227 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+from fastapi import HTTPException, status
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+import models, schemas
+from services.product_cache import product_cache
+
+# Durée de réservation du stock d'une vente non payée ; le paiement la confirme
+RESERVATION_TTL = timedelta(seconds=int(os.getenv("RESERVATION_TTL_SECONDS", "1800")))
+# Nombre maximal de réservations expirées libérées par passage
+EXPIRY_BATCH_SIZE = 500
+
+def _aggregate(items: List[schemas.ReservationItem]) -> Dict[int, int]:
+    """Quantités par produit, triées par id (ordre de verrouillage fixe)."""
+    quantities: Dict[int, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return dict(sorted(quantities.items()))
+
+def _reservation_response(reservation: models.StockReservation) -> schemas.Reservation:
+    return schemas.Reservation(
+        reference=reservation.reference,
+        status=reservation.status.value,
+        items=[
+            schemas.ReservationItem(product_id=item.product_id, quantity=item.quantity)
+            for item in reservation.items
+        ],
+        created_at=reservation.created_at,
+        expires_at=reservation.expires_at,
+        released_at=reservation.released_at
+    )
+
+def _find_reservation(db: Session, reference: str, for_update: bool = False):
+    query = (
+        db.query(models.StockReservation)
+        .options(selectinload(models.StockReservation.items))
+        .filter(models.StockReservation.reference == reference)
+    )
+    if for_update:
+        query = query.with_for_update()
+    return query.first()
+
+def _is_expired(reservation: models.StockReservation, now: datetime) -> bool:
+    return (
+        reservation.status == models.ReservationStatus.ACTIVE
+        and reservation.expires_at is not None
+        and reservation.expires_at <= now
+    )
+
+def _shortages(db: Session, quantities: Dict[int, int]) -> List[Dict]:
+    available = dict(
+        db.query(models.Product.id, models.Product.quantity)
+        .filter(models.Product.id.in_(list(quantities)))
+        .all()
+    )
+    return [
+        {"product_id": product_id, "requested": requested, "available": available.get(product_id)}
+        for product_id, requested in quantities.items()
+        if (available.get(product_id) or 0) < requested
+    ]
+
+def _decrement(db: Session, quantities: Dict[int, int]) -> bool:
+    """Décrémente le stock de toutes les lignes, ou d'aucune ; faux si une ligne n'est pas servie."""
+    delta = case(quantities, value=models.Product.id)
+    result = db.execute(
+        update(models.Product)
+        .where(models.Product.id.in_(list(quantities)))
+        .where(models.Product.quantity >= delta)
+        .values(quantity=models.Product.quantity - delta, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
+
+def _shortage_error(db: Session, quantities: Dict[int, int]) -> HTTPException:
+    db.rollback()
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": "Stock insuffisant", "shortages": _shortages(db, quantities)}
+    )
+
+def get_reservation(db: Session, reference: str) -> schemas.Reservation:
+    reservation = _find_reservation(db, reference)
+    if reservation is None:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return _reservation_response(reservation)
+
+def reserve_stock(db: Session, reservation: schemas.ReservationCreate) -> schemas.Reservation:
+    """
+    Réserve toutes les lignes d'un panier, ou aucune.
+
+    Le stock est décrémenté par une seule requête conditionnelle
+    `UPDATE ... SET quantity = quantity - n WHERE id IN (...) AND quantity >= n` :
+    MySQL parcourt la clé primaire dans l'ordre croissant, les lignes sont donc
+    toujours verrouillées dans le même ordre (pas d'interblocage entre paniers)
+    et la soustraction se fait sur la valeur courante (pas de mise à jour perdue).
+    Si une ligne n'est pas servie, la transaction est annulée et la réponse 409
+    détaille les produits en rupture. Une référence déjà réservée renvoie la
+    réservation existante, ce qui rend les nouvelles tentatives sans effet.
+    La réservation expire après RESERVATION_TTL si elle n'est pas confirmée.
+    """
+    existing = _find_reservation(db, reservation.reference)
+    if existing is not None:
+        return _reservation_response(existing)
+
+    quantities = _aggregate(reservation.items)
+    try:
+        if not _decrement(db, quantities):
+            raise _shortage_error(db, quantities)
+
+        db_reservation = models.StockReservation(
+            reference=reservation.reference,
+            status=models.ReservationStatus.ACTIVE,
+            expires_at=datetime.utcnow() + RESERVATION_TTL,
+            items=[
+                models.StockReservationItem(product_id=product_id, quantity=quantity)
+                for product_id, quantity in quantities.items()
+            ]
+        )
+        db.add(db_reservation)
+        db.commit()
+    except IntegrityError:
+        # Même référence réservée en parallèle : le décrément de cette tentative est annulé
+        db.rollback()
+        existing = _find_reservation(db, reservation.reference)
+        if existing is None:
+            raise
+        return _reservation_response(existing)
+    except HTTPException:
+        raise
+    except Exception:
+        db.rollback()
+        raise
+
+    product_cache.invalidate(*quantities)
+    return _reservation_response(_find_reservation(db, reservation.reference))
+
+def confirm_stock(db: Session, reference: str) -> schemas.Reservation:
+    """
+    Confirme la réservation d'une vente payée : elle n'expire plus. Si elle a déjà
+    expiré, le stock est réservé de nouveau, ou 409 s'il n'est plus disponible.
+    """
+    reservation = _find_reservation(db, reference, for_update=True)
+    if reservation is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Reservation not found")
+
+    if reservation.status == models.ReservationStatus.CONFIRMED:
+        db.rollback()
+        return _reservation_response(reservation)
+
+    quantities = dict(sorted((item.product_id, item.quantity) for item in reservation.items))
+    renewed = reservation.status == models.ReservationStatus.RELEASED
+    try:
+        if renewed and not _decrement(db, quantities):
+            raise _shortage_error(db, quantities)
+        reservation.status = models.ReservationStatus.CONFIRMED
+        reservation.expires_at = None
+        reservation.released_at = None
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception:
+        db.rollback()
+        raise
+
+    if renewed:
+        product_cache.invalidate(*quantities)
+    return _reservation_response(_find_reservation(db, reference))
+
+def release_stock(db: Session, reference: str, expired_only: bool = False) -> schemas.Reservation:
+    """
+    Remet en stock les quantités d'une réservation (sans effet si déjà libérée).
+    Avec `expired_only`, seule une réservation active arrivée à expiration est libérée :
+    une confirmation survenue entre-temps l'emporte.
+    """
+    reservation = _find_reservation(db, reference, for_update=True)
+    if reservation is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Reservation not found")
+
+    if reservation.status == models.ReservationStatus.RELEASED or (
+        expired_only and not _is_expired(reservation, datetime.utcnow())
+    ):
+        db.rollback()
+        return _reservation_response(reservation)
+
+    quantities = dict(sorted((item.product_id, item.quantity) for item in reservation.items))
+    try:
+        db.execute(
+            update(models.Product)
+            .where(models.Product.id.in_(list(quantities)))
+            .values(
+                quantity=models.Product.quantity + case(quantities, value=models.Product.id),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        reservation.status = models.ReservationStatus.RELEASED
+        reservation.released_at = datetime.utcnow()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    product_cache.invalidate(*quantities)
+    return _reservation_response(_find_reservation(db, reference))
+
+def release_expired_reservations(db: Session) -> int:
+    """Libère les réservations actives arrivées à expiration ; retourne leur nombre."""
+    references = [
+        reference for (reference,) in
+        db.query(models.StockReservation.reference)
+        .filter(models.StockReservation.status == models.ReservationStatus.ACTIVE)
+        .filter(models.StockReservation.expires_at <= datetime.utcnow())
+        .order_by(models.StockReservation.expires_at)
+        .limit(EXPIRY_BATCH_SIZE)
+        .all()
+    ]
+    db.rollback()
+    released = 0
+    for reference in references:
+        if release_stock(db, reference, expired_only=True).status == schemas.ReservationStatus.RELEASED:
+            released += 1
+    return released
@@ -0,0 +1,112 @@
+"""
+Test de concurrence des réservations de stock : de nombreux terminaux vendent
+le même produit en même temps.
+
+Le script crée un produit « chaud » avec --stock unités (et un second produit
+pour des paniers à deux lignes, réservés dans un ordre aléatoire), envoie
+--reservations réservations simultanées, en libère une partie, puis vérifie :
+- que le stock final est exactement stock initial - quantités réservées actives
+  (aucune mise à jour perdue) ;
+- que le stock n'est jamais négatif et que rien n'a été vendu au-delà ;
+- qu'aucune requête n'a échoué autrement que par une rupture (409).
+Le code de sortie est non nul si une vérification échoue. Le service doit tourner
+avec un seul worker : le cache des produits lu en fin de test est propre à chaque worker.
+--token est un token JWT d'un administrateur ou d'un manager (POST /auth/token du
+service d'authentification), nécessaire pour créer les produits.
+
+Usage :
+    python testscript/stress_reservations.py --url http://localhost:8003 --token <jwt> \
+        --stock 500 --reservations 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+
+import httpx
+
+
+async def run(args):
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=args.concurrency)
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=60) as client:
+        products = []
+        for name in ("hot", "side"):
+            response = await client.post("/products/", json={
+                "name": f"stress-{name}-{run_id}", "price": 1.0, "quantity": args.stock
+            })
+            response.raise_for_status()
+            products.append(response.json()["id"])
+        hot, side = products
+
+        reserved = {}
+        status_codes = {}
+        queue = asyncio.Queue()
+        for index in range(args.reservations):
+            queue.put_nowait(index)
+
+        async def terminal():
+            while not queue.empty():
+                index = queue.get_nowait()
+                lines = [{"product_id": hot, "quantity": random.randint(1, args.max_quantity)}]
+                if random.random() < 0.5:
+                    lines.append({"product_id": side, "quantity": random.randint(1, args.max_quantity)})
+                    random.shuffle(lines)
+                reference = f"S-{run_id}-{index}"
+                response = await client.post("/reservations/", json={"reference": reference, "items": lines})
+                status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    reserved[reference] = lines
+
+        started = time.perf_counter()
+        await asyncio.gather(*(terminal() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        # Libération d'une partie des réservations (ventes annulées), deux fois pour tester l'idempotence
+        released = random.sample(sorted(reserved), int(len(reserved) * args.release_ratio))
+        for _ in range(2):
+            await asyncio.gather(*(client.post(f"/reservations/{reference}/release") for reference in released))
+
+        expected = {hot: args.stock, side: args.stock}
+        for reference, lines in reserved.items():
+            if reference in released:
+                continue
+            for line in lines:
+                expected[line["product_id"]] -= line["quantity"]
+
+        failures = []
+        for product_id in products:
+            quantity = (await client.get(f"/products/{product_id}")).json()["quantity"]
+            print(f"Produit {product_id} : stock final {quantity}, attendu {expected[product_id]}")
+            if quantity != expected[product_id]:
+                failures.append(f"stock du produit {product_id} incohérent")
+            if quantity < 0:
+                failures.append(f"stock négatif pour le produit {product_id}")
+
+    unexpected = {code: count for code, count in status_codes.items() if code not in (200, 409)}
+    if unexpected:
+        failures.append(f"réponses inattendues : {unexpected}")
+    print(f"Réservations : {len(reserved)} acceptées, {status_codes.get(409, 0)} refusées (rupture), "
+          f"{len(released)} libérées, en {elapsed:.2f} s ({args.reservations / elapsed:.0f} req/s)")
+    for failure in failures:
+        print(f"ÉCHEC : {failure}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8003")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--reservations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--max-quantity", type=int, default=3)
+    parser.add_argument("--release-ratio", type=float, default=0.2)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
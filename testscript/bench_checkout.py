@@ -0,0 +1,290 @@
+"""
+Mesure du passage en caisse : login -> create_sale -> pay -> get_sale.
+
+Le script démarre auth_service (réel, ou le service factice stub_auth.py) et
+sales_service sur des ports locaux, crée un client, puis fait tourner chaque
+palier (concurrence x taille de panier) pendant --duration secondes. Chaque
+client virtuel enchaîne :
+    POST /auth/token, POST /sales/, POST /sales/{id}/pay, GET /sales/{id}
+Le résultat JSON donne, par palier et par étape, le débit et les latences
+p50/p95/p99, avec le commit git mesuré : deux fichiers de résultats se comparent
+avec la sous-commande `compare`, qui échoue (code 1) si une étape régresse.
+
+La base est celle de l'environnement (DATABASE_URL pour les ventes, auth_service/.env
+pour l'authentification réelle). Ne pas définir STOCK_SERVICE_URL, AUTH_SERVICE_USERNAME
+ni AUTH_SERVICE_TOKEN pour mesurer le service des ventes seul.
+
+Usage (depuis la racine du dépôt) :
+    python testscript/bench_checkout.py run --auth stub --output before.json
+    python testscript/bench_checkout.py run --auth real --email admin@test.com --password adminpassword
+    python testscript/bench_checkout.py run --sales-url http://localhost:8002 --auth-url http://localhost:8001 ...
+    python testscript/bench_checkout.py compare before.json after.json --threshold 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ("login", "create_sale", "pay", "get_sale")
+UNIT_PRICE = 10.0
+
+
+def percentile(values, ratio):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * ratio))] * 1000, 2)
+
+
+def summary(latencies, errors, elapsed):
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "rps": round((len(latencies) - errors) / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def start_server(app, cwd, port, env):
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd,
+        env=env
+    )
+
+
+async def wait_until_ready(url, timeout=30):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Le service ne répond pas sur {url}")
+
+
+async def login(client, args):
+    response = await client.post("/auth/token", data={"username": args.email, "password": args.password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def create_customer(sales, token):
+    response = await sales.post(
+        "/customers/",
+        json={"first_name": "Bench", "last_name": f"Checkout {int(time.time())}"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def run_level(args, customer_id, concurrency, basket_size):
+    items = [
+        {"product_id": product_id, "quantity": 1, "unit_price": UNIT_PRICE}
+        for product_id in range(1, basket_size + 1)
+    ]
+    total = round(UNIT_PRICE * basket_size, 2)
+    latencies = {step: [] for step in STEPS}
+    errors = {step: 0 for step in STEPS}
+    flows = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def timed(step, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            response = None
+        latencies[step].append(time.perf_counter() - start)
+        if response is None or response.status_code != 200:
+            errors[step] += 1
+            return None
+        return response.json()
+
+    async def worker(auth, sales):
+        nonlocal flows
+        token = None
+        while time.perf_counter() < deadline:
+            if token is None or not args.reuse_token:
+                body = await timed("login", auth.post(
+                    "/auth/token", data={"username": args.email, "password": args.password}
+                ))
+                if body is None:
+                    continue
+                token = body["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            sale = await timed("create_sale", sales.post(
+                "/sales/", json={"customer_id": customer_id, "items": items, "notes": "bench"}, headers=headers
+            ))
+            if sale is None:
+                continue
+            paid = await timed("pay", sales.post(
+                f"/sales/{sale['id']}/pay",
+                json={"transactions": [{"amount": total, "payment_method": "CARD"}]},
+                headers=headers
+            ))
+            if paid is None:
+                continue
+            if await timed("get_sale", sales.get(f"/sales/{sale['id']}", headers=headers)) is not None:
+                flows += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=args.auth_url, limits=limits, timeout=60) as auth, \
+            httpx.AsyncClient(base_url=args.sales_url, limits=limits, timeout=60) as sales:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(auth, sales) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "basket_size": basket_size,
+        "duration_s": round(elapsed, 2),
+        "flows": flows,
+        "flows_per_s": round(flows / elapsed, 1),
+        "steps": {step: summary(latencies[step], errors[step], elapsed) for step in STEPS},
+    }
+
+
+async def bench(args):
+    await wait_until_ready(args.auth_url)
+    await wait_until_ready(args.sales_url)
+    async with httpx.AsyncClient(base_url=args.auth_url, timeout=60) as auth, \
+            httpx.AsyncClient(base_url=args.sales_url, timeout=60) as sales:
+        customer_id = await create_customer(sales, await login(auth, args))
+
+    levels = []
+    for concurrency in args.concurrency:
+        for basket_size in args.basket_sizes:
+            level = await run_level(args, customer_id, concurrency, basket_size)
+            print(json.dumps(level), file=sys.stderr)
+            levels.append(level)
+    return levels
+
+
+def run(args):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, env.get("PYTHONPATH")]))
+    if args.auth == "stub":
+        # Même clé pour signer (service factice) et vérifier (service des ventes)
+        env.setdefault("SECRET_KEY", "bench-secret")
+    servers = []
+    try:
+        if not args.auth_url:
+            args.auth_url = f"http://127.0.0.1:{args.auth_port}"
+            if args.auth == "stub":
+                servers.append(start_server("stub_auth:app", os.path.join(REPO_DIR, "testscript"), args.auth_port, env))
+            else:
+                servers.append(start_server("app.main:app", os.path.join(REPO_DIR, "auth_service"), args.auth_port, env))
+        if not args.sales_url:
+            args.sales_url = f"http://127.0.0.1:{args.sales_port}"
+            servers.append(start_server(
+                "main:app", os.path.join(REPO_DIR, "sales_service"), args.sales_port,
+                dict(env, AUTH_SERVICE_URL=args.auth_url)
+            ))
+        levels = asyncio.run(bench(args))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    result = {
+        "git": git_revision(),
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {
+            "auth": args.auth,
+            "db_mode": os.getenv("DB_MODE", "sync"),
+            "duration_s": args.duration,
+            "reuse_token": args.reuse_token,
+        },
+        "levels": levels,
+    }
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    base_levels = {(level["concurrency"], level["basket_size"]): level for level in baseline["levels"]}
+    regressions = []
+    print(f"base {baseline['git']['commit'][:10]} -> candidate {candidate['git']['commit'][:10]}")
+    for level in candidate["levels"]:
+        key = (level["concurrency"], level["basket_size"])
+        base = base_levels.get(key)
+        if base is None:
+            continue
+        print(f"\nconcurrence {key[0]}, panier {key[1]} : {base['flows_per_s']} -> {level['flows_per_s']} passages/s")
+        for step in STEPS:
+            before, after = base["steps"][step], level["steps"][step]
+            if before[args.metric] is None or after[args.metric] is None:
+                continue
+            change = (after[args.metric] - before[args.metric]) / before[args.metric] * 100 if before[args.metric] else 0.0
+            flag = ""
+            if change > args.threshold:
+                flag = "  REGRESSION"
+                regressions.append({"level": key, "step": step, "change_pct": round(change, 1)})
+            print(f"  {step:<12} {args.metric} {before[args.metric]:>9} -> {after[args.metric]:>9} ms "
+                  f"({change:+.1f} %){flag}")
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold} %")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Lancer les mesures")
+    run_parser.add_argument("--auth", choices=["stub", "real"], default="stub")
+    run_parser.add_argument("--email", default="bench@test.com")
+    run_parser.add_argument("--password", default="bench")
+    run_parser.add_argument("--concurrency", nargs="+", type=int, default=[10, 50])
+    run_parser.add_argument("--basket-sizes", nargs="+", type=int, default=[1, 10])
+    run_parser.add_argument("--duration", type=float, default=20.0, help="Durée de chaque palier, en secondes")
+    run_parser.add_argument("--reuse-token", action="store_true", help="Un seul login par client virtuel")
+    run_parser.add_argument("--auth-port", type=int, default=8101)
+    run_parser.add_argument("--sales-port", type=int, default=8102)
+    run_parser.add_argument("--auth-url", help="Utiliser un service d'authentification déjà démarré")
+    run_parser.add_argument("--sales-url", help="Utiliser un service des ventes déjà démarré")
+    run_parser.add_argument("--output", help="Fichier JSON de résultats")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="Comparer deux fichiers de résultats")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms"], default="p95_ms")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Hausse tolérée, en pourcentage")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
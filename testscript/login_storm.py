@@ -0,0 +1,93 @@
+"""
+Rafale de connexions sur le service d'authentification (changement d'équipe).
+
+Pendant que `--logins` connexions simultanées sont envoyées sur /auth/token,
+des requêtes hors connexion (GET /users/me et GET /) sont émises en continu ;
+le script affiche en JSON la latence p50/p99 de ces requêtes, et celle des
+connexions. À lancer avant et après une modification pour comparer.
+
+Usage :
+    python testscript/login_storm.py --email admin@test.com --password adminpassword \
+        --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def percentile(values, ratio):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * ratio))] * 1000, 2)
+
+
+def summary(values):
+    return {"count": len(values), "p50_ms": percentile(values, 0.50), "p99_ms": percentile(values, 0.99)}
+
+
+async def run(args):
+    credentials = {"username": args.email, "password": args.password}
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        response = await client.post("/auth/token", data=credentials)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        login_latencies, me_latencies, health_latencies = [], [], []
+        status_codes = {}
+        remaining = args.logins
+        storm_running = True
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.post("/auth/token", data=credentials)
+                login_latencies.append(time.perf_counter() - start)
+                status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+        async def probe(path, latencies, headers=None):
+            while storm_running:
+                start = time.perf_counter()
+                await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(args.probe_interval)
+
+        probes = [
+            asyncio.create_task(probe("/users/me", me_latencies, {"Authorization": f"Bearer {token}"})),
+            asyncio.create_task(probe("/", health_latencies)),
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        storm_running = False
+        await asyncio.gather(*probes)
+
+    print(json.dumps({
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "login_status_codes": status_codes,
+        "login": summary(login_latencies),
+        "users_me": summary(me_latencies),
+        "health": summary(health_latencies),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--email", default="admin@test.com")
+    parser.add_argument("--password", default="adminpassword")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
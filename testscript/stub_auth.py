@@ -0,0 +1,64 @@
+"""
+Service d'authentification factice pour les mesures de performance du service des ventes.
+
+Il expose les seules routes appelées pendant un passage en caisse :
+POST /auth/token (n'importe quel mot de passe est accepté) et GET /users/me.
+Les tokens sont signés avec SECRET_KEY / ALGORITHM, comme ceux du vrai service,
+pour que la vérification locale du service des ventes reste active.
+STUB_AUTH_LATENCY_MS simule la latence du vrai service (0 par défaut).
+
+Usage (lancé par bench_checkout.py, ou à la main) :
+    SECRET_KEY=... uvicorn stub_auth:app --port 8101
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+SECRET_KEY = os.getenv("SECRET_KEY", "bench-secret")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+LATENCY = float(os.getenv("STUB_AUTH_LATENCY_MS", "0")) / 1000
+STARTED_AT = datetime.utcnow()
+
+app = FastAPI(title="Stub Auth Service")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+
+
+@app.get("/")
+async def health_check():
+    return {"status": "OK"}
+
+
+@app.post("/auth/token")
+async def login(request: Request):
+    # Formulaire lu à la main : python-multipart n'est pas une dépendance du service des ventes
+    form = parse_qs((await request.body()).decode())
+    username = form.get("username", ["bench@test.com"])[0]
+    await asyncio.sleep(LATENCY)
+    expire = datetime.utcnow() + timedelta(minutes=60)
+    token = jwt.encode({"sub": username, "role": "cashier", "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+    return {"access_token": token, "token_type": "bearer"}
+
+
+@app.get("/users/me")
+async def me(token: str = Depends(oauth2_scheme)):
+    await asyncio.sleep(LATENCY)
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return {
+        "id": 1,
+        "first_name": "Bench",
+        "last_name": "Cashier",
+        "birth_date": "1990-01-01",
+        "id_card_number": None,
+        "email": claims["sub"],
+        "role": claims.get("role", "cashier"),
+        "is_active": True,
+        "created_at": STARTED_AT.isoformat(),
+    }